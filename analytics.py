@@ -1,10 +1,189 @@
+import argparse
+import atexit
+import contextlib
 import datetime
+import glob
+import json
+import os
+import sys
+import threading
+import traceback
+from collections import Counter
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: там сервер - один процес (див. wsgi.py), міжпроцесне блокування не потрібне
+    fcntl = None
+
 
 class Analytics:
     LOG_FILE = "analytics.log"
 
+    # ротація за розміром: analytics.log -> analytics.log.1 -> ... -> analytics.log.5
+    MAX_BYTES = 10 * 1024 * 1024
+    BACKUP_COUNT = 5
+
+    # буфер скидається на диск фоновим потоком раз на FLUSH_INTERVAL секунд
+    # або одразу, коли набралося BUFFER_SIZE записів. Потік запускається
+    # першим log() у кожному процесі: після fork (gunicorn --preload) у
+    # дочірньому процесі потоків батька немає, тож стан скидається (_after_fork)
+    FLUSH_INTERVAL = 1.0
+    BUFFER_SIZE = 256
+
+    # _lock тримається лише на час додавання в буфер чи його підміни,
+    # запис у файл іде під окремим _write_lock, тож log() не чекає на диск
+    _buffer = []
+    _lock = threading.Lock()
+    _wakeup = threading.Condition(_lock)
+    _write_lock = threading.Lock()
+    _flusher = None
+
+    @staticmethod
+    def log(event: str, type: str = "info", user: str = None):
+        record = {
+            "ts": datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+            "type": type,
+            "user": user,
+            "event": event,
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with Analytics._lock:
+            Analytics._buffer.append(line)
+            if Analytics._flusher is None:
+                Analytics._start_flusher()
+            if len(Analytics._buffer) >= Analytics.BUFFER_SIZE:
+                Analytics._wakeup.notify()
+
+    @staticmethod
+    def flush():
+        # _write_lock спершу: буфери пишуться у файл у тому ж порядку, в якому забрані
+        with Analytics._write_lock:
+            with Analytics._lock:
+                if not Analytics._buffer:
+                    return
+                lines, Analytics._buffer = Analytics._buffer, []
+            Analytics._write("".join(lines).encode("utf-8"))
+
+    @staticmethod
+    def _start_flusher():
+        Analytics._flusher = threading.Thread(target=Analytics._flush_loop,
+                                              name="analytics-flusher", daemon=True)
+        Analytics._flusher.start()
+
+    @staticmethod
+    def _after_fork():
+        # замки могли бути захоплені потоком батька в момент fork, а записи
+        # з буфера батько запише сам
+        Analytics._buffer = []
+        Analytics._lock = threading.Lock()
+        Analytics._wakeup = threading.Condition(Analytics._lock)
+        Analytics._write_lock = threading.Lock()
+        Analytics._flusher = None
+
+    @staticmethod
+    def _flush_loop():
+        while True:
+            with Analytics._lock:
+                Analytics._wakeup.wait(Analytics.FLUSH_INTERVAL)
+            try:
+                Analytics.flush()
+            except OSError as e:
+                print(f"Analytics write error: {e}", file=sys.stderr)
+            except Exception:
+                # будь-яка інша помилка не має зупинити потік, інакше буфер росте без меж
+                print("Analytics flush error:", file=sys.stderr)
+                traceback.print_exc()
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _file_lock():
+        """Блокування між воркерами gunicorn на час перевірки розміру, ротації і запису."""
+        if fcntl is None:
+            yield
+            return
+        # окремий файл: сам лог під час ротації перейменовується
+        with open(Analytics.LOG_FILE + ".lock", "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
     @staticmethod
-    def log(event: str):
-        with open(Analytics.LOG_FILE, "a", encoding="utf-8") as f:
-            time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            f.write(f"{time} — {event}\n")
+    def _write(data):
+        with Analytics._file_lock():
+            # розмір - уже під блокуванням, тож інший воркер не ротує той самий файл удруге
+            try:
+                size = os.path.getsize(Analytics.LOG_FILE)
+            except OSError:
+                size = 0
+            if size and size + len(data) > Analytics.MAX_BYTES:
+                Analytics._rotate()
+            with open(Analytics.LOG_FILE, "ab") as f:
+                f.write(data)
+
+    @staticmethod
+    def _rotate():
+        base = Analytics.LOG_FILE
+        for i in range(Analytics.BACKUP_COUNT - 1, 0, -1):
+            if os.path.exists(f"{base}.{i}"):
+                os.replace(f"{base}.{i}", f"{base}.{i + 1}")
+        os.replace(base, f"{base}.1")
+
+
+atexit.register(Analytics.flush)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=Analytics._after_fork)
+
+
+# === ОФЛАЙН-АГРЕГАЦІЯ ЛОГІВ ===
+
+def log_files(base=None):
+    """Файл логу і його ротовані копії, від найстарішої до найновішої."""
+    base = base or Analytics.LOG_FILE
+    rotated = [p for p in glob.glob(f"{glob.escape(base)}.*") if p.rsplit(".", 1)[1].isdigit()]
+    rotated.sort(key=lambda p: int(p.rsplit(".", 1)[1]), reverse=True)
+    return rotated + ([base] if os.path.exists(base) else [])
+
+
+def iter_records(paths):
+    """Читає записи з файлів по рядку. Старий формат "час — подія" теж підтримується."""
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("{"):
+                    try:
+                        yield json.loads(line)
+                        continue
+                    except ValueError:
+                        pass
+                time, _, event = line.partition(" — ")
+                yield {"ts": time.replace(" ", "T"), "type": "legacy", "user": None, "event": event}
+
+
+def aggregate(records):
+    """Кількість подій по (година, користувач, тип)."""
+    counts = Counter()
+    for record in records:
+        hour = (record.get("ts") or "")[:13]
+        counts[(hour, record.get("user") or "-", record.get("type") or "-")] += 1
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Звіт по analytics.log: кількість подій по годинах, користувачах і типах.")
+    parser.add_argument("files", nargs="*", help="Файли логу (за замовчуванням analytics.log і його ротовані копії).")
+    args = parser.parse_args(argv)
+
+    counts = aggregate(iter_records(args.files or log_files()))
+    print("hour\tuser\ttype\tcount")
+    for (hour, user, type_), count in sorted(counts.items()):
+        print(f"{hour}\t{user}\t{type_}\t{count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+from datetime import date, timedelta
+
+from models import (db, Contract, Event, ScheduleException, UserStats,
+                    ArchivedContract, ArchivedEvent, ArchivedScheduleException)
+import schedules
+import stats
+
+
+# === АРХІВ МИНУЛИХ ПОДІЙ І ЗАВЕРШЕНИХ ДОГОВОРІВ (flask archive) ===
+# Кожен договір зі старим графіком лишає в event duration_months рядків,
+# тож таблиця лише росте, а з нею - запити місяця, дня і найближчих подій.
+# Завдання переносить у архівні таблиці (ті самі колонки й id):
+#   * договори, останній платіж яких раніше межі, - разом з їхніми
+#     подіями й винятками графіка (якщо жодна їхня подія не лишилась після
+#     межі);
+#   * події без договору, раніше межі.
+# Межа - сьогодні мінус AFTER_DAYS (ARCHIVE_AFTER_DAYS у конфігурації).
+#
+# Переносить пачками по BATCH_SIZE рядків, кожна - окрема коротка
+# транзакція, що починається із запису (INSERT ... SELECT ... RETURNING),
+# тож блокування бази тримається мілісекунди і не конфліктує з читанням.
+#
+# Межа користувача (UserStats.archived_before) піднімається до перенесення:
+# сторінки, чий діапазон дат починається раніше неї, додатково читають архів
+# (events / payments / items нижче), тож нічого не зникає ні під час, ні
+# після перенесення. Архів лише для читання - редагувати там нічого.
+#
+# contract і event - таблиці з AUTOINCREMENT, тож id перенесеного рядка
+# ніколи не дістанеться новому.
+
+AFTER_DAYS = 365
+BATCH_SIZE = 500
+
+
+def cutoff_for(today, after_days=AFTER_DAYS):
+    return today - timedelta(days=after_days)
+
+
+def boundary(user_id):
+    """Дата, раніше якої частина подій користувача може бути в архіві (або None)."""
+    return db.session.query(UserStats.archived_before).filter_by(user_id=user_id).scalar()
+
+
+def archived_ranges(user_id, ranges):
+    """Частини діапазонів (start, end), що лежать до межі архіву."""
+    before = boundary(user_id)
+    if before is None:
+        return []
+    last = before - timedelta(days=1)
+    return [(start, min(end, last)) for start, end in ranges if start <= last]
+
+
+# === ЧИТАННЯ АРХІВУ ===
+
+def events(user_id, *ranges):
+    ranges = archived_ranges(user_id, ranges)
+    if not ranges:
+        return []
+    return ArchivedEvent.query.filter(
+        ArchivedEvent.user_id == user_id,
+        db.or_(*[ArchivedEvent.date.between(start, end) for start, end in ranges])
+    ).order_by(ArchivedEvent.date, ArchivedEvent.id).all()
+
+
+def payments(user_id, *ranges):
+    ranges = archived_ranges(user_id, ranges)
+    if not ranges:
+        return []
+    result = schedules.expand_payments(user_id, *ranges,
+                                       contract_model=ArchivedContract,
+                                       exception_model=ArchivedScheduleException)
+    for payment in result:
+        payment.is_archived = True
+    return result
+
+
+def items(user_id, *ranges):
+    """Архівні події й платежі для діапазонів, впорядковані за датою."""
+    if not archived_ranges(user_id, ranges):
+        return []
+    return sorted(events(user_id, *ranges) + payments(user_id, *ranges), key=lambda e: e.date)
+
+
+# === ПЕРЕНЕСЕННЯ ===
+
+def _copy(source, target, where):
+    """INSERT INTO target SELECT ... FROM source WHERE where RETURNING id."""
+    columns = [c.name for c in target.__table__.columns]
+    stmt = db.insert(target).from_select(
+        columns, db.select(*[source.__table__.c[name] for name in columns]).where(where))
+    if 'id' in target.__table__.c:
+        return db.session.scalars(stmt.returning(target.__table__.c.id)).all()
+    db.session.execute(stmt)
+
+
+def _archive_contracts(user_id, cutoff, batch_size):
+    batch = db.select(Contract.id).where(
+        Contract.user_id == user_id,
+        Contract.end_date < cutoff,
+        # перенесений за межу платіж тримає договір у гарячій таблиці
+        ~db.exists().where(Event.user_id == user_id, Event.date >= cutoff, Event.contract_id == Contract.id),
+    ).order_by(Contract.id).limit(batch_size)
+    ids = _copy(Contract, ArchivedContract, Contract.id.in_(batch))
+    if ids:
+        _copy(ScheduleException, ArchivedScheduleException, ScheduleException.contract_id.in_(ids))
+        _copy(Event, ArchivedEvent, Event.contract_id.in_(ids))
+        # події і винятки графіка видалить ON DELETE CASCADE
+        db.session.execute(db.delete(Contract).where(Contract.id.in_(ids)))
+    db.session.commit()
+    return ids
+
+
+def _archive_events(user_id, cutoff, batch_size):
+    batch = db.select(Event.id).where(
+        Event.user_id == user_id,
+        Event.date < cutoff,
+        Event.contract_id.is_(None),
+    ).order_by(Event.id).limit(batch_size)
+    ids = _copy(Event, ArchivedEvent, Event.id.in_(batch))
+    if ids:
+        db.session.execute(db.delete(Event).where(Event.id.in_(ids)))
+    db.session.commit()
+    return ids
+
+
+def _raise_boundary(user_id, cutoff):
+    db.session.execute(
+        db.update(UserStats)
+        .where(UserStats.user_id == user_id,
+               db.or_(UserStats.archived_before.is_(None), UserStats.archived_before < cutoff))
+        .values(archived_before=cutoff)
+    )
+    db.session.commit()
+
+
+def run(today=None, after_days=AFTER_DAYS, batch_size=BATCH_SIZE, user_id=None):
+    """Переносить в архів усе, що старше межі. Повертає {'contracts': n, 'events': n}."""
+    cutoff = cutoff_for(today or date.today(), after_days)
+    users = db.select(UserStats.user_id).order_by(UserStats.user_id)
+    if user_id is not None:
+        users = users.where(UserStats.user_id == user_id)
+    user_ids = db.session.scalars(users).all()
+    # перша інструкція кожної пачки - запис, тож читання тут закриваємо
+    db.session.commit()
+
+    moved = {'contracts': 0, 'events': 0}
+    for uid in user_ids:
+        _raise_boundary(uid, cutoff)
+        count = 0
+        for kind, step in (('contracts', _archive_contracts), ('events', _archive_events)):
+            while True:
+                ids = step(uid, cutoff, batch_size)
+                moved[kind] += len(ids)
+                count += len(ids)
+                if len(ids) < batch_size:
+                    break
+        if count:
+            # у сторінках з кешу архівні події ще мають кнопки редагування
+            stats.data_changed(uid)
+            db.session.commit()
+    return moved
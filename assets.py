@@ -0,0 +1,48 @@
+import functools
+import hashlib
+import os
+
+from flask import current_app, request, url_for
+from jinja2 import FileSystemBytecodeCache
+
+
+# === СТАТИЧНІ ФАЙЛИ З ВІДБИТКОМ І КЕШ ШАБЛОНІВ ===
+# asset_url('css/month.css') дає /static/css/month.css?v=<хеш вмісту>.
+# Такий URL змінюється разом із файлом, тож браузер може тримати його в
+# кеші рік і не перепитувати сервер. Хеші рахуються один раз на процес:
+# нові файли з'являються лише з деплоєм, тобто з перезапуском.
+
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+
+@functools.lru_cache(maxsize=None)
+def fingerprint(static_folder, filename):
+    with open(os.path.join(static_folder, filename), 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+
+def asset_url(filename):
+    return url_for('static', filename=filename, v=fingerprint(current_app.static_folder, filename))
+
+
+def _immutable_static(response):
+    # лише URL з правильним відбитком можна кешувати назавжди
+    if request.endpoint == 'static' and response.status_code == 200:
+        version = request.args.get('v')
+        filename = request.view_args.get('filename')
+        if version and version == fingerprint(current_app.static_folder, filename):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = ASSET_MAX_AGE
+            response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.after_request(_immutable_static)
+
+    # скомпільовані шаблони переживають перезапуск воркерів
+    cache_dir = app.config.get('JINJA_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
@@ -0,0 +1,176 @@
+from datetime import datetime, timedelta
+
+from models import db, Event
+import changes
+import stats
+
+
+# === ПАКЕТНІ ЗМІНИ ПОДІЙ (POST /api/events/batch) ===
+# Замість запиту на кожну подію клієнт шле список операцій:
+#
+#   {"op": "create", "title": ..., "date": "2026-05-01", "description": ..., "priority": ...}
+#   {"op": "update", "id": 5, "title": ..., "description": ..., "priority": ...}
+#   {"op": "move",   "id": 5, "date": "2026-05-02"}  або  {"op": "move", "id": 5, "days": 7}
+#   {"op": "delete", "id": 5}
+#
+# Належність усіх згаданих подій користувачу перевіряється одним запитом,
+# операції застосовуються до стану в пам'яті по черзі (тож "move" після
+# "update" тієї ж події бачить її нову версію), а в базу йде лише
+# підсумок: один INSERT для нових, UPDATE за первинним ключем для
+# змінених, один DELETE для видалених, журнал змін для /sync - і все
+# в одній транзакції.
+# Помилкова операція отримує свою помилку в результатах, решта
+# застосовуються; з "atomic": true не застосовується нічого.
+
+MAX_OPERATIONS = 1000
+PRIORITIES = ('low', 'medium', 'high')
+FIELDS = ('title', 'description', 'date', 'priority')
+TITLE_MAX_LENGTH = 100
+MAX_ID = 2 ** 63 - 1   # найбільше ціле SQLite
+
+
+class OperationError(ValueError):
+    def __init__(self, message, status='invalid'):
+        super().__init__(message)
+        self.status = status
+
+
+def _date(value):
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d').date()
+    except ValueError:
+        raise OperationError(f'некоректна дата: {value!r}')
+
+
+def _fields(op, required=()):
+    """Поля події з операції, перевірені."""
+    missing = [f for f in required if op.get(f) in (None, '')]
+    if missing:
+        raise OperationError('відсутні поля: ' + ', '.join(missing))
+    fields = {}
+    if 'title' in op:
+        title = str(op['title']).strip()
+        if not title or len(title) > TITLE_MAX_LENGTH:
+            raise OperationError(f'назва має бути від 1 до {TITLE_MAX_LENGTH} символів')
+        fields['title'] = title
+    if 'description' in op:
+        fields['description'] = str(op['description'] or '')
+    if 'priority' in op:
+        if op['priority'] not in PRIORITIES:
+            raise OperationError(f'некоректний пріоритет: {op["priority"]!r}')
+        fields['priority'] = op['priority']
+    if 'date' in op:
+        fields['date'] = _date(op['date'])
+    return fields
+
+
+def _is_id(value):
+    # більший за INTEGER бази id SQLite не прийме (OverflowError)
+    return isinstance(value, int) and not isinstance(value, bool) and 1 <= value <= MAX_ID
+
+
+def _event_id(op):
+    event_id = op.get('id')
+    if not _is_id(event_id):
+        raise OperationError('потрібен числовий id події')
+    return event_id
+
+
+def apply_operations(user_id, operations, atomic=False):
+    """Застосовує операції. Повертає (результати по кожній операції, чи записано зміни)."""
+    if not isinstance(operations, list) or not 1 <= len(operations) <= MAX_OPERATIONS:
+        raise ValueError(f'operations має бути списком від 1 до {MAX_OPERATIONS} операцій')
+
+    ids = {op.get('id') for op in operations if isinstance(op, dict) and _is_id(op.get('id'))}
+    # поточний стан усіх згаданих подій користувача - одним запитом
+    state = {}
+    if ids:
+        rows = db.session.execute(
+            db.select(Event.id, Event.title, Event.description, Event.date, Event.priority)
+            .where(Event.user_id == user_id, Event.id.in_(ids))
+        )
+        state = {row.id: dict(row._mapping) for row in rows}
+    original_dates = {event_id: event['date'] for event_id, event in state.items()}
+
+    created, changed, deleted = [], set(), set()
+    results = []
+    for index, op in enumerate(operations):
+        kind = op.get('op') if isinstance(op, dict) else None
+        result = {'index': index, 'op': kind}
+        try:
+            if kind == 'create':
+                fields = _fields(op, required=('title', 'date'))
+                created.append(dict({'description': '', 'priority': 'medium'}, **fields))
+                result['status'] = 'created'
+            elif kind in ('update', 'move', 'delete'):
+                event_id = result['id'] = _event_id(op)
+                event = state.get(event_id)
+                if event is None or event_id in deleted:
+                    raise OperationError('подію не знайдено', status='not_found')
+                if kind == 'delete':
+                    deleted.add(event_id)
+                    changed.discard(event_id)
+                    result['status'] = 'deleted'
+                elif kind == 'update':
+                    fields = _fields({k: op[k] for k in ('title', 'description', 'priority') if k in op})
+                    if not fields:
+                        raise OperationError('немає полів для зміни')
+                    event.update(fields)
+                    changed.add(event_id)
+                    result['status'] = 'updated'
+                else:
+                    if 'date' in op:
+                        new_date = _date(op['date'])
+                    elif isinstance(op.get('days'), int) and not isinstance(op.get('days'), bool):
+                        try:
+                            new_date = event['date'] + timedelta(days=op['days'])
+                        except (OverflowError, ValueError):
+                            raise OperationError('некоректний зсув')
+                    else:
+                        raise OperationError('потрібна нова дата (date) або зсув у днях (days)')
+                    event['date'] = new_date
+                    changed.add(event_id)
+                    result['status'] = 'moved'
+                    result['date'] = new_date.isoformat()
+            else:
+                raise OperationError(f'невідома операція: {kind!r}')
+        except OperationError as e:
+            result['status'] = e.status
+            result['error'] = str(e)
+        results.append(result)
+
+    failed = any(r['status'] in ('invalid', 'not_found') for r in results)
+    if atomic and failed:
+        return results, False
+    if not (created or changed or deleted):
+        return results, False
+
+    new_ids = []
+    if created:
+        new_ids = db.session.scalars(
+            db.insert(Event).returning(Event.id, sort_by_parameter_order=True),
+            [dict(fields, user_id=user_id) for fields in created]
+        ).all()
+        created_results = (r for r in results if r['status'] == 'created')
+        for result, event_id in zip(created_results, new_ids):
+            result['id'] = event_id
+    if changed:
+        db.session.execute(db.update(Event), [
+            {'id': event_id, **{f: state[event_id][f] for f in FIELDS}} for event_id in changed
+        ])
+    if deleted:
+        db.session.execute(
+            db.delete(Event).where(Event.user_id == user_id, Event.id.in_(deleted))
+            .execution_options(synchronize_session=False)
+        )
+
+    moved = [event_id for event_id in changed if state[event_id]['date'] != original_dates[event_id]]
+    stats.events_changed(
+        user_id,
+        added=[fields['date'] for fields in created] + [state[event_id]['date'] for event_id in moved],
+        removed=[original_dates[event_id] for event_id in deleted] + [original_dates[event_id] for event_id in moved],
+        updated=[state[event_id]['date'] for event_id in changed],
+    )
+    changes.events_changed(user_id, saved=list(new_ids) + sorted(changed), deleted=sorted(deleted))
+    db.session.commit()
+    return results, True
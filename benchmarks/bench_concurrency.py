@@ -0,0 +1,175 @@
+"""Навантажувальний тест записів: кілька процесів-воркерів над однією базою SQLite.
+
+Кожен воркер - окремий процес з власним застосунком (create_app) і власним
+пулом з'єднань, як у gunicorn -w N. Клієнтські потоки по черзі звертаються
+до воркерів і шлють POST /add та POST /add_contract. Будь-яка відповідь,
+крім редіректу після успішного запису (наприклад, 500 через
+"database is locked"), рахується як помилка.
+
+Запуск:  python benchmarks/bench_concurrency.py [--workers 1 2 4] [--clients 16] [--requests 50]
+         [--profile production|default]
+"""
+import argparse
+import http.client
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+
+PASSWORD = datagen.PASSWORD
+
+
+def config_for(profile, db_uri):
+    import config
+    config.Config.SQLALCHEMY_DATABASE_URI = db_uri
+    config.Config.MAIL_SUPPRESS_SEND = True
+    if profile == "production":
+        from production import ProductionConfig
+        return ProductionConfig
+    return config.Config
+
+
+def serve(profile, db_uri, ports):
+    """Процес-воркер: власний застосунок і багатопотоковий WSGI-сервер."""
+    from werkzeug.serving import make_server
+    from main import create_app
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    app = create_app(config_for(profile, db_uri))
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def request(port, method, path, data=None, cookie=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    headers = {}
+    body = None
+    if data is not None:
+        body = urllib.parse.urlencode(data)
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    if cookie:
+        headers["Cookie"] = cookie
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status, response.getheader("Set-Cookie")
+    finally:
+        conn.close()
+
+
+def client(index, ports, username, count, results):
+    status, set_cookie = request(ports[index % len(ports)], "POST", "/login",
+                                 {"username": username, "password": PASSWORD})
+    cookie = "session=" + SimpleCookie(set_cookie)["session"].value
+
+    timings, errors = [], {}
+    day = date.today()
+    for i in range(count):
+        port = ports[(index + i) % len(ports)]
+        if i % 2:
+            data = {"number": f"LOAD-{index}-{i}", "client": "Load Client", "client_email": "load@example.com",
+                    "amount": "12000", "start_date": day.isoformat(), "duration": "12"}
+            path = "/add_contract"
+        else:
+            data = {"title": f"Load {index}-{i}", "date": (day + timedelta(days=i % 30)).isoformat(),
+                    "priority": "medium"}
+            path = "/add"
+        started = time.perf_counter()
+        try:
+            status, _ = request(port, "POST", path, data, cookie)
+        except OSError as e:
+            status = type(e).__name__
+        timings.append((time.perf_counter() - started) * 1000)
+        if status != 302:
+            errors[status] = errors.get(status, 0) + 1
+    results.append((timings, errors))
+
+
+def run(profile, db_uri, workers, clients, requests_per_client, usernames):
+    ports_queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=serve, args=(profile, db_uri, ports_queue), daemon=True)
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    ports = [ports_queue.get(timeout=30) for _ in processes]
+
+    results = []
+    threads = [threading.Thread(target=client, args=(i, ports, usernames[i % len(usernames)],
+                                                     requests_per_client, results))
+               for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    for process in processes:
+        process.terminate()
+        process.join()
+
+    timings = [t for result_timings, _ in results for t in result_timings]
+    errors = {}
+    for _, result_errors in results:
+        for status, n in result_errors.items():
+            errors[status] = errors.get(status, 0) + n
+    timings.sort()
+    return {
+        "rps": len(timings) / elapsed,
+        "p50": statistics.median(timings),
+        "p95": timings[int(0.95 * (len(timings) - 1))],
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=50, help="запитів на клієнта")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--profile", choices=["production", "default"], default="production")
+    args = parser.parse_args()
+
+    db_path = datagen.use_temp_database("bench_concurrency.db")
+    db_uri = f"sqlite:///{db_path}"
+
+    from main import create_app
+    from models import db, Event, Contract
+    import migrations
+
+    app = create_app(config_for(args.profile, db_uri))
+    with app.app_context():
+        usernames = datagen.seed(args.users, 100, 1000)
+        migrations.upgrade()
+        db.engine.dispose()   # воркери відкривають власні з'єднання
+
+    print(f"Профіль: {args.profile}, клієнтів: {args.clients}, запитів на клієнта: {args.requests}\n")
+    print(f"{'воркерів':>9}{'запитів/с':>11}{'p50, мс':>10}{'p95, мс':>10}  помилки")
+    for workers in args.workers:
+        with app.app_context():
+            before = Event.query.count() + Contract.query.count()
+            db.engine.dispose()
+        r = run(args.profile, db_uri, workers, args.clients, args.requests, usernames)
+        with app.app_context():
+            written = Event.query.count() + Contract.query.count() - before
+            db.engine.dispose()
+        errors = ", ".join(f"{k}: {v}" for k, v in r["errors"].items()) or "немає"
+        print(f"{workers:>9}{r['rps']:>11.1f}{r['p50']:>10.1f}{r['p95']:>10.1f}  {errors}"
+              f"  (записано {written} з {args.clients * args.requests})")
+
+
+if __name__ == "__main__":
+    main()
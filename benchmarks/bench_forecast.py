@@ -0,0 +1,79 @@
+"""Прогноз надходжень на великому портфелі.
+
+Окремо міряються читання портфеля з бази (один запит, згрупований у
+когорти) і сам векторний розрахунок, плюс повний запит /api/forecast з
+холодним кешем портфеля. Заповнення бази на мільйон договорів займає
+кілька хвилин.
+
+Запуск:  python benchmarks/bench_forecast.py [--contracts 1000000] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+
+datagen.use_temp_database("bench_forecast.db")
+
+from main import app
+from models import User
+import forecast
+
+SCENARIOS = [
+    ("рівні частини, 12 міс.", 12, 0.0),
+    ("ануїтет 18%, 120 міс.", 120, 0.18),
+    ("ануїтет 18%, 360 міс.", 360, 0.18),
+]
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contracts", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with app.app_context():
+        usernames = datagen.seed(1, args.contracts, 0)
+        user_id = User.query.filter_by(username=usernames[0]).first().id
+    print(f"Договорів: {args.contracts}, заповнення бази: {time.perf_counter() - started:.1f} с\n")
+
+    today = date.today()
+    first = forecast.month_index(today.year, today.month)
+    with app.app_context():
+        load_ms, portfolio = timed(lambda: forecast.load_portfolio(user_id), args.repeat)
+    print(f"Читання портфеля: {load_ms:.1f} мс ({len(portfolio.amount)} когорт)\n")
+
+    print(f"{'сценарій':<26}{'розрахунок, мс':>16}{'платежів':>12}")
+    for name, months, rate in SCENARIOS:
+        compute_ms, result = timed(lambda: forecast.forecast(portfolio, first, months, rate), args.repeat)
+        print(f"{name:<26}{compute_ms:>16.2f}{result['due_count']:>12}")
+
+    client = app.test_client()
+    client.post("/login", data={"username": usernames[0], "password": datagen.PASSWORD})
+
+    def request():
+        forecast.portfolio_for.cache_clear()
+        return client.get("/api/forecast?months=120&rate=18")
+
+    request_ms, response = timed(request, args.repeat)
+    assert response.status_code == 200, response.status_code
+    print(f"\nGET /api/forecast, холодний кеш портфеля: {request_ms:.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Скільки запитів одночасно обслуговує один воркер: сторінки й договори поруч із відкритими /stream.
+
+Воркер - окремий процес з власним застосунком (create_app) і пулом
+потоків фіксованого розміру, як gunicorn --threads N: кожен запит, поки
+не завершиться, тримає один потік. Відкриті вкладки календаря тримають
+потік весь час (SSE /stream), тож на кожну конфігурацію спершу
+відкривається --streams потоків, а потім клієнти ходять маршрутами,
+які чекають на базу: місяць, день, реєстр договорів, створення і
+анулювання договору (лист лише ставиться в чергу, SMTP не чекаємо).
+
+Конфігурації:
+    4 потоки              - як було в wsgi.py, ліміт /stream лише LIVE_MAX_STREAMS;
+    4 потоки + ліміт      - WORKER_THREADS=4: /stream займає не більше половини потоків;
+    32 потоки + ліміт     - ProductionConfig (WORKER_THREADS=32).
+
+Запит, на який немає відповіді за --timeout секунд, рахується як тайм-аут.
+Пік - найбільша кількість звичайних (не /stream) запитів, що одночасно
+виконувались у воркері.
+
+Запуск:  python benchmarks/bench_io_routes.py [--streams 8] [--clients 16] [--requests 20] [--timeout 10]
+"""
+import argparse
+import http.client
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+
+PASSWORD = datagen.PASSWORD
+
+CONFIGS = [
+    # (назва, потоків у воркері, WORKER_THREADS)
+    ("4 потоки", 4, None),
+    ("4 потоки + ліміт", 4, 4),
+    ("32 потоки + ліміт", 32, 32),
+]
+
+
+def config_for(db_uri, worker_threads):
+    import config
+    from production import ProductionConfig
+
+    config.Config.SQLALCHEMY_DATABASE_URI = db_uri
+    config.Config.MAIL_SUPPRESS_SEND = True
+
+    class BenchConfig(ProductionConfig):
+        WORKER_THREADS = worker_threads
+    return BenchConfig
+
+
+def serve(db_uri, threads, worker_threads, ports, active, peak):
+    """Процес-воркер: accept в одному потоці, запити - в пулі з threads потоків."""
+    from werkzeug.serving import BaseWSGIServer
+    from main import create_app
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    app = create_app(config_for(db_uri, worker_threads))
+    wsgi_app = app.wsgi_app
+
+    def counted(environ, start_response):
+        if environ["PATH_INFO"] == "/stream":
+            return wsgi_app(environ, start_response)
+        with active.get_lock():
+            active.value += 1
+            peak.value = max(peak.value, active.value)
+        try:
+            return wsgi_app(environ, start_response)
+        finally:
+            with active.get_lock():
+                active.value -= 1
+
+    app.wsgi_app = counted
+
+    class PoolServer(BaseWSGIServer):
+        pool = ThreadPoolExecutor(threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self.process_request_thread, request, client_address)
+
+        def process_request_thread(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    server = PoolServer("127.0.0.1", 0, app)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def request(port, method, path, data=None, cookie=None, timeout=60):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    headers = {}
+    body = None
+    if data is not None:
+        body = urllib.parse.urlencode(data)
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    if cookie:
+        headers["Cookie"] = cookie
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status, response.getheader("Set-Cookie")
+    finally:
+        conn.close()
+
+
+def login(port, username):
+    _, set_cookie = request(port, "POST", "/login", {"username": username, "password": PASSWORD})
+    return "session=" + SimpleCookie(set_cookie)["session"].value
+
+
+def open_stream(port, cookie, stop, opened):
+    """Вкладка календаря: тримає /stream відкритим, поки не stop."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+    try:
+        conn.request("GET", "/stream", headers={"Cookie": cookie})
+        response = conn.getresponse()
+        opened.append(response.status)
+        while response.status == 200 and not stop.is_set():
+            try:
+                line = response.fp.readline()
+            except OSError:
+                continue
+            if not line:
+                # понад ліміт сервер шле лише retry: і закриває потік
+                opened.append("closed")
+                break
+    except OSError:
+        opened.append("timeout")
+    finally:
+        conn.close()
+
+
+def client(index, port, cookie, count, timeout, results):
+    timings, errors = [], {}
+    today = date.today()
+    for i in range(count):
+        kind = i % 5
+        number = f"IO-{index}-{i - 1}"
+        if kind == 0:
+            method, path, data = "GET", f"/month/{today.year}/{today.month}", None
+        elif kind == 1:
+            method, path, data = "GET", f"/day/{(today + timedelta(days=i)).isoformat()}", None
+        elif kind == 2:
+            method, path, data = "GET", "/contracts", None
+        elif kind == 3:
+            method, path = "POST", "/add_contract"
+            data = {"number": f"IO-{index}-{i}", "client": "IO Client", "client_email": "io@example.com",
+                    "amount": "12000", "start_date": today.isoformat(), "duration": "12"}
+        else:
+            method, path, data = "POST", "/cancel_contract", {"query": number}
+        started = time.perf_counter()
+        try:
+            status, _ = request(port, method, path, data, cookie, timeout)
+        except OSError as e:
+            status = "timeout" if isinstance(e, TimeoutError) else type(e).__name__
+        timings.append((time.perf_counter() - started) * 1000)
+        if not isinstance(status, int) or status >= 400:
+            errors[status] = errors.get(status, 0) + 1
+    results.append((timings, errors))
+
+
+def run(db_uri, threads, worker_threads, usernames, args):
+    ports_queue = multiprocessing.Queue()
+    active, peak = multiprocessing.Value("i", 0), multiprocessing.Value("i", 0)
+    process = multiprocessing.Process(target=serve, daemon=True,
+                                      args=(db_uri, threads, worker_threads, ports_queue, active, peak))
+    process.start()
+    port = ports_queue.get(timeout=30)
+    cookies = [login(port, username) for username in usernames]
+
+    stop, opened = threading.Event(), []
+    streams = [threading.Thread(target=open_stream, args=(port, cookies[i % len(cookies)], stop, opened), daemon=True)
+               for i in range(args.streams)]
+    for stream in streams:
+        stream.start()
+        time.sleep(0.05)
+    time.sleep(0.5)
+
+    results = []
+    clients = [threading.Thread(target=client, args=(i, port, cookies[i % len(cookies)],
+                                                     args.requests, args.timeout, results))
+               for i in range(args.clients)]
+    started = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    process.terminate()
+    process.join()
+
+    timings = sorted(t for result_timings, _ in results for t in result_timings)
+    errors = {}
+    for _, result_errors in results:
+        for status, n in result_errors.items():
+            errors[status] = errors.get(status, 0) + n
+    failed = sum(errors.values())
+    return {
+        "streams": opened.count(200) - opened.count("closed"),
+        "ok": len(timings) - failed,
+        "rps": (len(timings) - failed) / elapsed,
+        "p50": statistics.median(timings),
+        "p95": timings[int(0.95 * (len(timings) - 1))],
+        "peak": peak.value,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=8, help="відкритих вкладок (/stream) на воркер")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=20, help="запитів на клієнта")
+    parser.add_argument("--timeout", type=float, default=10.0, help="секунд на відповідь")
+    parser.add_argument("--users", type=int, default=4)
+    args = parser.parse_args()
+
+    db_path = datagen.use_temp_database("bench_io_routes.db")
+    db_uri = f"sqlite:///{db_path}"
+
+    from main import create_app
+    from models import db
+
+    app = create_app(config_for(db_uri, None))
+    with app.app_context():
+        usernames = datagen.seed(args.users, 200, 2000)
+        db.engine.dispose()   # воркери відкривають власні з'єднання
+
+    print(f"Вкладок з /stream: {args.streams}, клієнтів: {args.clients}, запитів на клієнта: {args.requests}, "
+          f"тайм-аут {args.timeout:.0f} с\n")
+    print(f"{'конфігурація':<20}{'/stream':>8}{'успішно':>9}{'запитів/с':>11}{'p50, мс':>10}{'p95, мс':>10}"
+          f"{'пік':>5}  помилки")
+    for name, threads, worker_threads in CONFIGS:
+        r = run(db_uri, threads, worker_threads, usernames, args)
+        errors = ", ".join(f"{k}: {v}" for k, v in r["errors"].items()) or "немає"
+        print(f"{name:<20}{r['streams']:>8}{r['ok']:>9}{r['rps']:>11.1f}{r['p50']:>10.1f}{r['p95']:>10.1f}"
+              f"{r['peak']:>5}  {errors}")
+
+
+if __name__ == "__main__":
+    main()
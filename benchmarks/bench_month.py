@@ -0,0 +1,106 @@
+"""Бенчмарк сторінки місяця: кількість SQL-запитів і час відповіді.
+
+Запуск:  python benchmarks/bench_month.py [--events 10000 100000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+DB_FILE = os.path.join(tempfile.mkdtemp(), "bench_month.db")
+config.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{DB_FILE}"
+config.Config.MAIL_SUPPRESS_SEND = True
+
+from sqlalchemy import event as sa_event, insert
+
+from main import app, page_cache
+from models import db, User, Event
+import migrations
+
+# Події розкидані на 3 роки навколо сьогоднішнього дня
+SPREAD_DAYS = 3 * 365
+
+
+def seed(user_id, count, rng):
+    start = date.today() - timedelta(days=SPREAD_DAYS // 2)
+    batch = []
+    for i in range(count):
+        batch.append({
+            "title": f"Подія {i}",
+            "description": "benchmark",
+            "date": start + timedelta(days=rng.randrange(SPREAD_DAYS)),
+            "user_id": user_id,
+            "priority": rng.choice(["low", "medium", "high"]),
+            "event_type": "general",
+        })
+        if len(batch) == 5000:
+            db.session.execute(insert(Event), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Event), batch)
+    db.session.commit()
+
+
+def run(count, repeat):
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        user = User(username=f"bench{count}", email=f"bench{count}@example.com")
+        user.set_password("bench")
+        db.session.add(user)
+        db.session.commit()
+        seed(user.id, count, random.Random(count))
+        engine = db.engine
+
+    client = app.test_client()
+    client.post("/login", data={"username": f"bench{count}", "password": "bench"})
+
+    today = date.today()
+    url = f"/month/{today.year}/{today.month}"
+
+    statements = []
+
+    def count_statement(*args):
+        statements.append(1)
+
+    client.get(url)  # прогрів
+    sa_event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        # cold - кеш відрендерених сторінок очищується перед кожним запитом
+        for mode, clear_cache in (("cold", True), ("cached", False)):
+            timings = []
+            for _ in range(repeat):
+                if clear_cache:
+                    page_cache.clear()
+                statements.clear()
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.status_code
+
+            print(f"{count:>8} подій | {mode:<6} | запитів: {len(statements):>2} | "
+                  f"median {statistics.median(timings):7.2f} ms | "
+                  f"max {max(timings):7.2f} ms")
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", count_statement)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    for count in args.events:
+        run(count, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
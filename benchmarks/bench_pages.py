@@ -0,0 +1,118 @@
+"""Вага сторінок і час першого рендеру.
+
+Для кожної сторінки: байти HTML, байти HTML "по дроту" (Accept-Encoding: gzip),
+байти статики, на яку посилається сторінка, і скільки всього завантажує
+перший та повторний перегляд (статика з відбитком на повторному вже в кеші).
+
+Час першого рендеру - перший запит щойно запущеного воркера: шаблони ще
+не скомпільовані. Міряється двічі - з порожнім і з заповненим кешем байткоду
+Jinja (якщо він увімкнений).
+
+Запуск:  python benchmarks/bench_pages.py [--repeat 5]
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+
+datagen.use_temp_database("bench_pages.db")
+
+from main import app, page_cache
+from models import Event
+
+ASSET = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+
+
+def pages(event_id):
+    today = date.today()
+    return [
+        ("login", "/login", False),
+        ("register", "/register", False),
+        ("home", "/", True),
+        ("month", f"/month/{today.year}/{today.month}", True),
+        ("day", f"/day/{today.isoformat()}", True),
+        ("contracts", "/contracts", True),
+        ("edit_event", f"/edit/{event_id}", True),
+    ]
+
+
+def weigh(client, url):
+    page_cache.clear()
+    html = client.get(url).get_data()
+    page_cache.clear()
+    wire = client.get(url, headers={"Accept-Encoding": "gzip"})
+    wire_bytes = len(wire.get_data())
+
+    assets = 0
+    for asset in set(ASSET.findall(html.decode("utf-8"))):
+        with client.get(asset, headers={"Accept-Encoding": "gzip"}) as response:
+            assets += len(response.get_data())
+    return {
+        "html": len(html),
+        "wire": wire_bytes,
+        "assets": assets,
+        "first_view": wire_bytes + assets,
+        # статика з відбитком на повторному перегляді береться з кешу браузера
+        "repeat_view": wire_bytes,
+    }
+
+
+def first_render(client, url, repeat):
+    """Час запиту, перед яким скинуто скомпільовані шаблони (як у нового воркера)."""
+    timings = []
+    for _ in range(repeat):
+        app.jinja_env.cache.clear()
+        page_cache.clear()
+        started = time.perf_counter()
+        client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with app.app_context():
+        usernames = datagen.seed(1, 200, 2000)
+        event_id = Event.query.filter(Event.date >= date.today()).first().id
+
+    anonymous = app.test_client()
+    client = app.test_client()
+    client.post("/login", data={"username": usernames[0], "password": datagen.PASSWORD})
+    client.get("/")  # забираємо flash-повідомлення про вхід
+
+    bytecode_cache = app.jinja_env.bytecode_cache
+    print(f"Кеш байткоду Jinja: {'увімкнений' if bytecode_cache else 'вимкнений'}\n")
+    print(f"{'сторінка':<12}{'HTML':>9}{'gzip':>9}{'статика':>9}{'1-й перегляд':>14}{'повторний':>11}"
+          f"{'рендер, мс':>12}{'з кешем':>9}")
+
+    totals = {"first_view": 0, "repeat_view": 0}
+    for name, url, login in pages(event_id):
+        c = client if login else anonymous
+        weight = weigh(c, url)
+        for key in totals:
+            totals[key] += weight[key]
+
+        if bytecode_cache is not None:
+            bytecode_cache.clear()
+        cold = first_render(c, url, 1)
+        warm = first_render(c, url, args.repeat) if bytecode_cache is not None else cold
+
+        print(f"{name:<12}{weight['html']:>9}{weight['wire']:>9}{weight['assets']:>9}"
+              f"{weight['first_view']:>14}{weight['repeat_view']:>11}{cold:>12.1f}{warm:>9.1f}")
+
+    print(f"\nРазом за обхід усіх сторінок: перший {totals['first_view']} байт, "
+          f"повторний {totals['repeat_view']} байт")
+
+
+if __name__ == "__main__":
+    main()
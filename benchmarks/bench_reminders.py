@@ -0,0 +1,60 @@
+"""Розсилка нагадувань про платежі на великій базі.
+
+Вікно в місяць: кожен активний договір дає рівно один платіж, тож
+--users x --contracts - це кількість платежів, для яких треба скласти
+листи. Міряються час першого запуску, повторного (за журналом він не має
+поставити жодного листа) і, окремим проходом, пік пам'яті Python.
+
+Запуск:  python benchmarks/bench_reminders.py [--users 20] [--contracts 10000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+
+datagen.use_temp_database("bench_reminders.db")
+
+from main import app
+from models import db, OutboxMessage, ReminderLog
+import reminders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--contracts", type=int, default=10_000, help="договорів на користувача")
+    args = parser.parse_args()
+
+    with app.app_context():
+        started = time.perf_counter()
+        datagen.seed(args.users, args.contracts, 0)
+        print(f"Користувачів: {args.users}, договорів: {args.users * args.contracts}, "
+              f"заповнення бази: {time.perf_counter() - started:.1f} с\n")
+
+        today = date.today()
+        for run in ("перший запуск", "повторний"):
+            db.session.remove()
+            report = reminders.send_reminders(today, days=30)
+            print(f"{run:<16}{report.seconds:>8.2f} с  платежів: {report.payments}, листів: {report.digests}, "
+                  f"уже нагадано: {report.already_sent}")
+        print(f"\nУ черзі листів: {OutboxMessage.query.count()}, у журналі: {ReminderLog.query.count()}")
+
+        # пам'ять окремим проходом: tracemalloc сповільнює сам запуск у рази
+        db.session.execute(db.delete(ReminderLog))
+        db.session.execute(db.delete(OutboxMessage))
+        db.session.commit()
+        tracemalloc.start()
+        reminders.send_reminders(today, days=30)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"Пік пам'яті Python за перший запуск: {peak / 2**20:.1f} МБ")
+
+
+if __name__ == "__main__":
+    main()
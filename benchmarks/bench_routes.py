@@ -0,0 +1,189 @@
+"""Бенчмарк маршрутів через тестовий клієнт Flask: p50/p95, кількість SQL-запитів,
+пікова пам'ять. Результати пишуться в JSON, який потім можна використати як базовий.
+
+Запуск:
+    python benchmarks/bench_routes.py --output baseline.json
+    python benchmarks/bench_routes.py --compare baseline.json --threshold 0.25
+
+У режимі порівняння скрипт завершується з кодом 1, якщо p95 маршруту виріс
+більше ніж на threshold або маршрут став робити більше SQL-запитів.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+
+datagen.use_temp_database("bench_routes.db")
+
+from sqlalchemy import event as sa_event
+
+from main import app, page_cache
+from models import db
+
+
+def routes():
+    """(назва, метод, URL або функція, що повертає (URL, дані форми))."""
+    today = date.today()
+    counter = itertools.count()
+
+    def new_contract():
+        n = next(counter)
+        return "/add_contract", {
+            "number": f"BENCH-{n}", "client": "Bench Client", "client_email": "bench@example.com",
+            "amount": "12000", "start_date": today.isoformat(), "duration": "12",
+        }
+
+    def new_event():
+        return "/add", {"title": f"Bench {next(counter)}", "date": today.isoformat(), "priority": "medium"}
+
+    return [
+        ("home", "GET", "/"),
+        ("month", "GET", f"/month/{today.year}/{today.month}"),
+        ("day", "GET", f"/day/{today.isoformat()}"),
+        ("contracts", "GET", "/contracts"),
+        ("contracts_search", "GET", "/contracts?q=шевч"),
+        ("add_contract", "POST", new_contract),
+        ("add_event", "POST", new_event),
+    ]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def request(client, method, target):
+    if callable(target):
+        url, data = target()
+        return client.open(url, method=method, data=data)
+    return client.open(target, method=method)
+
+
+def measure(client, engine, method, target, repeat):
+    statements = []
+
+    def count_statement(*args):
+        statements.append(1)
+
+    request(client, method, target)  # прогрів
+
+    timings = []
+    sa_event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        for _ in range(repeat):
+            # міряємо рендер, а не кеш сторінок
+            page_cache.clear()
+            started = time.perf_counter()
+            response = request(client, method, target)
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code < 400, (target, response.status_code)
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", count_statement)
+
+    # пам'ять окремим проходом, бо tracemalloc сповільнює запити
+    page_cache.clear()
+    tracemalloc.start()
+    try:
+        request(client, method, target)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "statements": round(len(statements) / repeat, 2),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run(args):
+    with app.app_context():
+        usernames = datagen.seed(args.users, args.contracts, args.events)
+        engine = db.engine
+
+    client = app.test_client()
+    client.post("/login", data={"username": usernames[0], "password": datagen.PASSWORD})
+
+    results = {}
+    for name, method, target in routes():
+        results[name] = measure(client, engine, method, target, args.repeat)
+        r = results[name]
+        print(f"{name:<18} p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  "
+              f"SQL {r['statements']:5.1f}  peak {r['peak_kb']:9.1f} KB")
+
+    return {
+        "meta": {
+            "users": args.users,
+            "contracts": args.contracts,
+            "events": args.events,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "routes": results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """Повертає список регресій відносно базового прогону."""
+    regressions = []
+    for name, base in baseline["routes"].items():
+        now = current["routes"].get(name)
+        if now is None:
+            continue
+        if now["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {base['p95_ms']:.2f} -> {now['p95_ms']:.2f} ms")
+        if now["statements"] > base["statements"]:
+            regressions.append(f"{name}: SQL-запитів {base['statements']} -> {now['statements']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--contracts", type=int, default=1000, help="договорів на користувача")
+    parser.add_argument("--events", type=int, default=10_000, help="подій на користувача")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--output", help="записати результати в цей JSON")
+    parser.add_argument("--compare", help="базовий JSON для порівняння")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="допустимий ріст p95 (0.25 = +25%%)")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        # порівнюємо на тих самих даних, що й базовий прогін
+        for key in ("users", "contracts", "events"):
+            setattr(args, key, baseline["meta"][key])
+
+    current = run(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print("\nРегресії:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print("\nРегресій немає.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Бенчмарк пошуку договорів: LIKE '%q%' проти FTS5.
+
+Запуск:  python benchmarks/bench_search.py [--contracts 100000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+DB_FILE = os.path.join(tempfile.mkdtemp(), "bench_search.db")
+config.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{DB_FILE}"
+
+from sqlalchemy import insert
+
+from main import app
+from models import db, User, Contract
+import migrations
+import search
+
+SURNAMES = ["Шевченко", "Коваленко", "Бондаренко", "Ткаченко", "Кравчук", "Олійник",
+            "Мельник", "Шевчук", "Поліщук", "Лисенко", "Петренко", "Савченко"]
+COMPANIES = ["ТОВ", "ФОП", "ПП", "АТ"]
+QUERIES = ["шевч", "Коваленко", "тов мельн", "ЛЗ-2026/0123", "неіснуючий"]
+
+
+def seed(user_id, count, rng):
+    batch = []
+    for i in range(count):
+        batch.append({
+            "number": f"ЛЗ-{2020 + i % 7}/{i:05d}",
+            "client_name": f"{rng.choice(COMPANIES)} {rng.choice(SURNAMES)} {rng.randrange(1000)}",
+            "client_email": f"client{i}@example.com",
+            "amount": 1000.0,
+            "start_date": date(2026, 1, 1),
+            "duration_months": 12,
+            "end_date": date(2026, 12, 1),
+            "user_id": user_id,
+        })
+        if len(batch) == 5000:
+            db.session.execute(insert(Contract), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Contract), batch)
+    db.session.commit()
+
+
+def measure(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--contracts", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        user = User(username="bench", email="bench@example.com")
+        db.session.add(user)
+        db.session.commit()
+        seed(user.id, args.contracts, random.Random(1))
+
+        print(f"{args.contracts} договорів")
+        print(f"{'запит':<16} {'LIKE, ms':>10} {'рядків':>8} {'FTS5, ms':>10} {'рядків':>8}")
+        for query in QUERIES:
+            like_ms, like_rows = measure(lambda: search._search_like(user.id, query, None), args.repeat)
+            fts_ms, fts_rows = measure(lambda: search._search_fts(user.id, query, search.SEARCH_LIMIT), args.repeat)
+            print(f"{query:<16} {like_ms:>10.2f} {like_rows:>8} {fts_ms:>10.2f} {fts_rows:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Холодний старт: імпорт main і час до першої відповіді.
+
+Кожен замір - новий процес Python (як воркер gunicorn чи команда flask):
+  * python -X importtime -c "import main" - сумарний час імпорту і
+    найдорожчі модулі;
+  * від запуску інтерпретатора до відповіді на GET /login: імпорт,
+    create_app і перший запит окремо.
+Заодно перевіряється, що імпорт main не має побічних ефектів: у робочій
+теці не з'являється файлів (analytics.log), а NumPy не завантажується.
+
+З --check скрипт завершується з кодом 1, якщо медіана перевищує бюджет
+або імпорт має побічні ефекти (так його запускають тести).
+
+Запуск:  python benchmarks/bench_startup.py [--repeat 5] [--top 10] [--check]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = 1500          # import main (сума -X importtime)
+FIRST_REQUEST_BUDGET_MS = 3000   # від запуску процесу до першої відповіді
+LAZY_MODULES = ["numpy", "sqlalchemy.dialects.postgresql"]
+
+CHILD = """
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, os.path.join(sys.argv[1], "benchmarks"))
+import datagen
+datagen.use_temp_database("bench_startup.db")
+import main
+imported = time.perf_counter()
+side_effects = {"files": sorted(os.listdir(".")),
+                "modules": [m for m in sys.argv[2:] if m in sys.modules]}
+app = main.app
+created = time.perf_counter()
+status = app.test_client().get("/login").status_code
+served = time.perf_counter()
+print(json.dumps(dict(side_effects, status=status,
+                      import_ms=(imported - started) * 1000,
+                      create_ms=(created - imported) * 1000,
+                      request_ms=(served - created) * 1000)))
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    return env
+
+
+def import_profile():
+    """(сумарний час імпорту main в мс, [(мс, модуль)] за власним часом)."""
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                                cwd=cwd, env=_env(), capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        modules.append((int(self_us) / 1000, name.strip()))
+    return sum(ms for ms, _ in modules), sorted(modules, reverse=True)
+
+
+def first_request():
+    """Один холодний старт: загальний час від запуску процесу і фази з дочірнього процесу."""
+    with tempfile.TemporaryDirectory() as cwd:
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", CHILD, ROOT, *LAZY_MODULES],
+                                cwd=cwd, env=_env(), capture_output=True, text=True, check=True)
+        total_ms = (time.perf_counter() - started) * 1000
+    phases = json.loads(result.stdout.splitlines()[-1])
+    phases["total_ms"] = total_ms
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--check", action="store_true", help="Код виходу 1 при перевищенні бюджету.")
+    args = parser.parse_args()
+
+    profiles = [import_profile() for _ in range(args.repeat)]
+    import_ms = statistics.median(total for total, _ in profiles)
+    print(f"import main (-X importtime): {import_ms:.0f} мс (бюджет {IMPORT_BUDGET_MS} мс)")
+    print("Найдорожчі модулі (власний час, останній замір):")
+    for ms, name in profiles[-1][1][:args.top]:
+        print(f"  {ms:8.1f} мс  {name}")
+
+    runs = [first_request() for _ in range(args.repeat)]
+    median = {key: statistics.median(run[key] for run in runs)
+              for key in ("import_ms", "create_ms", "request_ms", "total_ms")}
+    print(f"\nДо першої відповіді: {median['total_ms']:.0f} мс (бюджет {FIRST_REQUEST_BUDGET_MS} мс)")
+    print(f"  імпорт main {median['import_ms']:.0f} мс, create_app {median['create_ms']:.0f} мс, "
+          f"перший запит {median['request_ms']:.0f} мс, решта - запуск інтерпретатора")
+
+    problems = []
+    if import_ms > IMPORT_BUDGET_MS:
+        problems.append(f"імпорт {import_ms:.0f} мс > {IMPORT_BUDGET_MS} мс")
+    if median["total_ms"] > FIRST_REQUEST_BUDGET_MS:
+        problems.append(f"перша відповідь {median['total_ms']:.0f} мс > {FIRST_REQUEST_BUDGET_MS} мс")
+    for run in runs:
+        if run["status"] != 200:
+            problems.append(f"GET /login повернув {run['status']}")
+        if run["files"]:
+            problems.append(f"імпорт main створив файли: {', '.join(run['files'])}")
+        if run["modules"]:
+            problems.append(f"імпорт main завантажив: {', '.join(run['modules'])}")
+    for problem in dict.fromkeys(problems):
+        print(f"ПОРУШЕННЯ: {problem}")
+    if args.check and problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
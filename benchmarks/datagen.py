@@ -0,0 +1,102 @@
+"""Генератор синтетичних даних для бенчмарків.
+
+Використання в скрипті бенчмарку (до імпорту main):
+
+    import datagen
+    datagen.use_temp_database("bench_routes.db")
+    from main import app
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+SURNAMES = ["Шевченко", "Коваленко", "Бондаренко", "Ткаченко", "Кравчук", "Олійник",
+            "Мельник", "Шевчук", "Поліщук", "Лисенко", "Петренко", "Савченко"]
+COMPANIES = ["ТОВ", "ФОП", "ПП", "АТ"]
+DURATIONS = [6, 12, 24, 36, 60, 120]
+PASSWORD = "bench"
+BATCH = 5000
+
+
+def use_temp_database(name):
+    """Перенаправляє застосунок на окремий файл SQLite. Викликати до імпорту main."""
+    import config
+
+    path = os.path.join(tempfile.mkdtemp(), name)
+    config.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+    config.Config.MAIL_SUPPRESS_SEND = True
+    return path
+
+
+def _insert(model, rows):
+    from sqlalchemy import insert
+    from models import db
+
+    for i in range(0, len(rows), BATCH):
+        db.session.execute(insert(model), rows[i:i + BATCH])
+
+
+def seed_user(username, contracts, events, rng, spread_days=3 * 365):
+    """Створює користувача з contracts договорами та events подіями навколо сьогодні."""
+    from models import db, User, Event, Contract
+    from schedules import schedule_end_date
+    import stats
+
+    user = User(username=username, email=f"{username}@example.com")
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.flush()
+
+    start = date.today() - timedelta(days=spread_days // 2)
+
+    contract_rows = []
+    for i in range(contracts):
+        start_date = start + timedelta(days=rng.randrange(spread_days))
+        duration = rng.choice(DURATIONS)
+        contract_rows.append({
+            "number": f"ЛЗ-{start_date.year}/{i:06d}",
+            "client_name": f"{rng.choice(COMPANIES)} {rng.choice(SURNAMES)} {rng.randrange(1000)}",
+            "client_email": f"client{i}@example.com",
+            "amount": float(rng.randrange(10_000, 1_000_000)),
+            "start_date": start_date,
+            "duration_months": duration,
+            "end_date": schedule_end_date(start_date, duration),
+            "user_id": user.id,
+        })
+    _insert(Contract, contract_rows)
+
+    event_rows = [{
+        "title": f"Подія {i}",
+        "description": "benchmark",
+        "date": start + timedelta(days=rng.randrange(spread_days)),
+        "user_id": user.id,
+        "priority": rng.choice(["low", "medium", "high"]),
+        "event_type": "general",
+    } for i in range(events)]
+    _insert(Event, event_rows)
+
+    stats.rebuild(user.id)
+    db.session.commit()
+    return user.id
+
+
+def seed(users, contracts, events, seed_value=42):
+    """N користувачів x M договорів x K подій. Повертає логіни користувачів."""
+    import migrations
+    from models import db
+
+    rng = random.Random(seed_value)
+    db.drop_all()
+    migrations.upgrade()
+    usernames = []
+    for n in range(users):
+        username = f"bench{n}"
+        seed_user(username, contracts, events, rng)
+        usernames.append(username)
+    return usernames
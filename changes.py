@@ -0,0 +1,184 @@
+from datetime import datetime
+
+from models import (db, ChangeLog, Contract, Event, ScheduleException, UserStats,
+                    ArchivedContract, ArchivedEvent, ArchivedScheduleException)
+from pagination import encode_cursor, decode_cursor
+import stats
+
+
+# === ЖУРНАЛ ЗМІН ДЛЯ СИНХРОНІЗАЦІЇ (GET /sync?since=<курсор>) ===
+# Кожен запис події чи договору отримує наступний номер seq у журналі
+# свого користувача (лічильник UserStats.change_seq). У журналі один рядок
+# на об'єкт - його остання зміна, видалені лишаються "надгробками"
+# (deleted=True). Тож клієнт, що пам'ятає курсор, отримує лише те, що
+# змінилось після нього, і кожен об'єкт не більше одного разу - обсяг
+# синхронізації залежить від кількості змін, а не від розміру календаря.
+#
+# Лічильник оновлюється в тій самій транзакції, що й дані: рядок
+# UserStats блокується до коміту, тож номери одного користувача
+# з'являються в базі по зростанню і курсор нічого не пропускає.
+#
+# Перенесений чи видалений платіж з графіка (ScheduleException) - це зміна
+# договору: у даних договору є список skipped.
+#
+# Перенесення в архів (archive.py) - не зміна: номерів не отримує, а дані
+# перенесених подій і договорів читаються з архівних таблиць.
+
+EVENT, CONTRACT = 'event', 'contract'
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 1000
+
+
+def _allocate(user_id, count):
+    """Резервує count номерів поспіль, повертає перший з них."""
+    stmt = stats.dialect_insert(UserStats).values(user_id=user_id, change_seq=count)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={'change_seq': UserStats.change_seq + stmt.excluded.change_seq}
+    ).returning(UserStats.change_seq)
+    return db.session.execute(stmt).scalar_one() - count + 1
+
+
+def _record(user_id, items):
+    """items - (сутність, id, видалено?); одним резервуванням номерів і одним INSERT."""
+    items = list({(entity, entity_id): deleted for entity, entity_id, deleted in items}.items())
+    if not items:
+        return
+    first = _allocate(user_id, len(items))
+    now = datetime.utcnow()
+    stmt = stats.dialect_insert(ChangeLog)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'entity', 'entity_id'],
+        set_={'seq': stmt.excluded.seq, 'deleted': stmt.excluded.deleted,
+              'changed_at': stmt.excluded.changed_at}
+    )
+    db.session.execute(stmt, [
+        {'user_id': user_id, 'entity': entity, 'entity_id': entity_id,
+         'seq': first + i, 'deleted': deleted, 'changed_at': now}
+        for i, ((entity, entity_id), deleted) in enumerate(items)
+    ])
+
+
+def events_saved(user_id, *ids):
+    _record(user_id, ((EVENT, i, False) for i in ids))
+
+
+def events_deleted(user_id, *ids):
+    _record(user_id, ((EVENT, i, True) for i in ids))
+
+
+def events_changed(user_id, saved=(), deleted=()):
+    """Пачка змін подій (batch.py) одним записом у журнал."""
+    _record(user_id, [(EVENT, i, False) for i in saved] + [(EVENT, i, True) for i in deleted])
+
+
+def contracts_saved(user_id, *ids):
+    _record(user_id, ((CONTRACT, i, False) for i in ids))
+
+
+def contract_removed(contract):
+    """Викликати до видалення договору: надгробки для нього і його подій (їх видалить каскад)."""
+    event_ids = db.session.scalars(db.select(Event.id).where(Event.contract_id == contract.id)).all()
+    _record(contract.user_id, [(EVENT, i, True) for i in event_ids] + [(CONTRACT, contract.id, True)])
+
+
+# === ЧИТАННЯ ЗМІН ===
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _event_data(event):
+    return {
+        'title': event.title,
+        'description': event.description,
+        'date': _iso(event.date),
+        'priority': event.priority,
+        'event_type': event.event_type,
+        'contract_id': event.contract_id,
+        'occurrence': event.occurrence,
+        'created_at': _iso(event.created_at),
+        'updated_at': _iso(event.updated_at),
+    }
+
+
+def _contract_data(contract, skipped):
+    return {
+        'number': contract.number,
+        'client_name': contract.client_name,
+        'client_email': contract.client_email,
+        'amount': contract.amount,
+        'start_date': _iso(contract.start_date),
+        'duration_months': contract.duration_months,
+        'end_date': _iso(contract.end_date),
+        'virtual_schedule': contract.virtual_schedule,
+        'skipped': sorted(skipped),
+        'created_at': _iso(contract.created_at),
+        'updated_at': _iso(contract.updated_at),
+    }
+
+
+def limit_arg(value):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def since(user_id, cursor=None, limit=DEFAULT_LIMIT):
+    """Зміни після курсора (None - від початку). Повертає
+    (зміни, курсор для наступного запиту, чи є ще зміни).
+    ValueError, якщо курсор пошкоджений."""
+    seq = 0
+    if cursor:
+        _, (seq,) = decode_cursor(cursor, (int,))
+
+    rows = db.session.execute(
+        db.select(ChangeLog.entity, ChangeLog.entity_id, ChangeLog.seq, ChangeLog.deleted)
+        .where(ChangeLog.user_id == user_id, ChangeLog.seq > seq)
+        .order_by(ChangeLog.seq)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    wanted = {EVENT: [], CONTRACT: []}
+    for row in rows:
+        if not row.deleted:
+            wanted[row.entity].append(row.entity_id)
+    events, contracts, skipped = {}, {}, {}
+    for event_model, contract_model, exception_model in ((Event, Contract, ScheduleException),
+                                                         (ArchivedEvent, ArchivedContract, ArchivedScheduleException)):
+        # в архіві шукаємо лише те, чого вже немає в гарячих таблицях
+        event_ids = [i for i in wanted[EVENT] if i not in events]
+        contract_ids = [i for i in wanted[CONTRACT] if i not in contracts]
+        if event_ids:
+            events.update((e.id, e) for e in db.session.scalars(
+                db.select(event_model).where(event_model.user_id == user_id, event_model.id.in_(event_ids))))
+        if contract_ids:
+            contracts.update((c.id, c) for c in db.session.scalars(
+                db.select(contract_model).where(contract_model.user_id == user_id,
+                                                contract_model.id.in_(contract_ids))))
+            for contract_id, occurrence in db.session.execute(
+                    db.select(exception_model.contract_id, exception_model.occurrence)
+                    .where(exception_model.contract_id.in_(contract_ids))):
+                skipped.setdefault(contract_id, []).append(occurrence)
+
+    result = []
+    for row in rows:
+        change = {'entity': row.entity, 'id': row.entity_id, 'seq': row.seq}
+        obj = (events if row.entity == EVENT else contracts).get(row.entity_id)
+        if row.deleted or obj is None:
+            # рядок міг зникнути без надгробка (каскад від видалення користувача)
+            change['deleted'] = True
+        elif row.entity == EVENT:
+            change['deleted'] = False
+            change['data'] = _event_data(obj)
+        else:
+            change['deleted'] = False
+            change['data'] = _contract_data(obj, skipped.get(obj.id, ()))
+        result.append(change)
+
+    next_seq = rows[-1].seq if rows else seq
+    return result, encode_cursor('n', (next_seq,)), has_more
@@ -0,0 +1,54 @@
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli - необов'язкова залежність, без неї лише gzip
+    brotli = None
+
+
+# === СТИСНЕННЯ ВІДПОВІДЕЙ ===
+# HTML і JSON стискаються перед відправкою: brotli, якщо він встановлений і
+# браузер його приймає, інакше gzip. Статичні файли (direct_passthrough) і
+# потокові відповіді (.ics) не чіпаємо.
+
+MIN_SIZE = 500
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5   # вищі рівні помітно повільніші, а виграш малий
+MIMETYPES = {'text/html', 'application/json', 'text/plain'}
+
+
+def _encoding():
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in MIMETYPES or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _encoding()
+    data = response.get_data()
+    if encoding is None or len(data) < MIN_SIZE:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # стиснене тіло - інше представлення, тож ETag лише слабкий
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    app.after_request(_compress_response)
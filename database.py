@@ -0,0 +1,87 @@
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from models import db
+
+
+# === НАЛАШТУВАННЯ З'ЄДНАНЬ З БАЗОЮ ===
+# SQLite: прагми на кожне нове з'єднання (WAL, busy_timeout ...) і
+# BEGIN IMMEDIATE для запитів, що пишуть. Звичайна (відкладена) транзакція
+# спершу читає, а при першому записі намагається стати транзакцією на
+# запис; якщо інший воркер тим часом щось закомітив, SQLite одразу
+# повертає "database is locked", не чекаючи busy_timeout. IMMEDIATE бере
+# блокування на запис на початку, тож конкуренти просто чекають черги.
+#
+# Серверна база (PostgreSQL, MySQL): параметри пулу з'єднань через
+# SQLALCHEMY_ENGINE_OPTIONS.
+#
+# WORKER_THREADS (потоків у воркері): пул тримає стільки ж з'єднань, щоб
+# потоки не чекали одне одного вже на видачі з'єднання з пулу.
+
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,   # мс, скільки чекати на чуже блокування
+}
+
+SERVER_ENGINE_OPTIONS = {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_timeout': 30,
+    'pool_recycle': 1800,   # з'єднання старші за 30 хв перевідкриваються
+    'pool_pre_ping': True,
+}
+
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+def writes(view):
+    """Позначає GET-маршрут, що пише в базу: його транзакція теж IMMEDIATE."""
+    view.writes_database = True
+    return view
+
+
+def engine_options(config):
+    """Параметри пулу для серверної бази, якщо їх не задано в конфігурації."""
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    threads = config.get('WORKER_THREADS')
+    # база в пам'яті SQLite живе в одному з'єднанні, пулу там немає
+    if threads and uri and make_url(uri).database not in (None, '', ':memory:'):
+        options.setdefault('pool_size', threads)
+    if not uri.startswith('sqlite'):
+        for key, value in SERVER_ENGINE_OPTIONS.items():
+            options.setdefault(key, value)
+    return options
+
+
+def _is_write_request():
+    if not has_request_context():
+        return False
+    if request.method not in SAFE_METHODS:
+        return True
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'writes_database', False)
+
+
+def _install_sqlite_hooks(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        # транзакції відкриває SQLAlchemy (див. _on_begin), а не драйвер
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def _on_begin(conn):
+        conn.exec_driver_sql('BEGIN IMMEDIATE' if _is_write_request() else 'BEGIN')
+
+
+def init_app(app):
+    """Викликати після db.init_app(app)."""
+    pragmas = dict(SQLITE_PRAGMAS, **app.config.get('SQLITE_PRAGMAS', {}))
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite' and engine.dialect.driver == 'pysqlite':
+                _install_sqlite_hooks(engine, pragmas)
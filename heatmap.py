@@ -0,0 +1,124 @@
+import calendar
+from collections import Counter
+from datetime import date
+
+from models import (db, Contract, Event, ScheduleException,
+                    ArchivedContract, ArchivedEvent, ArchivedScheduleException)
+from schedules import add_months, occurrences_between, PaymentInstance
+import archive
+
+
+# === ТЕПЛОВА КАРТА РОКУ ===
+# Кількість подій по днях без завантаження самих подій: події - одним
+# GROUP BY (date, priority, event_type), який SQLite читає з покривного
+# індексу ix_event_user_date_kind; платежі з графіків - з когорт договорів
+# (однакові дата початку і строк), розгорнутих у дати в Python, мінус
+# змінені чи видалені платежі (ScheduleException). Роки до межі архіву
+# (archive.py) так само додатково рахуються з архівних таблиць.
+
+LEVELS = 4   # відтінків на карті, не рахуючи порожнього дня
+FIRST_YEAR, LAST_YEAR = 1970, 2100
+
+
+class DayCounts:
+    def __init__(self):
+        self.total = 0
+        self.priority = Counter()
+        self.type = Counter()
+
+    def add(self, priority, event_type, n):
+        self.total += n
+        self.priority[priority or 'medium'] += n
+        self.type[event_type or 'general'] += n
+
+    def to_dict(self):
+        return {
+            'total': self.total,
+            'priority': {k: v for k, v in self.priority.items() if v},
+            'type': {k: v for k, v in self.type.items() if v},
+        }
+
+
+def _event_counts(user_id, start, end, events=Event):
+    return db.session.execute(
+        db.select(events.date, events.priority, events.event_type, db.func.count())
+        .where(events.user_id == user_id, events.date.between(start, end))
+        .group_by(events.date, events.priority, events.event_type)
+    )
+
+
+def _payment_counts(user_id, start, end, contracts=Contract, exceptions=ScheduleException):
+    """Платежі з графіків по днях: {дата: кількість}."""
+    counts = Counter()
+    cohorts = db.session.execute(
+        db.select(contracts.start_date, contracts.duration_months, db.func.count().label('contracts'))
+        .where(contracts.user_id == user_id, contracts.virtual_schedule.is_(True),
+               contracts.start_date <= end, contracts.end_date >= start)
+        .group_by(contracts.start_date, contracts.duration_months)
+    )
+    for cohort in cohorts:
+        for occurrence in occurrences_between(cohort, start, end):
+            counts[add_months(cohort.start_date, occurrence)] += cohort.contracts
+
+    skipped = db.session.execute(
+        db.select(contracts.start_date, exceptions.occurrence)
+        .join(contracts, exceptions.contract_id == contracts.id)
+        .where(contracts.user_id == user_id, contracts.virtual_schedule.is_(True),
+               contracts.start_date <= end, contracts.end_date >= start)
+    )
+    for start_date, occurrence in skipped:
+        day = add_months(start_date, occurrence)
+        if start <= day <= end:
+            counts[day] -= 1
+    return counts
+
+
+def year_counts(user_id, year):
+    """{дата: DayCounts} для всіх днів року, в яких щось є."""
+    start, end = date(year, 1, 1), date(year, 12, 31)
+    sources = [(start, end, Event, Contract, ScheduleException)]
+    for archived_start, archived_end in archive.archived_ranges(user_id, [(start, end)]):
+        sources.append((archived_start, archived_end, ArchivedEvent, ArchivedContract, ArchivedScheduleException))
+
+    days = {}
+    for first, last, events, contracts, exceptions in sources:
+        for day, priority, event_type, n in _event_counts(user_id, first, last, events):
+            days.setdefault(day, DayCounts()).add(priority, event_type, n)
+        for day, n in _payment_counts(user_id, first, last, contracts, exceptions).items():
+            if n > 0:
+                days.setdefault(day, DayCounts()).add(PaymentInstance.priority, PaymentInstance.event_type, n)
+    return days
+
+
+def level(total, busiest):
+    """Відтінок дня від 0 (порожній) до LEVELS (найзавантаженіший день року)."""
+    if not total:
+        return 0
+    return max(1, -(-total * LEVELS // busiest))
+
+
+def year_grid(year, days, today):
+    """Дванадцять сіток місяців (як на сторінці місяця) з кількістю подій у кожному дні."""
+    busiest = max((c.total for c in days.values()), default=0)
+    cal = calendar.Calendar(firstweekday=0)
+    months = []
+    for month in range(1, 13):
+        cells = []
+        for day_num in cal.itermonthdays(year, month):
+            if not day_num:
+                cells.append(None)
+                continue
+            day = date(year, month, day_num)
+            counts = days.get(day)
+            total = counts.total if counts else 0
+            cells.append({
+                'day': day_num,
+                'full_date': day.isoformat(),
+                'is_today': day == today,
+                'total': total,
+                'high': counts.priority['high'] if counts else 0,
+                'level': level(total, busiest),
+            })
+        months.append({'month': month, 'cells': cells,
+                       'total': sum(c['total'] for c in cells if c)})
+    return months
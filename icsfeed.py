@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+
+from models import (db, Event, Contract, ScheduleException,
+                    ArchivedEvent, ArchivedContract, ArchivedScheduleException)
+from schedules import PaymentInstance, add_months, payment_title, payment_description
+
+
+# === ПІДПИСКА НА КАЛЕНДАР (iCalendar, RFC 5545) ===
+# Стрічка віддається генератором: події та платежі читаються з бази
+# частинами (yield_per) і одразу пишуться у відповідь, тож навіть
+# десятки тисяч подій не збираються в пам'яті цілком.
+
+PRODID = '-//Compact Planner//Calendar Feed//UK'
+UID_DOMAIN = 'compact-planner'
+FETCH_SIZE = 1000          # рядків з бази за раз
+CHUNK_SIZE = 64 * 1024     # стільки символів збираємо перед кожним yield
+
+PRIORITIES = {'high': 1, 'medium': 5, 'low': 9}
+# DTSTAMP обов'язковий; для старих рядків без created_at
+EPOCH = datetime(1970, 1, 1)
+ONE_DAY = timedelta(days=1)
+
+
+def escape_text(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,') \
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def fold(line):
+    """Розбиває рядок на частини до 75 байт (RFC 5545, 3.1), не розрізаючи символи UTF-8."""
+    if len(line.encode('utf-8')) <= 75:
+        return line + '\r\n'
+    parts = []
+    current, size, limit = [], 0, 75
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > limit:
+            parts.append(''.join(current))
+            current, size, limit = [], 0, 74   # продовження починається з пробілу
+        current.append(char)
+        size += width
+    parts.append(''.join(current))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _date(day):
+    return f'{day.year:04d}{day.month:02d}{day.day:02d}'
+
+
+def _stamp(moment):
+    moment = moment or EPOCH
+    return f'{_date(moment)}T{moment.hour:02d}{moment.minute:02d}{moment.second:02d}Z'
+
+
+def vevent(uid, day, summary, description, stamp, priority=None):
+    # короткі службові рядки завжди вміщуються в 75 байт, переносити
+    # доводиться лише текст, що ввів користувач
+    parts = [
+        f'BEGIN:VEVENT\r\nUID:{uid}@{UID_DOMAIN}\r\nDTSTAMP:{_stamp(stamp)}\r\n'
+        f'DTSTART;VALUE=DATE:{_date(day)}\r\nDTEND;VALUE=DATE:{_date(day + ONE_DAY)}\r\n',
+        fold('SUMMARY:' + escape_text(summary)),
+    ]
+    if description:
+        parts.append(fold('DESCRIPTION:' + escape_text(description)))
+    if priority in PRIORITIES:
+        parts.append(f'PRIORITY:{PRIORITIES[priority]}\r\n')
+    parts.append('END:VEVENT\r\n')
+    return ''.join(parts)
+
+
+def _events(user_id, events=Event):
+    rows = db.session.execute(
+        db.select(events.id, events.title, events.description, events.date, events.priority, events.created_at)
+        .where(events.user_id == user_id)
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+    for row in rows:
+        yield vevent(f'event-{row.id}', row.date, row.title, row.description, row.created_at, row.priority)
+
+
+def _payments(user_id, model=Contract, exceptions=ScheduleException):
+    # платежі, які користувач відредагував або видалив
+    skipped = set(db.session.query(
+        exceptions.contract_id, exceptions.occurrence
+    ).join(model).filter(model.user_id == user_id).all())
+
+    contracts = db.session.execute(
+        db.select(model.id, model.user_id, model.number, model.client_name, model.amount,
+                  model.start_date, model.duration_months, model.created_at)
+        .where(model.user_id == user_id, model.virtual_schedule.is_(True))
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+    for contract in contracts:
+        # опис і позначка часу однакові для всіх платежів договору
+        description = payment_description(contract)
+        for occurrence in range(contract.duration_months):
+            if (contract.id, occurrence) in skipped:
+                continue
+            yield vevent(f'payment-{contract.id}-{occurrence}', add_months(contract.start_date, occurrence),
+                         payment_title(contract, occurrence), description, contract.created_at,
+                         PaymentInstance.priority)
+
+
+def iter_feed(user):
+    """Генерує стрічку .ics користувача частинами приблизно по CHUNK_SIZE символів."""
+    header = ''.join(fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text("Compact Planner - " + user.username)}',
+    ])
+    buffer, size = [header], len(header)
+    # стрічка - уся історія, тож і перенесене в архів (archive.py)
+    for source in (_events(user.id), _payments(user.id), _events(user.id, ArchivedEvent),
+                   _payments(user.id, ArchivedContract, ArchivedScheduleException)):
+        for block in source:
+            buffer.append(block)
+            size += len(block)
+            if size >= CHUNK_SIZE:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+    buffer.append('END:VCALENDAR\r\n')
+    yield ''.join(buffer)
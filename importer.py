@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+import math
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from models import db, Contract
+from schedules import schedule_end_date
+import changes
+import stats
+
+
+# === МАСОВИЙ ІМПОРТ ДОГОВОРІВ (CSV / JSONL) ===
+# Файл читається потоково, рядок за рядком, а договори вставляються
+# пачками одним executemany і комітяться частинами. Платежі окремо
+# не вставляються - вони розгортаються з графіка договору (schedules.py).
+# Якщо файл посередині виявився не UTF-8 чи зламаним CSV, імпорт
+# зупиняється: уже вставлене лишається, а помилка йде у звіт.
+
+# ті ж поля, що у формі /add_contract
+FIELDS = ['number', 'client', 'client_email', 'amount', 'start_date', 'duration']
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []  # (номер рядка, повідомлення), не більше MAX_REPORTED_ERRORS
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def __repr__(self):
+        return (f'<ImportReport {self.imported}/{self.rows} imported, '
+                f'{self.failed} failed, {self.rows_per_second:.0f} rows/s>')
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+class StopImport(ValueError):
+    """Файл далі не читається - решту рядків пропущено."""
+
+
+def iter_rows(stream, fmt):
+    """Повертає пари (номер рядка, dict) з бінарного потоку, не читаючи його повністю.
+
+    Замість рядка може прийти виняток: ValueError - рядок зіпсований,
+    StopImport - файл далі не читається, він завжди останній.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    line_no = 0
+    try:
+        if fmt == 'jsonl':
+            for line_no, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_no, ValueError(f'некоректний JSON: {e}')
+                    continue
+                yield line_no, row
+        else:
+            reader = csv.DictReader(text)
+            for row in reader:
+                line_no = reader.line_num
+                yield line_no, row
+    except UnicodeDecodeError:
+        yield line_no + 1, StopImport('файл не в кодуванні UTF-8, решту рядків не імпортовано')
+    except csv.Error as e:
+        yield line_no + 1, StopImport(f'некоректний CSV ({e}), решту рядків не імпортовано')
+
+
+def parse_row(row):
+    """Перевіряє рядок файлу і повертає поля для таблиці contract."""
+    if not isinstance(row, dict):
+        raise ValueError('рядок має бути об\'єктом з полями ' + ', '.join(FIELDS))
+
+    # client_name приймаємо як синонім client
+    if 'client' not in row and 'client_name' in row:
+        row = dict(row, client=row['client_name'])
+
+    missing = [f for f in FIELDS if row.get(f) in (None, '')]
+    if missing:
+        raise ValueError('відсутні поля: ' + ', '.join(missing))
+
+    try:
+        amount = float(row['amount'])
+    except (TypeError, ValueError):
+        raise ValueError(f'некоректна сума: {row["amount"]!r}')
+    if not math.isfinite(amount):
+        raise ValueError(f'некоректна сума: {row["amount"]!r}')
+    try:
+        duration = int(row['duration'])
+    except (TypeError, ValueError):
+        raise ValueError(f'некоректний термін: {row["duration"]!r}')
+    try:
+        start_date = datetime.strptime(str(row['start_date']), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'некоректна дата: {row["start_date"]!r}')
+
+    if amount <= 0:
+        raise ValueError('сума має бути більшою за нуль')
+    if duration <= 0:
+        raise ValueError('термін має бути більшим за нуль')
+    if '@' not in str(row['client_email']):
+        raise ValueError(f'некоректний email: {row["client_email"]!r}')
+
+    return {
+        'number': str(row['number']).strip(),
+        'client_name': str(row['client']).strip(),
+        'client_email': str(row['client_email']).strip(),
+        'amount': amount,
+        'start_date': start_date,
+        'duration_months': duration,
+        'end_date': schedule_end_date(start_date, duration),
+    }
+
+
+def import_contracts(stream, fmt, user_id, batch_size=BATCH_SIZE):
+    """Імпортує договори з потоку для користувача user_id. Повертає ImportReport."""
+    report = ImportReport()
+    started = time.perf_counter()
+    batch = []
+
+    def flush():
+        ids = db.session.scalars(insert(Contract).returning(Contract.id), batch).all()
+        stats.contracts_added(user_id, batch)
+        changes.contracts_saved(user_id, *ids)
+        db.session.commit()
+        report.imported += len(batch)
+        batch.clear()
+
+    for line_no, row in iter_rows(stream, fmt):
+        if isinstance(row, StopImport):
+            report.add_error(line_no, str(row))
+            break
+        report.rows += 1
+        try:
+            if isinstance(row, Exception):
+                raise row
+            values = parse_row(row)
+        except ValueError as e:
+            report.add_error(line_no, str(e))
+            continue
+
+        values['user_id'] = user_id
+        batch.append(values)
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+
+    report.seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,253 @@
+import hmac
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import Response, abort, current_app, g, has_request_context, request
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+
+from analytics import Analytics
+from models import db
+
+
+# === МЕТРИКИ ЗАПИТІВ (формат Prometheus) ===
+# Вмикається через METRICS_ENABLED = True у конфігурації. Вимкнена - не
+# ставить жодного хука, тому накладні витрати практично нульові. Метрики
+# живуть у пам'яті процесу, тож тут лише те, що рахує веб-процес: час
+# відправки листів міряти нема де - їх шле `flask outbox-worker` в окремому
+# процесі, який Prometheus не опитує.
+# /metrics віддає їх лише з заголовком Authorization: Bearer <METRICS_TOKEN>
+# (bearer_token у scrape_config Prometheus); без METRICS_TOKEN - нікому:
+# назви маршрутів і тексти запитів не для сторонніх.
+
+# межі кошиків гістограм, як у клієнтів Prometheus
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+N_PLUS_ONE_THRESHOLD = 10   # стільки однакових запитів за один HTTP-запит - підозра на N+1
+
+# IN (?, ?, ?) з різною кількістю параметрів - той самий запит
+_IN_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            labels = _labels(self.labels, label_values)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{_labels(self.labels, label_values, le=bound)} {bucket_count}')
+            lines.append(f'{self.name}_bucket{_labels(self.labels, label_values, le="+Inf")} {count}')
+            lines.append(f'{self.name}_sum{labels} {total:.6f}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._series = Counter()
+
+    def inc(self, *label_values):
+        self._series[label_values] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(self._series.items()):
+            lines.append(f'{self.name}{_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class CacheStats:
+    """Показники кешу процесу: читаються з його stats() у момент запиту /metrics."""
+
+    def __init__(self, name, help, stats):
+        self.name = name
+        self.help = help
+        self.stats = stats
+
+    def render(self):
+        stats = self.stats()
+        lines = []
+        for field, kind in (('hits', 'counter'), ('misses', 'counter')):
+            metric = f'{self.name}_{field}_total'
+            lines += [f'# HELP {metric} {self.help}: {field}.', f'# TYPE {metric} {kind}',
+                      f'{metric} {stats[field]}']
+        for field in ('entries', 'bytes'):
+            if field in stats:
+                metric = f'{self.name}_{field}'
+                lines += [f'# HELP {metric} {self.help}: {field}.', f'# TYPE {metric} gauge',
+                          f'{metric} {stats[field]}']
+        return lines
+
+
+def _labels(names, values, le=None):
+    pairs = list(zip(names, values))
+    if le is not None:
+        pairs.append(('le', le))
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+class Registry:
+    def __init__(self, n_plus_one_threshold=N_PLUS_ONE_THRESHOLD):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.lock = threading.Lock()
+        self.request_seconds = Histogram(
+            'http_request_duration_seconds', 'Час обробки запиту.', ('endpoint', 'method'), TIME_BUCKETS)
+        self.requests = CounterMetric(
+            'http_requests_total', 'Кількість запитів.', ('endpoint', 'method', 'status'))
+        self.db_queries = Histogram(
+            'db_queries_per_request', 'SQL-запитів за один HTTP-запит.', ('endpoint',), COUNT_BUCKETS)
+        self.db_seconds = Histogram(
+            'db_time_seconds', 'Сумарний час SQL за один HTTP-запит.', ('endpoint',), TIME_BUCKETS)
+        self.template_seconds = Histogram(
+            'template_render_seconds', 'Час рендеру шаблону.', ('template',), TIME_BUCKETS)
+        self.n_plus_one = CounterMetric(
+            'n_plus_one_total', 'Запити з підозрою на N+1.', ('endpoint',))
+        self.metrics = [self.request_seconds, self.requests, self.db_queries, self.db_seconds,
+                        self.template_seconds, self.n_plus_one]
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for metric in self.metrics:
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """Лічильники одного HTTP-запиту, живуть у flask.g."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+
+
+def register_cache(app, name, help, cache):
+    """Додає hits, misses і розмір кешу (об'єкт зі stats()) до /metrics."""
+    registry = app.extensions.get('instrumentation')
+    if registry is None:
+        return
+    with registry.lock:
+        registry.metrics.append(CacheStats(name, help, cache.stats))
+
+
+# === ХУКИ ===
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and '_metrics' in g:
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    metrics = g.get('_metrics')
+    if metrics is not None:
+        metrics.queries += 1
+        metrics.db_time += elapsed
+        metrics.statements[_IN_LIST.sub('(?)', statement)] += 1
+
+
+def _before_request():
+    g._metrics = RequestMetrics()
+
+
+def _after_request(response):
+    metrics = g.pop('_metrics', None)
+    if metrics is None:
+        return response
+    registry = current_app.extensions['instrumentation']
+    endpoint = request.endpoint or 'unknown'
+    elapsed = time.perf_counter() - metrics.started
+
+    repeated = [(s, n) for s, n in metrics.statements.items() if n > registry.n_plus_one_threshold]
+
+    with registry.lock:
+        registry.request_seconds.observe(elapsed, endpoint, request.method)
+        registry.requests.inc(endpoint, request.method, response.status_code)
+        registry.db_queries.observe(metrics.queries, endpoint)
+        registry.db_seconds.observe(metrics.db_time, endpoint)
+        if repeated:
+            registry.n_plus_one.inc(endpoint)
+
+    for statement, count in repeated:
+        Analytics.log(f"N+1 у {endpoint}: {count} разів {' '.join(statement.split())[:200]}",
+                      type="n_plus_one")
+    return response
+
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault('_render_started', []).append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    started = g.get('_render_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    registry = sender.extensions['instrumentation']
+    with registry.lock:
+        registry.template_seconds.observe(elapsed, template.name or 'string')
+
+
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    supplied = request.headers.get('Authorization', '').encode()
+    if not token or not hmac.compare_digest(supplied, f'Bearer {token}'.encode()):
+        abort(403)
+    return Response(current_app.extensions['instrumentation'].render(),
+                    mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Підключає метрики до застосунку, якщо METRICS_ENABLED увімкнено."""
+    if not app.config.get('METRICS_ENABLED', False):
+        return None
+
+    registry = Registry(app.config.get('METRICS_N_PLUS_ONE_THRESHOLD', N_PLUS_ONE_THRESHOLD))
+    app.extensions['instrumentation'] = registry
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    return registry
@@ -0,0 +1,276 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, LiveMessage
+
+
+# === ЖИВІ ОНОВЛЕННЯ КАЛЕНДАРЯ (SSE, GET /stream) ===
+# Відкриті сторінки місяця й дня не перезавантажуються, щоб побачити нові
+# події колег чи імпорту: сервер шле в потік користувача коротке
+# сповіщення {"days": [дати]}, а сторінка перечитує лише ці клітинки.
+#
+# Дати змін уже знає stats.py (лічильники по днях), тож він передає їх
+# сюди через touch(). Вони збираються в session.info і публікуються лише
+# після коміту транзакції; відкат їх відкидає.
+#
+# Брокер (app.extensions['live']):
+#   * LocalBroker - підписники в цьому процесі (один воркер);
+#   * DatabaseBroker - для кількох воркерів: публікація пише рядок у
+#     live_message, а один потік кожного воркера раз на POLL_SECONDS
+#     забирає нові рядки для своїх підписників.
+# Обирається LIVE_BACKEND = 'local' / 'database'.
+#
+# Потоки тримають потік воркера, тож їх кількість обмежена: на процес
+# (LIVE_MAX_STREAMS) і на користувача (LIVE_MAX_STREAMS_PER_USER). Понад
+# ліміт /stream відповідає 200 з одним рядком retry: BUSY_RETRY_MS і
+# одразу закривається - на 503 EventSource більше не перепідключився б,
+# а так вкладка спробує знову, але сповіщень до того не отримує.
+# Кожен потік живе STREAM_SECONDS і закривається - EventSource сам
+# перепідключиться.
+# Якщо задано WORKER_THREADS, потокам дістається не більше половини
+# потоків воркера, інакше відкриті вкладки забрали б усі і звичайні
+# запити стали б у чергу.
+# Повільний клієнт не накопичує черги: непрочитані сповіщення
+# зливаються в одну множину днів, а якщо днів більше MAX_DAYS - в одне
+# {"reload": true}.
+
+MAX_STREAMS = 200
+MAX_STREAMS_PER_USER = 4
+STREAM_SECONDS = 300
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 5000
+BUSY_RETRY_MS = 30000   # пауза перед новою спробою, коли ліміт вичерпано
+MAX_DAYS = 62
+POLL_SECONDS = 1.0
+RETENTION = timedelta(minutes=10)   # скільки рядків live_message тримати
+
+
+class TooManyStreams(Exception):
+    pass
+
+
+class Subscription:
+    """Потік одного клієнта: непрочитані дні, злиті в множину."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._days = set()
+        self._reload = False
+        self._ready = threading.Condition()
+
+    def push(self, days):
+        """days - ISO-дати; None - змінилось забагато, треба перечитати все."""
+        with self._ready:
+            if days is None or len(self._days) + len(days) > MAX_DAYS:
+                self._reload = True
+                self._days.clear()
+            elif not self._reload:
+                self._days.update(days)
+            self._ready.notify()
+
+    def wait(self, timeout):
+        """Накопичене сповіщення ({"days": [...]} або {"reload": true}) чи None за timeout."""
+        with self._ready:
+            if not (self._days or self._reload):
+                self._ready.wait(timeout)
+            if self._reload:
+                message = {'reload': True}
+            elif self._days:
+                message = {'days': sorted(self._days)}
+            else:
+                return None
+            self._days.clear()
+            self._reload = False
+            return message
+
+
+class LocalBroker:
+    def __init__(self, max_streams=MAX_STREAMS, max_per_user=MAX_STREAMS_PER_USER):
+        self.max_streams = max_streams
+        self.max_per_user = max_per_user
+        self.published = 0
+        self.rejected = 0
+        self._subscribers = {}   # user_id -> {Subscription}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        with self._lock:
+            subscribers = self._subscribers.setdefault(user_id, set())
+            if self._count >= self.max_streams or len(subscribers) >= self.max_per_user:
+                self.rejected += 1
+                if not subscribers:
+                    del self._subscribers[user_id]
+                raise TooManyStreams()
+            subscription = Subscription(user_id)
+            subscribers.add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            self._count -= 1
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    def users(self):
+        with self._lock:
+            return list(self._subscribers)
+
+    def publish(self, user_id, days):
+        self.deliver(user_id, days)
+
+    def deliver(self, user_id, days):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+            self.published += 1
+        for subscription in subscribers:
+            subscription.push(days)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'streams': self._count,
+                'users': len(self._subscribers),
+                'max_streams': self.max_streams,
+                'published': self.published,
+                'rejected': self.rejected,
+            }
+
+
+class DatabaseBroker(LocalBroker):
+    def __init__(self, app, poll_seconds=POLL_SECONDS, **limits):
+        super().__init__(**limits)
+        self.app = app
+        self.poll_seconds = poll_seconds
+        self._last_id = None
+        self._poller = None
+
+    def publish(self, user_id, days):
+        with db.engine.begin() as conn:
+            conn.execute(db.insert(LiveMessage).values(
+                user_id=user_id, days=None if days is None else json.dumps(days), created_at=datetime.utcnow()))
+
+    def subscribe(self, user_id):
+        subscription = super().subscribe(user_id)
+        with self._lock:
+            if self._poller is None:
+                with db.engine.connect() as conn:
+                    self._last_id = conn.execute(db.select(db.func.coalesce(db.func.max(LiveMessage.id), 0))).scalar()
+                self._poller = threading.Thread(target=self._poll_loop, name='live-poller', daemon=True)
+                self._poller.start()
+        return subscription
+
+    def poll(self):
+        """Розсилає нові повідомлення підписникам цього процесу і прибирає старі."""
+        users = self.users()
+        with db.engine.begin() as conn:
+            rows = conn.execute(
+                db.select(LiveMessage.id, LiveMessage.user_id, LiveMessage.days)
+                .where(LiveMessage.id > self._last_id).order_by(LiveMessage.id)
+            ).all()
+            if rows:
+                self._last_id = rows[-1].id
+                conn.execute(db.delete(LiveMessage).where(LiveMessage.created_at < datetime.utcnow() - RETENTION))
+        wanted = set(users)
+        for row in rows:
+            if row.user_id in wanted:
+                self.deliver(row.user_id, None if row.days is None else json.loads(row.days))
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                with self.app.app_context():
+                    self.poll()
+            except Exception:
+                # база тимчасово недоступна - спробуємо на наступному колі
+                self.app.logger.exception('live: помилка опитування live_message')
+
+
+# === ЗБІР ЗМІН У ТРАНЗАКЦІЇ ===
+
+def touch(user_id, days=()):
+    """Позначає дні користувача зміненими; сповіщення піде після коміту."""
+    pending = db.session.info.setdefault('live_days', {})
+    pending.setdefault(user_id, set()).update(days)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    pending = session.info.pop('live_days', None)
+    if not pending or not has_app_context():
+        return
+    broker = current_app.extensions.get('live')
+    if broker is None:
+        return
+    for user_id, days in pending.items():
+        if not days:
+            continue
+        try:
+            broker.publish(user_id, sorted(d.isoformat() for d in days) if len(days) <= MAX_DAYS else None)
+        except Exception:
+            # зміни вже закомічені; без сповіщення вкладки оновляться при перепідключенні
+            current_app.logger.exception('live: не вдалося опублікувати зміни користувача %s', user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('live_days', None)
+
+
+# === SSE ===
+
+def subscribe(user_id):
+    """TooManyStreams, якщо ліміт потоків вичерпано."""
+    return current_app.extensions['live'].subscribe(user_id)
+
+
+def busy():
+    """Тіло відповіді понад ліміт: лише пауза перед перепідключенням."""
+    yield f'retry: {BUSY_RETRY_MS}\n\n'
+
+
+def stream(broker, subscription, seconds=STREAM_SECONDS):
+    """Тіло відповіді text/event-stream; відписується, коли клієнт пішов чи час вийшов."""
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        deadline = time.monotonic() + seconds
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return
+            message = subscription.wait(min(HEARTBEAT_SECONDS, left))
+            if message is None:
+                yield ': ping\n\n'
+            else:
+                yield f'event: change\ndata: {json.dumps(message)}\n\n'
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def init_app(app):
+    threads = app.config.get('WORKER_THREADS')
+    limits = {
+        'max_streams': app.config.get('LIVE_MAX_STREAMS', max(1, threads // 2) if threads else MAX_STREAMS),
+        'max_per_user': app.config.get('LIVE_MAX_STREAMS_PER_USER', MAX_STREAMS_PER_USER),
+    }
+    backend = app.config.get('LIVE_BACKEND', 'local')
+    if backend == 'database':
+        broker = DatabaseBroker(app, app.config.get('LIVE_POLL_SECONDS', POLL_SECONDS), **limits)
+    elif backend == 'local':
+        broker = LocalBroker(**limits)
+    else:
+        raise ValueError(f'невідомий LIVE_BACKEND: {backend!r}')
+    app.extensions['live'] = broker
+    return broker
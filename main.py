@@ -1,115 +1,181 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
-from datetime import datetime, date, timedelta
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, flash, abort, session, make_response, stream_with_context, jsonify, Response
+from werkzeug.http import is_resource_modified
+from datetime import datetime, date, time, timedelta
 import calendar
+import functools
+import hashlib
+import math
+import os
+import threading
 from flask_login import LoginManager, current_user, login_user, logout_user, login_required
-from flask_mail import Mail, Message  # <--- [1] ІМПОРТ ПОШТИ
-from models import db, User, Event, Contract
+from flask_mail import Mail  # <--- [1] ІМПОРТ ПОШТИ
+from models import db, User, Event, Contract, ScheduleException, ArchivedContract
 from config import Config
 from analytics import Analytics
-
-Analytics.log("Flask app started")
-
-app = Flask(__name__)
-app.config.from_object(Config)
+import migrations
+import schedules
+import importer
+import outbox
+import stats
+import search
+import pagination
+import icsfeed
+import forecast
+import reminders
+import batch
+import heatmap
+import changes
+import archive
+import live
+import user_cache
+import assets
+import compression
+import instrumentation
+import database
+from database import writes
+from render_cache import RenderCache
+import click
 
 # === ІНІЦІАЛІЗАЦІЯ ===
-db.init_app(app)
-mail = Mail(app)  # <--- [2] ЗАПУСК ПОШТИ
+# Розширення створюються без застосунку і підключаються в create_app()
+mail = Mail()  # <--- [2] ЗАПУСК ПОШТИ
 
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
+
+page_cache = RenderCache()
+
+bp = Blueprint('main', __name__, cli_group=None)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
-
-# === ДОПОМІЖНА ФУНКЦІЯ ДЛЯ ДАТ ===
-def add_months(source_date, months):
-    month = source_date.month - 1 + months
-    year = source_date.year + month // 12
-    month = month % 12 + 1
-    day = min(source_date.day, calendar.monthrange(year, month)[1])
-    return date(year, month, day)
+    # легкий UserIdentity з кешу процесу замість SELECT на кожен запит (див. user_cache.py)
+    return user_cache.cache.get(int(user_id))
+
+# === УМОВНИЙ GET І КЕШ СТОРІНОК КАЛЕНДАРЯ ===
+@functools.lru_cache(maxsize=None)
+def templates_stamp():
+    # після деплою з новими шаблонами чи стилями старі ETag мають стати недійсними
+    stamp = 0.0
+    for folder in (os.path.join(current_app.root_path, current_app.template_folder), current_app.static_folder):
+        for root, _, files in os.walk(folder):
+            for name in files:
+                stamp = max(stamp, os.path.getmtime(os.path.join(root, name)))
+    return stamp
+
+def cached_page(render):
+    """Віддає 304, якщо дані користувача не змінились, інакше - сторінку з кешу
+    або щойно відрендерену. Ключ - (користувач, URL, версія даних, сьогоднішня дата)."""
+    # сторінка з flash-повідомленням одноразова
+    if session.get('_flashes'):
+        return render()
+    
+    version, updated_at = stats.data_version(current_user.id)
+    today = datetime.now().date()
+    etag = hashlib.sha1(
+        f"{current_user.id}|{request.full_path}|{version}|{today}|{templates_stamp()}".encode()
+    ).hexdigest()
+    # підсвітка "сьогодні" і найближчі події змінюються з датою
+    last_modified = max(updated_at, datetime.combine(today, time()))
+    
+    if not is_resource_modified(request.environ, etag, last_modified=last_modified):
+        response = make_response('', 304)
+    else:
+        key = (current_user.id, request.full_path, version, today)
+        body = page_cache.get(key)
+        if body is None:
+            body = render().encode('utf-8')
+            page_cache.put(key, body)
+        response = make_response(body)
+    
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-@app.route("/")
+@bp.route("/")
 def home():
     # Якщо користувач не увійшов - показуємо стару головну
     if not current_user.is_authenticated:
         return render_template("home.html")
     
     # === СТАТИСТИКА ===
-    # 1. Рахуємо кількість договорів
-    contracts_count = Contract.query.filter_by(user_id=current_user.id).count()
-    
-    # 2. Рахуємо загальну суму грошей (через SQL-функцію SUM)
-    total_money = db.session.query(db.func.sum(Contract.amount)).filter_by(user_id=current_user.id).scalar() or 0
-    
-    # 3. Рахуємо події на сьогодні
+    # Кількість договорів, загальна сума і події на сьогодні - з готових
+    # лічильників, які оновлюються при кожному записі (див. stats.py)
     today = datetime.now().date()
-    events_today = Event.query.filter_by(user_id=current_user.id, date=today).count()
+    contracts_count, total_money, events_today = stats.dashboard(current_user.id, today)
 
     return render_template("home.html", 
                            contracts_count=contracts_count, 
                            total_money=total_money,
                            events_today=events_today)
 
-@app.route("/current-month")
+@bp.route("/current-month")
 @login_required
 def current_month():
     now = datetime.now()
-    return redirect(url_for('events_by_month', year=now.year, month=now.month))
+    return redirect(url_for('main.events_by_month', year=now.year, month=now.month))
 
-@app.route("/month/<int:year>/<int:month>")
-@login_required
-def events_by_month(year, month):
-    events = Event.query.filter_by(user_id=current_user.id).filter(
-        db.extract('year', Event.date) == year,
-        db.extract('month', Event.date) == month
-    ).all()
-    
+MONTH_NAMES = ['', 'Січень', 'Лютий', 'Березень', 'Квітень', 'Травень', 'Червень',
+               'Липень', 'Серпень', 'Вересень', 'Жовтень', 'Листопад', 'Грудень']
+
+def render_month(year, month):
     today = datetime.now().date()
     
     week_start = today
     week_end = today + timedelta(days=7)
-    upcoming_week = Event.query.filter_by(user_id=current_user.id).filter(
-        Event.date >= week_start,
-        Event.date < week_end
-    ).order_by(Event.date).all()
-    
     next_week_start = week_end
     next_week_end = next_week_start + timedelta(days=7)
-    upcoming_next_week = Event.query.filter_by(user_id=current_user.id).filter(
-        Event.date >= next_week_start,
-        Event.date < next_week_end
-    ).order_by(Event.date).all()
     
     month_start = date(year, month, 1)
     month_end = date(year, month, calendar.monthrange(year, month)[1])
     
-    all_month_events = Event.query.filter_by(user_id=current_user.id).filter(
-        Event.date >= month_start,
-        Event.date <= month_end
-    ).order_by(Event.date).all()
+    # Один запит по індексу (user_id, date): сітка місяця + 14 днів наперед
+    events = Event.query.filter(
+        Event.user_id == current_user.id,
+        db.or_(
+            Event.date.between(month_start, month_end),
+            (Event.date >= week_start) & (Event.date < next_week_end)
+        )
+    ).order_by(Event.date, Event.id).all()
+    
+    # Платежі договорів розгортаються з графіка лише для цих же діапазонів
+    payments = schedules.expand_payments(
+        current_user.id,
+        (month_start, month_end),
+        (week_start, next_week_end - timedelta(days=1))
+    )
+    # минулі місяці можуть бути вже в архіві (archive.py); найближчі тижні - ніколи
+    archived = archive.items(current_user.id, (month_start, month_end))
+    events = sorted(events + payments + archived, key=lambda e: e.date)
+    
+    # Розкладаємо події по днях за один прохід
+    events_by_date = {}
+    for event in events:
+        events_by_date.setdefault(event.date, []).append(event)
     
+    upcoming_week = []
+    upcoming_next_week = []
     upcoming_month = []
-    for event in all_month_events:
-        if not (week_start <= event.date < week_end) and not (next_week_start <= event.date < next_week_end):
+    for event in events:
+        if week_start <= event.date < week_end:
+            upcoming_week.append(event)
+        elif next_week_start <= event.date < next_week_end:
+            upcoming_next_week.append(event)
+        elif month_start <= event.date <= month_end:
             upcoming_month.append(event)
     
     cal = calendar.Calendar(firstweekday=0)  
     month_days = cal.monthdayscalendar(year, month)
     
-    month_names = ['', 'Січень', 'Лютий', 'Березень', 'Квітень', 'Травень', 'Червень',
-                   'Липень', 'Серпень', 'Вересень', 'Жовтень', 'Листопад', 'Грудень']
-    month_name = month_names[month]
+    month_name = MONTH_NAMES[month]
     
     days = []
     for week in month_days:
         for day_num in week:
             if day_num != 0:  
                 day_date = date(year, month, day_num)
-                day_events = [e for e in events if e.date == day_date]
+                day_events = events_by_date.get(day_date, [])
                 is_today = (day_date == today)
                 is_current_month = True
                 
@@ -142,8 +208,49 @@ def events_by_month(year, month):
                            upcoming_next_week=upcoming_next_week,
                            upcoming_month=upcoming_month)
 
+@bp.route("/month/<int:year>/<int:month>")
+@login_required
+def events_by_month(year, month):
+    if not 1 <= month <= 12:
+        abort(404)
+    return cached_page(lambda: render_month(year, month))
+
+# === РІК: ТЕПЛОВА КАРТА (агрегати замість подій, див. heatmap.py) ===
+def render_year(year):
+    today = datetime.now().date()
+    days = heatmap.year_counts(current_user.id, year)
+    return render_template("year.html",
+                           year=year,
+                           months=heatmap.year_grid(year, days, today),
+                           month_names=MONTH_NAMES,
+                           total=sum(c.total for c in days.values()),
+                           levels=heatmap.LEVELS)
+
+@bp.route("/year/<int:year>")
+@login_required
+def year_view(year):
+    if not heatmap.FIRST_YEAR <= year <= heatmap.LAST_YEAR:
+        abort(404)
+    return cached_page(lambda: render_year(year))
+
+@bp.route("/api/year/<int:year>")
+@login_required
+def api_year(year):
+    if not heatmap.FIRST_YEAR <= year <= heatmap.LAST_YEAR:
+        return jsonify(error="рік поза межами"), 404
+    days = heatmap.year_counts(current_user.id, year)
+    busiest = max((c.total for c in days.values()), default=0)
+    response = jsonify(
+        year=year,
+        max=busiest,
+        days={day.isoformat(): dict(counts.to_dict(), level=heatmap.level(counts.total, busiest))
+              for day, counts in sorted(days.items())},
+    )
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 # === [3] ФУНКЦІЯ СТВОРЕННЯ ДОГОВОРУ З ВІДПРАВКОЮ EMAIL ===
-@app.route("/add_contract", methods=["GET", "POST"])
+@bp.route("/add_contract", methods=["GET", "POST"])
 @login_required
 def add_contract():
     if request.method == "POST":
@@ -163,33 +270,20 @@ def add_contract():
             amount=amount,
             start_date=start_date,
             duration_months=duration,
+            end_date=schedules.schedule_end_date(start_date, duration),
             user_id=current_user.id
         )
+        # Платежі не записуються окремими подіями - їх розгортає schedules.py
         db.session.add(contract)
         db.session.flush()
-
-        monthly_payment = amount / duration
-        
-        for i in range(duration):
-            payment_date = add_months(start_date, i)
-            event = Event(
-                title=f"Платіж: {client} ({i+1}/{duration})",
-                description=f"Сума: {monthly_payment:.2f} грн. Договір №{number}.",
-                date=payment_date,
-                user_id=current_user.id,
-                priority='high',
-                event_type='payment',
-                contract_id=contract.id
-            )
-            db.session.add(event)
-
-        # --- ПОЧАТОК БЛОКУ ВІДПРАВКИ ---
-        try:
-            # Формуємо лист для клієнта
-            msg = Message(f"✅ Ваш договір №{number} створено",
-                          recipients=[client_email, current_user.email]) # Клієнту і копію менеджеру
-            
-            msg.body = f"""
+        stats.contracts_added(current_user.id, [contract])
+        changes.contracts_saved(current_user.id, contract.id)
+
+        # --- ЛИСТ КЛІЄНТУ (відправить воркер черги, див. outbox.py) ---
+        outbox.enqueue(
+            f"✅ Ваш договір №{number} створено",
+            [client_email, current_user.email], # Клієнту і копію менеджеру
+            f"""
             Шановний клієнте {client}!
             
             Ваш лізинговий договір успішно зареєстровано.
@@ -207,24 +301,36 @@ def add_contract():
             Ваш персональний менеджер: {current_user.username}
             Compact Planner System
             """
-            
-            mail.send(msg)
-            Analytics.log(f"Email sent to client: {client_email}")
-            flash(f'Договір створено! Лист надіслано клієнту: {client_email}', 'success')
-            
-        except Exception as e:
-            print(f"Помилка пошти: {e}") 
-            Analytics.log(f"Email error: {e}")
-            flash(f'Договір створено, але лист не надіслано (перевірте консоль).', 'warning')
-        # --- КІНЕЦЬ БЛОКУ ВІДПРАВКИ ---
+        )
+        Analytics.log(f"Email queued for client: {client_email}", type="contract_created", user=current_user.username)
+        flash(f'Договір створено! Лист клієнту {client_email} поставлено в чергу.', 'success')
 
         db.session.commit()
-        return redirect(url_for('current_month'))
+        return redirect(url_for('main.current_month'))
 
     return render_template("add_contract.html")
 
+# === МАСОВИЙ ІМПОРТ ДОГОВОРІВ ===
+@bp.route("/import_contracts", methods=["GET", "POST"])
+@login_required
+def import_contracts():
+    report = None
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash('Оберіть файл CSV або JSONL.', 'warning')
+            return redirect(url_for('main.import_contracts'))
+        
+        fmt = importer.detect_format(upload.filename)
+        report = importer.import_contracts(upload.stream, fmt, current_user.id)
+        Analytics.log(f"Contracts imported: {report.imported} rows", type="contracts_imported", user=current_user.username)
+        flash(f'Імпортовано договорів: {report.imported}, з помилками: {report.failed}.',
+              'success' if not report.failed else 'warning')
+
+    return render_template("import_contracts.html", report=report)
+
 # === [4] АНУЛЮВАННЯ ДОГОВОРУ З EMAIL ===
-@app.route("/cancel_contract", methods=["GET", "POST"])
+@bp.route("/cancel_contract", methods=["GET", "POST"])
 @login_required
 def cancel_contract():
     if request.method == "POST":
@@ -238,12 +344,11 @@ def cancel_contract():
             deleted_info = f"{contract.number} ({contract.client_name})"
             target_email = contract.client_email # Запам'ятовуємо email перед видаленням
             
-            # --- ВІДПРАВКА ЛИСТА ПРО АНУЛЮВАННЯ ---
-            try:
-                msg = Message(f"⚠️ Договір №{contract.number} АНУЛЬОВАНО",
-                              recipients=[target_email, current_user.email])
-                
-                msg.body = f"""
+            # --- ЛИСТ ПРО АНУЛЮВАННЯ (через чергу) ---
+            outbox.enqueue(
+                f"⚠️ Договір №{contract.number} АНУЛЬОВАНО",
+                [target_email, current_user.email],
+                f"""
                 Шановний клієнте!
                 
                 Повідомляємо, що ваш договір №{contract.number} було розірвано/анульовано.
@@ -251,26 +356,25 @@ def cancel_contract():
                 
                 Якщо це помилка, зв'яжіться з вашим менеджером: {current_user.username}
                 """
-                mail.send(msg)
-                print(f"Cancellation email sent to {target_email}")
-            except Exception as e:
-                print(f"Cancellation email failed: {e}")
+            )
             # -------------------------------------
 
+            stats.contract_removed(contract)
+            changes.contract_removed(contract)
             db.session.delete(contract)
             db.session.commit()
-            Analytics.log(f"Contract cancelled: {deleted_info}")
+            Analytics.log(f"Contract cancelled: {deleted_info}", type="contract_cancelled", user=current_user.username)
             flash(f'Договір {deleted_info} анульовано. Клієнта повідомлено поштою.', 'danger')
-            return redirect(url_for('current_month'))
+            return redirect(url_for('main.current_month'))
         else:
             flash(f'Договір "{query}" не знайдено.', 'warning')
 
     return render_template("cancel_contract.html")
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('current_month'))
+        return redirect(url_for('main.current_month'))
     
     if request.method == 'POST':
         username = request.form['username']
@@ -279,18 +383,18 @@ def login():
         
         if user and user.check_password(password):
             login_user(user)
-            Analytics.log(f"User logged in: {user.username}")
+            Analytics.log(f"User logged in: {user.username}", type="login", user=user.username)
             flash('Раді вас бачити!', 'success')
-            return redirect(url_for('current_month'))
+            return redirect(url_for('main.current_month'))
         else:
             flash('Невірний логін або пароль.', 'danger')
     
     return render_template('login.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('current_month'))
+        return redirect(url_for('main.current_month'))
     
     if request.method == 'POST':
         username = request.form['username']
@@ -299,65 +403,121 @@ def register():
         
         if User.query.filter_by(username=username).first():
             flash('Такий користувач вже існує', 'warning')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
         
         if User.query.filter_by(email=email).first():
             flash('Такий email вже зареєстровано', 'warning')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
         
         user = User(username=username, email=email)
         user.set_password(password)
         db.session.add(user)
+        db.session.flush()
+        stats.user_created(user.id)
         db.session.commit()
         
         login_user(user)
-        Analytics.log(f"New user: {username}")
+        Analytics.log(f"New user: {username}", type="register", user=username)
         flash('Акаунт створено успішно!', 'success')
-        return redirect(url_for('current_month'))
+        return redirect(url_for('main.current_month'))
     
     return render_template('register.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('Ви вийшли з системи.', 'info')
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
 
-@app.route("/day/<date>")
+@bp.route("/day/<date>")
 @login_required
 def events_by_day(date):
     day_date = datetime.strptime(date, "%Y-%m-%d").date()
-    events = Event.query.filter_by(user_id=current_user.id, date=day_date).order_by(Event.created_at).all()
+    return cached_page(lambda: render_day(day_date))
+
+def render_day(day_date):
+    user_id = current_user.id
+    
+    # Події та платежі дня йдуть однією стрічкою за (created_at, джерело, id)
+    def fetch_events(key, greater, ascending, limit):
+        query = Event.query.filter_by(user_id=user_id, date=day_date)
+        if key is not None:
+            query = query.filter(pagination.tagged_condition(Event.created_at, Event.id, 0, key, greater))
+        order = db.asc if ascending else db.desc
+        query = query.order_by(order(Event.created_at), order(Event.id)).limit(limit)
+        return [((e.created_at, 0, e.id), e) for e in query]
+    
+    # платежі (з гарячих і архівних договорів) і архівні події дня - у пам'яті
+    in_memory = [((p.created_at, 1, p.contract_id), p)
+                 for p in schedules.expand_payments(user_id, (day_date, day_date))]
+    in_memory += [((e.created_at, 1, e.contract_id) if e.is_virtual else (e.created_at, 2, e.id), e)
+                  for e in archive.items(user_id, (day_date, day_date))]
+    
+    def fetch_in_memory(key, greater, ascending, limit):
+        rows = in_memory
+        if key is not None:
+            rows = [row for row in rows if (row[0] > key if greater else row[0] < key)]
+        rows = sorted(rows, key=lambda row: row[0], reverse=not ascending)
+        return rows[:limit]
+    
+    per_page = pagination.per_page_arg(request.args.get("per_page"))
+    try:
+        page = pagination.paginate([fetch_events, fetch_in_memory],
+                                   request.args.get("cursor"), per_page, key_types=(datetime, int, int))
+    except ValueError:
+        abort(400)
+    
     message = request.args.get("message")
-    return render_template("dayfeed.html", date=day_date, events=events, message=message)
+    return render_template("dayfeed.html", date=day_date, events=page.items, page=page,
+                           per_page=per_page, message=message)
 
-@app.route("/add/<date>")
+@bp.route("/add/<date>")
 @login_required
 def add_event_form(date):
     event_date = datetime.strptime(date, "%Y-%m-%d").date()
     return render_template("add_event.html", date=event_date)
 
 # === НОВЕ: СПИСОК ДОГОВОРІВ ТА ПОШУК ===
-@app.route("/contracts")
+@bp.route("/contracts")
 @login_required
 def all_contracts():
     query = request.args.get('q', '').strip()
+    per_page = pagination.per_page_arg(request.args.get('per_page'))
     
     if query:
-        # Шукаємо по номеру АБО по клієнту
-        contracts = Contract.query.filter(
-            (Contract.user_id == current_user.id) & 
-            ((Contract.number.contains(query)) | (Contract.client_name.contains(query)))
-        ).order_by(Contract.start_date.desc()).all()
+        # Шукаємо по номеру АБО по клієнту (повнотекстовий індекс, див. search.py)
+        contracts = search.search_contracts(current_user.id, query)
+        page = None
     else:
-        # Якщо пошуку немає - показуємо всі
-        contracts = Contract.query.filter_by(user_id=current_user.id).order_by(Contract.start_date.desc()).all()
+        # Якщо пошуку немає - показуємо всі, посторінково за (start_date, id)
+        user_id = current_user.id
+        
+        def contracts_source(model):
+            def fetch_contracts(key, greater, ascending, limit):
+                contracts = model.query.filter_by(user_id=user_id)
+                if key is not None:
+                    contracts = contracts.filter(
+                        pagination.keyset_condition((model.start_date, model.id), key, greater))
+                order = db.asc if ascending else db.desc
+                contracts = contracts.order_by(order(model.start_date), order(model.id)).limit(limit)
+                return [((c.start_date, c.id), c) for c in contracts]
+            return fetch_contracts
+        
+        # завершені договори, перенесені в архів (archive.py), - у тому ж реєстрі
+        try:
+            page = pagination.paginate([contracts_source(Contract), contracts_source(ArchivedContract)],
+                                       request.args.get("cursor"), per_page, descending=True,
+                                       key_types=(date, int))
+        except ValueError:
+            abort(400)
+        contracts = page.items
     
-    return render_template("contracts.html", contracts=contracts, search_query=query)
+    return render_template("contracts.html", contracts=contracts, search_query=query,
+                           page=page, per_page=per_page)
 
 # === НОВЕ: ШВИДКЕ АНУЛЮВАННЯ ПО ID ===
-@app.route("/cancel/<int:contract_id>", methods=["POST"])
+@bp.route("/cancel/<int:contract_id>", methods=["POST"])
 @login_required
 def cancel_contract_id(contract_id):
     contract = Contract.query.filter_by(id=contract_id, user_id=current_user.id).first_or_404()
@@ -365,22 +525,22 @@ def cancel_contract_id(contract_id):
     deleted_info = f"{contract.number} ({contract.client_name})"
     target_email = contract.client_email
     
-    # Відправка листа
-    try:
-        msg = Message(f"⚠️ Договір №{contract.number} АНУЛЬОВАНО",
-                      recipients=[target_email, current_user.email])
-        msg.body = f"Шановний клієнте! Ваш договір №{contract.number} анульовано менеджером."
-        mail.send(msg)
-    except Exception as e:
-        print(f"Mail error: {e}")
+    # Лист ставимо в чергу
+    outbox.enqueue(
+        f"⚠️ Договір №{contract.number} АНУЛЬОВАНО",
+        [target_email, current_user.email],
+        f"Шановний клієнте! Ваш договір №{contract.number} анульовано менеджером."
+    )
 
+    stats.contract_removed(contract)
+    changes.contract_removed(contract)
     db.session.delete(contract)
     db.session.commit()
     
     flash(f'Договір {deleted_info} успішно анульовано.', 'info')
-    return redirect(url_for('all_contracts'))
+    return redirect(url_for('main.all_contracts'))
 
-@app.route("/add", methods=["POST"])
+@bp.route("/add", methods=["POST"])
 @login_required
 def add_event():
     title = request.form["title"]
@@ -401,47 +561,432 @@ def add_event():
         priority=priority 
     )
     db.session.add(event)
+    db.session.flush()
+    stats.events_added(current_user.id, event_date)
+    changes.events_saved(current_user.id, event.id)
     db.session.commit()
     
     flash('Подію успішно додано!', 'success')
-    return redirect(url_for("events_by_day", date=event_date.strftime("%Y-%m-%d")))
+    return redirect(url_for("main.events_by_day", date=event_date.strftime("%Y-%m-%d")))
 
-@app.route("/edit/<int:event_id>")
+@bp.route("/edit/<int:event_id>")
 @login_required
 def edit_event_form(event_id):
     event = Event.query.filter_by(id=event_id, user_id=current_user.id).first_or_404()
     return render_template("edit_event.html", event=event)
 
-@app.route("/edit/<int:event_id>", methods=["POST"])
+@bp.route("/edit/<int:event_id>", methods=["POST"])
 @login_required
 def edit_event(event_id):
     event = Event.query.filter_by(id=event_id, user_id=current_user.id).first_or_404()
     
     if event:
+        old_date = event.date
         event.title = request.form["title"]
         event.description = request.form["description"]
         event.date = datetime.strptime(request.form["date"], "%Y-%m-%d").date()
+        stats.event_moved(current_user.id, old_date, event.date)
+        changes.events_saved(current_user.id, event.id)
         db.session.commit()
         flash('Подію оновлено!', 'success')
-    return redirect(url_for("events_by_day", date=event.date.strftime("%Y-%m-%d")))
+    return redirect(url_for("main.events_by_day", date=event.date.strftime("%Y-%m-%d")))
 
-@app.route("/delete/<int:event_id>")
+@bp.route("/delete/<int:event_id>")
+@writes
 @login_required
 def delete_event(event_id):
     event = Event.query.filter_by(id=event_id, user_id=current_user.id).first_or_404()
     
     if event:
         event_date = event.date
+        changes.events_deleted(current_user.id, event.id)
         db.session.delete(event)
+        stats.events_removed(current_user.id, event_date)
         db.session.commit()
         flash('Подію видалено!', 'info')
-        return redirect(url_for("events_by_day", date=event_date.strftime("%Y-%m-%d")))
+        return redirect(url_for("main.events_by_day", date=event_date.strftime("%Y-%m-%d")))
+    
+    return redirect(url_for("main.home"))
+
+# === ПЛАТЕЖІ З ГРАФІКА ДОГОВОРУ ===
+# Платіж стає окремим рядком Event лише тоді, коли користувач його змінює.
+def get_payment_or_404(contract_id, occurrence):
+    contract = Contract.query.filter_by(id=contract_id, user_id=current_user.id).first_or_404()
+    payment = schedules.get_payment(contract, occurrence)
+    if payment is None:
+        abort(404)
+    return payment
+
+@bp.route("/payment/<int:contract_id>/<int:occurrence>")
+@login_required
+def edit_payment_form(contract_id, occurrence):
+    payment = get_payment_or_404(contract_id, occurrence)
+    return render_template("edit_event.html", event=payment)
+
+@bp.route("/payment/<int:contract_id>/<int:occurrence>", methods=["POST"])
+@login_required
+def edit_payment(contract_id, occurrence):
+    payment = get_payment_or_404(contract_id, occurrence)
+    
+    event = Event(
+        title=request.form["title"],
+        description=request.form["description"],
+        date=datetime.strptime(request.form["date"], "%Y-%m-%d").date(),
+        user_id=current_user.id,
+        priority=payment.priority,
+        event_type=payment.event_type,
+        contract_id=contract_id,
+        occurrence=occurrence
+    )
+    db.session.add(event)
+    db.session.add(ScheduleException(contract_id=contract_id, occurrence=occurrence))
+    db.session.flush()
+    stats.event_moved(current_user.id, payment.date, event.date)
+    changes.events_saved(current_user.id, event.id)
+    changes.contracts_saved(current_user.id, contract_id)
+    db.session.commit()
+    flash('Подію оновлено!', 'success')
+    return redirect(url_for("main.events_by_day", date=event.date.strftime("%Y-%m-%d")))
+
+@bp.route("/payment/<int:contract_id>/<int:occurrence>/delete")
+@writes
+@login_required
+def delete_payment(contract_id, occurrence):
+    payment = get_payment_or_404(contract_id, occurrence)
+    
+    db.session.add(ScheduleException(contract_id=contract_id, occurrence=occurrence))
+    stats.events_removed(current_user.id, payment.date)
+    changes.contracts_saved(current_user.id, contract_id)
+    db.session.commit()
+    flash('Подію видалено!', 'info')
+    return redirect(url_for("main.events_by_day", date=payment.date.strftime("%Y-%m-%d")))
+
+# === ПІДПИСКА НА КАЛЕНДАР (.ics) ===
+# Посилання з секретним токеном, без входу в акаунт: календар у телефоні
+# сам періодично забирає стрічку. Кеш і ETag прив'язані до версії даних
+# користувача, тож будь-який запис робить їх недійсними.
+FEED_CACHE_MAX_BYTES = 4 * 1024 * 1024   # більші стрічки лише стрімляться
+
+@bp.route("/calendar/feed", methods=["GET", "POST"])
+@writes
+@login_required
+def calendar_feed():
+    # токена стрічки немає в current_user (кеш користувачів), потрібен сам User
+    user = db.session.get(User, current_user.id)
+    if request.method == "POST" or not user.feed_token:
+        user.reset_feed_token()
+        db.session.commit()
+        if request.method == "POST":
+            flash('Створено нове посилання. Старе більше не працює.', 'warning')
+            return redirect(url_for('main.calendar_feed'))
+    
+    feed_url = url_for('main.calendar_ics', token=user.feed_token, _external=True)
+    return render_template("calendar_feed.html", feed_url=feed_url)
+
+def stream_and_cache(key, chunks):
+    """Віддає частини стрічки і паралельно збирає їх у кеш, поки вистачає ліміту."""
+    collected, size = [], 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        if collected is not None:
+            collected.append(data)
+            size += len(data)
+            if size > FEED_CACHE_MAX_BYTES:
+                collected = None
+        yield data
+    if collected is not None:
+        page_cache.put(key, b''.join(collected))
+
+@bp.route("/calendar/<token>.ics")
+def calendar_ics(token):
+    user = User.query.filter_by(feed_token=token).first()
+    if user is None:
+        abort(404)
+    
+    version, updated_at = stats.data_version(user.id)
+    etag = hashlib.sha1(f"ics|{user.id}|{token}|{version}".encode()).hexdigest()
+    
+    if not is_resource_modified(request.environ, etag, last_modified=updated_at):
+        response = make_response('', 304)
+    else:
+        key = ('ics', user.id, version)
+        body = page_cache.get(key)
+        if body is None:
+            body = stream_with_context(stream_and_cache(key, icsfeed.iter_feed(user)))
+        response = current_app.response_class(body, mimetype='text/calendar')
+    
+    response.set_etag(etag)
+    response.last_modified = updated_at
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# === ПРОГНОЗ НАДХОДЖЕНЬ (JSON для графіка на головній) ===
+# ?months=12&rate=18&start=2026-01: горизонт у місяцях, річна ставка у
+# відсотках (0 - рівні частини, як у описі платежу) і перший місяць
+# (за замовчуванням поточний). Портфель кешується до наступного запису.
+@bp.route("/api/forecast")
+@login_required
+def api_forecast():
+    try:
+        # тексти помилок int()/float()/strptime() клієнту не віддаємо
+        try:
+            months = int(request.args.get("months", 12))
+        except ValueError:
+            raise ValueError("months має бути цілим числом")
+        try:
+            rate = float(request.args.get("rate", 0)) / 100
+        except ValueError:
+            raise ValueError("rate має бути числом")
+        if not math.isfinite(rate):
+            # float() приймає nan та inf, а з ними прогноз - суцільні NaN
+            raise ValueError("ставка має бути скінченним числом")
+        start = request.args.get("start")
+        try:
+            first = datetime.strptime(start, "%Y-%m").date() if start else datetime.now().date()
+        except ValueError:
+            raise ValueError("start має бути у форматі РРРР-ММ")
+        version, updated_at = stats.data_version(current_user.id)
+        portfolio = forecast.portfolio_for(current_user.id, version, updated_at)
+        result = forecast.forecast(portfolio, forecast.month_index(first.year, first.month), months, rate)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    response = jsonify(result)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# === ПАКЕТНІ ЗМІНИ ПОДІЙ (JSON, формат операцій див. у batch.py) ===
+@bp.route("/api/events/batch", methods=["POST"])
+@login_required
+def events_batch():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="очікується JSON-об'єкт з полем operations"), 400
+    atomic = bool(payload.get("atomic"))
+    try:
+        results, applied = batch.apply_operations(current_user.id, payload.get("operations"), atomic)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    failed = sum(1 for r in results if "error" in r)
+    return jsonify(results=results, applied=applied, failed=failed), 422 if atomic and failed else 200
+
+# === ЖИВІ ОНОВЛЕННЯ СТОРІНОК (SSE, брокер і ліміти див. у live.py) ===
+@bp.route("/stream")
+@login_required
+def stream():
+    broker = current_app.extensions['live']
+    try:
+        subscription = broker.subscribe(current_user.id)
+    except live.TooManyStreams:
+        # не 503: після нього EventSource більше не перепідключається
+        body = live.busy()
+    else:
+        # генератор не торкається бази і працює вже без контексту застосунку,
+        # тож з'єднання повертається в пул одразу після цієї функції
+        body = live.stream(broker, subscription,
+                           current_app.config.get('LIVE_STREAM_SECONDS', live.STREAM_SECONDS))
+    response = Response(body, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+MAX_DAYS_PER_REQUEST = 62
+
+@bp.route("/api/days")
+@login_required
+def api_days():
+    """Події кількох днів для оновлення клітинок календаря без перезавантаження."""
+    try:
+        days = sorted({datetime.strptime(d, "%Y-%m-%d").date()
+                       for d in request.args.get("dates", "").split(",") if d})
+    except ValueError:
+        return jsonify(error="дати мають бути у форматі YYYY-MM-DD через кому"), 400
+    if not 1 <= len(days) <= MAX_DAYS_PER_REQUEST:
+        return jsonify(error=f"від 1 до {MAX_DAYS_PER_REQUEST} дат"), 400
+
+    # як у render_month: події по індексу (user_id, date), платежі з графіків, архів
+    events = Event.query.filter(Event.user_id == current_user.id, Event.date.in_(days)) \
+        .order_by(Event.date, Event.id).all()
+    payments = [p for p in schedules.expand_payments(current_user.id, (days[0], days[-1]))
+                if p.date in days]
+    archived = [e for e in archive.items(current_user.id, (days[0], days[-1])) if e.date in days]
+    result = {day.isoformat(): [] for day in days}
+    for event in sorted(events + payments + archived, key=lambda e: e.date):
+        result[event.date.isoformat()].append({
+            'title': event.title,
+            'description': event.description or '',
+            'priority': event.priority or 'medium',
+        })
+    response = jsonify(days=result)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# === СИНХРОНІЗАЦІЯ: ЛИШЕ ЗМІНИ ПІСЛЯ КУРСОРА (журнал див. у changes.py) ===
+# Клієнт без курсора отримує весь календар як зміни, потім запитує
+# /sync?since=<cursor> з курсором з попередньої відповіді, поки has_more.
+@bp.route("/sync")
+@login_required
+def sync():
+    try:
+        items, cursor, has_more = changes.since(current_user.id, request.args.get("since"),
+                                                changes.limit_arg(request.args.get("limit")))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    response = jsonify(changes=items, cursor=cursor, has_more=has_more)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# === CLI КОМАНДИ ===
+@bp.cli.command("db-upgrade")
+def db_upgrade():
+    """Оновлює схему бази (таблиці, індекси)."""
+    migrations.upgrade()
+    print("Схему бази оновлено.")
+
+@bp.cli.command("import-contracts")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--user", "username", required=True, help="Логін менеджера, якому належать договори.")
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="За замовчуванням - за розширенням файлу.")
+@click.option("--batch-size", default=importer.BATCH_SIZE, show_default=True)
+def import_contracts_command(path, username, fmt, batch_size):
+    """Імпортує договори з CSV/JSONL файлу."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"Користувача {username} не знайдено.")
+    
+    with open(path, "rb") as f:
+        report = importer.import_contracts(f, fmt or importer.detect_format(path), user.id, batch_size)
+    
+    for line, message in report.errors:
+        click.echo(f"рядок {line}: {message}", err=True)
+    click.echo(f"Рядків: {report.rows}, імпортовано: {report.imported}, помилок: {report.failed}, "
+               f"{report.seconds:.2f} с ({report.rows_per_second:.0f} рядків/с)")
+
+@bp.cli.command("outbox-worker")
+@click.option("--threads", default=2, show_default=True, help="Кількість воркерів.")
+@click.option("--once", is_flag=True, help="Відправити все, що є в черзі, і завершитись.")
+def outbox_worker_command(threads, once):
+    """Відправляє листи з черги."""
+    workers, stop = outbox.start_workers(current_app._get_current_object(), mail, threads=threads, once=once)
+    try:
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(timeout=1)
+    except KeyboardInterrupt:
+        stop.set()
+
+@bp.cli.command("rebuild-stats")
+@click.option("--user", "username", help="Лише для цього користувача (за замовчуванням - для всіх).")
+def rebuild_stats_command(username):
+    """Перераховує лічильники головної сторінки з нуля."""
+    query = User.query
+    if username:
+        query = query.filter_by(username=username)
+    user_ids = [user_id for (user_id,) in query.with_entities(User.id)]
+    for user_id in user_ids:
+        stats.rebuild(user_id)
+        db.session.commit()
+    click.echo(f"Лічильники перераховано для користувачів: {len(user_ids)}")
+
+@bp.cli.command("archive")
+@click.option("--days", type=int, help="Старші за скільки днів (за замовчуванням - ARCHIVE_AFTER_DAYS).")
+@click.option("--date", "today", type=click.DateTime(formats=["%Y-%m-%d"]), help="Від якої дати рахувати (за замовчуванням - сьогодні).")
+@click.option("--batch-size", default=archive.BATCH_SIZE, show_default=True, help="Рядків за одну транзакцію.")
+@click.option("--user", "username", help="Лише для цього користувача (за замовчуванням - для всіх).")
+def archive_command(days, today, batch_size, username):
+    """Переносить минулі події і завершені договори в архівні таблиці."""
+    if days is None:
+        days = current_app.config.get('ARCHIVE_AFTER_DAYS', archive.AFTER_DAYS)
+    user_id = None
+    if username:
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.ClickException(f"Користувача {username} не знайдено.")
+        user_id = user.id
+    moved = archive.run(today.date() if today else None, days, batch_size, user_id)
+    click.echo(f"В архів перенесено договорів: {moved['contracts']}, подій: {moved['events']}")
+
+@bp.cli.command("send-reminders")
+@click.option("--days", default=reminders.DEFAULT_DAYS, show_default=True, help="На скільки днів наперед.")
+@click.option("--date", "today", type=click.DateTime(formats=["%Y-%m-%d"]), help="Початок вікна (за замовчуванням - сьогодні).")
+@click.option("--to", "audiences", type=click.Choice(reminders.AUDIENCES), multiple=True,
+              help="Кому писати (за замовчуванням - клієнтам і менеджерам).")
+@click.option("--deliver", is_flag=True, help="Одразу відправити чергу листів, не чекаючи outbox-worker.")
+def send_reminders_command(days, today, audiences, deliver):
+    """Ставить у чергу нагадування про платежі (для запуску з cron раз на день)."""
+    today = today.date() if today else datetime.now().date()
+    report = reminders.send_reminders(today, days, audiences or reminders.AUDIENCES)
+    click.echo(f"Платежів: {report.payments}, уже нагадано: {report.already_sent}, "
+               f"листів у черзі: {report.digests}, {report.seconds:.2f} с")
+    if deliver:
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = outbox.deliver_batch(mail)
+            if not (sent or failed):
+                break
+            total_sent += sent
+            total_failed += failed
+        click.echo(f"Відправлено: {total_sent}, не вдалося: {total_failed}")
+
+# === ФАБРИКА ЗАСТОСУНКУ ===
+def create_app(config_object=None):
+    """Створює застосунок. Без аргументу - Config, а з APP_PROFILE=production -
+    ProductionConfig (WAL, пул з'єднань, див. production.py)."""
+    if config_object is None:
+        if os.environ.get("APP_PROFILE") == "production":
+            from production import ProductionConfig
+            config_object = ProductionConfig
+        else:
+            config_object = Config
+    
+    Analytics.log("Flask app started", type="startup")
+    
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database.engine_options(app.config)
+    
+    db.init_app(app)
+    database.init_app(app)
+    mail.init_app(app)
+    instrumentation.init_app(app)
+    live.init_app(app)
+    assets.init_app(app)
+    compression.init_app(app)
+    login_manager.init_app(app)
+    page_cache.max_bytes = app.config.get('RENDER_CACHE_MAX_BYTES', page_cache.max_bytes)
+    user_cache.cache.ttl = app.config.get('USER_CACHE_TTL', user_cache.cache.ttl)
+    user_cache.cache.max_entries = app.config.get('USER_CACHE_MAX_ENTRIES', user_cache.cache.max_entries)
+    instrumentation.register_cache(app, 'page_cache', 'Кеш сторінок', page_cache)
+    instrumentation.register_cache(app, 'user_cache', 'Кеш користувачів', user_cache.cache)
     
-    return redirect(url_for("home"))
+    app.register_blueprint(bp)
+    return app
+
+# === ЗАСТОСУНОК ЗА ЗАМОВЧУВАННЯМ (ЛІНИВО) ===
+# Імпорт main нічого не створює і нічого не пише (ні розширень, ні
+# analytics.log): main.app для flask --app main, тестів і бенчмарків
+# створюється при першому зверненні. wsgi.py викликає create_app() сам.
+_default_app = None
+_default_app_lock = threading.Lock()
+
+def __getattr__(name):
+    global _default_app
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _default_app_lock:
+        if _default_app is None:
+            _default_app = create_app()
+    return _default_app
 
 if __name__ == "__main__":
+    app = create_app()
     with app.app_context():
-         db.create_all()
+         migrations.upgrade()
+    # у debug-режимі скрипт запускається двічі, воркер потрібен лише в дочірньому процесі
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        outbox.start_workers(app, mail)
     try:
         app.run(debug=True)
     except KeyboardInterrupt:
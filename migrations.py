@@ -0,0 +1,199 @@
+from sqlalchemy.schema import CreateTable
+
+from models import db, User, Contract, ChangeLog, UserStats
+from schedules import schedule_end_date
+import search
+import stats
+
+
+# === ОНОВЛЕННЯ СХЕМИ ІСНУЮЧОЇ БАЗИ ===
+# db.create_all() створює лише відсутні таблиці, тому нові колонки та
+# індекси для старих баз доводиться додавати окремо.
+
+# (таблиця, колонка, SQL-визначення для ALTER TABLE)
+NEW_COLUMNS = [
+    ('contract', 'end_date', 'DATE'),
+    # старі договори вже мають рядки платежів у таблиці event
+    ('contract', 'virtual_schedule', 'BOOLEAN NOT NULL DEFAULT 0'),
+    ('event', 'occurrence', 'INTEGER'),
+    ('user_stats', 'data_version', 'INTEGER NOT NULL DEFAULT 0'),
+    ('user_stats', 'updated_at', 'DATETIME'),
+    ('user', 'feed_token', 'VARCHAR(64)'),
+    ('user', 'version', 'INTEGER NOT NULL DEFAULT 1'),
+    ('event', 'updated_at', 'DATETIME'),
+    ('contract', 'updated_at', 'DATETIME'),
+    ('user_stats', 'change_seq', 'INTEGER NOT NULL DEFAULT 0'),
+    ('user_stats', 'archived_before', 'DATE'),
+]
+
+
+def _add_missing_columns():
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table, column, ddl in NEW_COLUMNS:
+            existing = {c['name'] for c in inspector.get_columns(table)}
+            if column not in existing:
+                conn.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}')
+
+
+def _tables_to_rebuild(inspector, conn):
+    """Таблиці, у яких зовнішні ключі ще без ON DELETE CASCADE або id без AUTOINCREMENT."""
+    tables = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        if table.dialect_options['sqlite']['autoincrement']:
+            sql = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+            ).scalar()
+            if 'AUTOINCREMENT' not in sql.upper():
+                tables.append(table)
+                continue
+        wanted = {fk.parent.name for fk in table.foreign_keys if fk.ondelete == 'CASCADE'}
+        existing = {
+            column
+            for fk in inspector.get_foreign_keys(table.name)
+            if (fk.get('options') or {}).get('ondelete', '').upper() == 'CASCADE'
+            for column in fk['constrained_columns']
+        }
+        if wanted - existing:
+            tables.append(table)
+    return tables
+
+
+def _rebuild_tables():
+    """Перебудовує таблиці SQLite, у яких зовнішні ключі ще без ON DELETE CASCADE
+    або id ще без AUTOINCREMENT.
+
+    SQLite не вміє змінювати обмеження таблиці, тому робимо як радить його
+    документація: нова таблиця -> копія даних -> видалення старої -> перейменування.
+    Індекси і тригери пошуку створюються заново далі в upgrade().
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    with db.engine.connect() as conn:
+        tables = _tables_to_rebuild(db.inspect(conn), conn)
+    if not tables:
+        return
+
+    with db.engine.connect() as conn:
+        # PRAGMA foreign_keys не діє всередині транзакції, тому - напряму
+        # через з'єднання драйвера, до того як SQLAlchemy відкриє транзакцію
+        driver = conn.connection.driver_connection
+        driver.execute('PRAGMA foreign_keys=OFF')
+        try:
+            for table in tables:
+                old_columns = {c['name'] for c in db.inspect(conn).get_columns(table.name)}
+                columns = ', '.join(f'"{c.name}"' for c in table.columns if c.name in old_columns)
+                name = conn.dialect.identifier_preparer.format_table(table)
+                ddl = str(CreateTable(table).compile(conn)).strip()
+                conn.exec_driver_sql(ddl.replace(f'CREATE TABLE {name} (', f'CREATE TABLE "_new_{table.name}" (', 1))
+                conn.exec_driver_sql(
+                    f'INSERT INTO "_new_{table.name}" ({columns}) SELECT {columns} FROM "{table.name}"'
+                )
+                conn.exec_driver_sql(f'DROP TABLE "{table.name}"')
+                conn.exec_driver_sql(f'ALTER TABLE "_new_{table.name}" RENAME TO "{table.name}"')
+            conn.commit()
+        finally:
+            driver.execute('PRAGMA foreign_keys=ON')
+
+
+# гаряча таблиця -> архівна з тими самими id (archive.py)
+ARCHIVE_TABLES = {'contract': 'archived_contract', 'event': 'archived_event'}
+
+
+def _reserve_archived_ids():
+    """Лічильник AUTOINCREMENT не нижче за id, уже перенесені в архів
+    (до перебудови таблиці SQLite міг видати їх знову)."""
+    if db.engine.dialect.name != 'sqlite':
+        return
+    with db.engine.begin() as conn:
+        for table, archived in ARCHIVE_TABLES.items():
+            top = conn.exec_driver_sql(f'SELECT max(id) FROM "{archived}"').scalar()
+            if top is None:
+                continue
+            conn.exec_driver_sql('INSERT INTO sqlite_sequence (name, seq) SELECT ?, 0 WHERE NOT EXISTS '
+                                 '(SELECT 1 FROM sqlite_sequence WHERE name = ?)', (table, table))
+            conn.exec_driver_sql('UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = ?', (top, table))
+
+
+# індекси, які замінено ширшими (ті самі перші колонки)
+OBSOLETE_INDEXES = [
+    'ix_event_user_date',   # -> ix_event_user_date_kind
+]
+
+
+def _drop_obsolete_indexes():
+    with db.engine.begin() as conn:
+        for name in OBSOLETE_INDEXES:
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{name}"')
+
+
+def _ensure_indexes():
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def _backfill_contract_end_dates():
+    contracts = Contract.query.filter(Contract.end_date.is_(None)).all()
+    for contract in contracts:
+        contract.end_date = schedule_end_date(contract.start_date, contract.duration_months)
+    db.session.commit()
+
+
+def _backfill_updated_at():
+    with db.engine.begin() as conn:
+        for table in ('event', 'contract'):
+            conn.exec_driver_sql(f'UPDATE "{table}" SET updated_at = created_at WHERE updated_at IS NULL')
+
+
+def _backfill_user_stats():
+    """Лічильники головної для користувачів, у яких їх ще немає (база до stats.py):
+    головна сторінка їх лише читає."""
+    missing = db.session.scalars(
+        db.select(User.id).where(User.id.not_in(db.select(UserStats.user_id)))
+    ).all()
+    for user_id in missing:
+        stats.rebuild(user_id)
+    db.session.commit()
+
+
+def _backfill_change_log():
+    """Журнал змін для старої бази: кожна наявна подія і договір як одна зміна,
+    щоб перша синхронізація (/sync без курсора) віддала весь календар."""
+    if db.session.query(ChangeLog.user_id).first() is not None:
+        # транзакцію читання закриваємо, інакше наступні кроки upgrade() не зможуть писати
+        db.session.rollback()
+        return
+    # лічильник номерів живе в UserStats - його рядки вже є (_backfill_user_stats)
+    db.session.execute(db.text(
+        'INSERT INTO change_log (user_id, entity, entity_id, seq, deleted, changed_at) '
+        'SELECT user_id, entity, id, change_seq + ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY entity, id), '
+        '       0, coalesce(changed_at, CURRENT_TIMESTAMP) '
+        "FROM (SELECT user_id, 'contract' AS entity, id, updated_at AS changed_at FROM contract "
+        "      UNION ALL SELECT user_id, 'event', id, updated_at FROM event) AS existing "
+        'JOIN user_stats USING (user_id)'
+    ))
+    db.session.execute(
+        db.update(UserStats).values(change_seq=db.select(db.func.max(ChangeLog.seq))
+                                    .where(ChangeLog.user_id == UserStats.user_id).scalar_subquery())
+        .where(UserStats.user_id.in_(db.select(ChangeLog.user_id)))
+    )
+    db.session.commit()
+
+
+def upgrade():
+    """Створює таблиці та доганяє схему старої бази до поточних моделей."""
+    db.create_all()
+    _add_missing_columns()
+    _rebuild_tables()
+    _reserve_archived_ids()
+    _drop_obsolete_indexes()
+    _ensure_indexes()
+    _backfill_contract_end_dates()
+    _backfill_updated_at()
+    _backfill_user_stats()
+    _backfill_change_log()
+    with db.engine.begin() as conn:
+        search.install(conn)
@@ -2,19 +2,47 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import secrets
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
 
+
+# SQLite перевіряє зовнішні ключі (і виконує ON DELETE CASCADE) лише якщо
+# це ввімкнено для кожного з'єднання окремо
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(256))
+    # секрет у посиланні на підписку .ics (див. icsfeed.py)
+    feed_token = db.Column(db.String(64), unique=True, index=True)
     
-    events = db.relationship('Event', backref='author', lazy=True, cascade='all, delete-orphan')
-    contracts = db.relationship('Contract', backref='manager', lazy=True, cascade='all, delete-orphan')
+    events = db.relationship('Event', backref='author', lazy=True, cascade='all, delete-orphan',
+                             passive_deletes=True)
+    contracts = db.relationship('Contract', backref='manager', lazy=True, cascade='all, delete-orphan',
+                             passive_deletes=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # росте з кожним UPDATE рядка; за нею воркери звіряють кеш користувачів (user_cache.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    
+    __mapper_args__ = {'version_id_col': version}
+    
+    def reset_feed_token(self):
+        self.feed_token = secrets.token_urlsafe(24)
+        return self.feed_token
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -34,11 +62,39 @@ class Contract(db.Model):
     amount = db.Column(db.Float, nullable=False)       
     start_date = db.Column(db.Date, nullable=False)    
     duration_months = db.Column(db.Integer, nullable=False) 
+    # дата останнього платежу, щоб шукати договори, активні в діапазоні дат
+    end_date = db.Column(db.Date)
+    # True - платежі розгортаються з графіка на льоту (див. schedules.py),
+    # False - старі договори, для яких платежі вже записані в таблицю event
+    virtual_schedule = db.Column(db.Boolean, nullable=False, default=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
     
-    events = db.relationship('Event', backref='contract_ref', lazy=True, cascade='all, delete-orphan')
+    events = db.relationship('Event', backref='contract_ref', lazy=True, cascade='all, delete-orphan',
+                             passive_deletes=True)
+    schedule_exceptions = db.relationship('ScheduleException', lazy=True, cascade='all, delete-orphan',
+                             passive_deletes=True)
+
+    __table_args__ = (
+        db.Index('ix_contract_user_end_date', 'user_id', 'end_date'),
+        # реєстр договорів гортається посторінково за (start_date, id)
+        db.Index('ix_contract_user_start_date', 'user_id', 'start_date', 'id'),
+        # анулювання шукає договір за точним номером або назвою клієнта
+        db.Index('ix_contract_user_number', 'user_id', 'number'),
+        db.Index('ix_contract_user_client_name', 'user_id', 'client_name'),
+        # розсилка нагадувань гортає договори всіх користувачів за цим ключем
+        db.Index('ix_contract_user_client_email', 'user_id', 'client_email', 'id'),
+        # покривний індекс для прогнозу (forecast.py): групування портфеля
+        # читає лише індекс, без звернень до рядків таблиці
+        db.Index('ix_contract_user_forecast', 'user_id', 'start_date', 'duration_months', 'amount'),
+        # id не видається вдруге: перенесені в архів (archive.py) і видалені
+        # договори зберігають свій id в архіві, журналі змін і нагадуваннях
+        {'sqlite_autoincrement': True},
+    )
+
+    is_archived = False
 
     def __repr__(self):
         return f'<Contract {self.number} - {self.client_name}>'
@@ -49,7 +105,8 @@ class Event(db.Model):
     description = db.Column(db.Text)
     date = db.Column(db.Date, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
     
     # важливвість події: low, medium, high
     priority = db.Column(db.String(20), default='medium') 
@@ -58,7 +115,198 @@ class Event(db.Model):
     event_type = db.Column(db.String(20), default='general')
     
     # лінк на договір, якщо подія пов'язана з договором
-    contract_id = db.Column(db.Integer, db.ForeignKey('contract.id'), nullable=True)
+    contract_id = db.Column(db.Integer, db.ForeignKey('contract.id', ondelete='CASCADE'), nullable=True)
+    # номер платежу в графіку договору, якщо подію створено з платежу
+    occurrence = db.Column(db.Integer, nullable=True)
+
+    # звичайна подія з бази, на відміну від платежу з графіка
+    is_virtual = False
+    is_archived = False
+
+    # календар завжди шукає події користувача в діапазоні дат; priority і
+    # event_type в кінці, щоб річна теплова карта (heatmap.py) рахувала
+    # GROUP BY лише з індексу
+    __table_args__ = (
+        db.Index('ix_event_user_date_kind', 'user_id', 'date', 'priority', 'event_type'),
+        # каскадне видалення подій договору (анулювання, архів) без повного перегляду таблиці
+        db.Index('ix_event_contract', 'contract_id'),
+        # як у договору: id архівних і видалених подій не дістанеться новим
+        {'sqlite_autoincrement': True},
+    )
+
+    def __repr__(self):
+        return f'<Event {self.title} on {self.date} (Pri: {self.priority})>'
+
+# платежі графіка, які користувач змінив (тепер це звичайна подія) або видалив
+class ScheduleException(db.Model):
+    contract_id = db.Column(db.Integer, db.ForeignKey('contract.id', ondelete='CASCADE'), primary_key=True)
+    occurrence = db.Column(db.Integer, primary_key=True)
+
+    def __repr__(self):
+        return f'<ScheduleException {self.contract_id}#{self.occurrence}>'
+
+
+# черга листів: запит лише додає лист, відправляє його фоновий воркер (outbox.py)
+class OutboxMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # адреси через кому
+    body = db.Column(db.Text, nullable=False)
+
+    # pending -> sending -> sent, або failed після MAX_ATTEMPTS спроб
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+
+    # який воркер забрав лист і коли
+    claim_token = db.Column(db.String(32))
+    claimed_at = db.Column(db.DateTime)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.status}: {self.subject}>'
+
+
+# лічильники для головної сторінки, оновлюються разом із записами (stats.py)
+class UserStats(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    contracts_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Float, nullable=False, default=0)
+    # зростає з кожним записом подій чи договорів користувача (для ETag і кешу сторінок)
+    data_version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # останній виданий номер у журналі змін користувача (changes.py)
+    change_seq = db.Column(db.Integer, nullable=False, default=0)
+    # події раніше цієї дати можуть бути вже в архівних таблицях (archive.py)
+    archived_before = db.Column(db.Date)
+
+    def __repr__(self):
+        return f'<UserStats {self.user_id}: {self.contracts_count} contracts>'
+
+
+# кількість подій (разом із платежами з графіків) на кожен день
+class UserDayStats(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    events_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<UserDayStats {self.user_id} {self.day}: {self.events_count}>'
+
+
+# журнал змін для синхронізації (/sync, changes.py): один рядок на подію чи
+# договір - його остання зміна з номером seq, видалені лишаються "надгробками"
+class ChangeLog(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    entity = db.Column(db.String(10), primary_key=True)   # event / contract
+    entity_id = db.Column(db.Integer, primary_key=True)
+    seq = db.Column(db.Integer, nullable=False)
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # /sync гортає зміни користувача за seq
+        db.Index('ix_change_log_user_seq', 'user_id', 'seq', unique=True),
+    )
+
+    def __repr__(self):
+        return f'<ChangeLog {self.user_id}#{self.seq} {self.entity} {self.entity_id}>'
+
+
+# === АРХІВ (archive.py) ===
+# Минулі події і завершені договори переносяться сюди з тими самими id і
+# колонками, тож гарячі таблиці не ростуть з роками. Архів лише для читання.
+
+class ArchivedContract(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    number = db.Column(db.String(50), nullable=False)
+    client_name = db.Column(db.String(100), nullable=False)
+    client_email = db.Column(db.String(120), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    duration_months = db.Column(db.Integer, nullable=False)
+    end_date = db.Column(db.Date)
+    virtual_schedule = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+
+    is_archived = True
+
+    __table_args__ = (
+        db.Index('ix_archived_contract_user_end_date', 'user_id', 'end_date'),
+        db.Index('ix_archived_contract_user_start_date', 'user_id', 'start_date', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<ArchivedContract {self.number} - {self.client_name}>'
+
+
+class ArchivedEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+    date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    priority = db.Column(db.String(20), default='medium')
+    event_type = db.Column(db.String(20), default='general')
+    # події договору архівуються лише разом із ним
+    contract_id = db.Column(db.Integer, db.ForeignKey('archived_contract.id', ondelete='CASCADE'), nullable=True)
+    occurrence = db.Column(db.Integer, nullable=True)
+
+    is_virtual = False
+    is_archived = True
+
+    __table_args__ = (
+        db.Index('ix_archived_event_user_date_kind', 'user_id', 'date', 'priority', 'event_type'),
+    )
+
+    def __repr__(self):
+        return f'<ArchivedEvent {self.title} on {self.date}>'
+
+
+class ArchivedScheduleException(db.Model):
+    contract_id = db.Column(db.Integer, db.ForeignKey('archived_contract.id', ondelete='CASCADE'), primary_key=True)
+    occurrence = db.Column(db.Integer, primary_key=True)
+
+    def __repr__(self):
+        return f'<ArchivedScheduleException {self.contract_id}#{self.occurrence}>'
+
+
+# сповіщення для живих оновлень між воркерами (live.DatabaseBroker), живуть кілька хвилин
+class LiveMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    days = db.Column(db.Text)   # JSON-список ISO-дат; NULL - перечитати все
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<LiveMessage {self.id} user={self.user_id}>'
+
+
+# нагадування про платежі, які вже поставлено в чергу листів (reminders.py):
+# повторний запуск розсилки не шле того ж нагадування вдруге
+class ReminderLog(db.Model):
+    audience = db.Column(db.String(10), primary_key=True)      # client / manager
+    # "<contract_id>:<occurrence>" для платежу з графіка (і відредагованого
+    # з нього), "event:<id>" для платежу без номера в графіку
+    payment_key = db.Column(db.String(40), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    due_date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_reminder_log_user_due', 'user_id', 'due_date'),
+    )
 
     def __repr__(self):
-        return f'<Event {self.title} on {self.date} (Pri: {self.priority})>'
\ No newline at end of file
+        return f'<ReminderLog {self.audience} {self.payment_key}>'
@@ -0,0 +1,137 @@
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from flask_mail import Message
+
+from models import db, OutboxMessage
+
+
+# === ЧЕРГА ЛИСТІВ ===
+# Маршрути лише записують лист у таблицю outbox_message в тій же транзакції,
+# що й сам договір. Воркери забирають листи пачками і відправляють кожну
+# пачку через одне SMTP-з'єднання (mail.connect()), з повторами і паузою,
+# що подвоюється після кожної невдачі.
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30        # 30 с, 1 хв, 2 хв, 4 хв ...
+STALE_CLAIM = timedelta(minutes=10)  # лист воркера, що впав, повертається в чергу
+POLL_INTERVAL = 2.0
+
+
+def enqueue(subject, recipients, body):
+    """Ставить лист у чергу. Комітить його той, хто викликав."""
+    message = OutboxMessage(
+        subject=subject,
+        recipients=','.join(r for r in recipients if r),
+        body=body,
+    )
+    db.session.add(message)
+    return message
+
+
+def enqueue_many(messages):
+    """Ставить у чергу багато листів одним INSERT на пачку (для розсилок).
+    messages - пари (тема, адреси, текст). Комітить той, хто викликав."""
+    rows = [{'subject': subject, 'recipients': ','.join(r for r in recipients if r), 'body': body}
+            for subject, recipients, body in messages]
+    for i in range(0, len(rows), 1000):
+        db.session.execute(db.insert(OutboxMessage), rows[i:i + 1000])
+    return len(rows)
+
+
+def claim_batch(batch_size=BATCH_SIZE):
+    """Атомарно забирає пачку листів, готових до відправки, для цього воркера."""
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due = db.select(OutboxMessage.id).where(
+        db.or_(
+            (OutboxMessage.status == 'pending') & (OutboxMessage.next_attempt_at <= now),
+            (OutboxMessage.status == 'sending') & (OutboxMessage.claimed_at < now - STALE_CLAIM),
+        )
+    ).order_by(OutboxMessage.id).limit(batch_size)
+
+    db.session.execute(
+        db.update(OutboxMessage)
+        .where(OutboxMessage.id.in_(due.scalar_subquery()))
+        .values(status='sending', claim_token=token, claimed_at=now)
+    )
+    db.session.commit()
+    return OutboxMessage.query.filter_by(claim_token=token, status='sending').order_by(OutboxMessage.id).all()
+
+
+def _record_failure(message, error):
+    message.attempts += 1
+    message.last_error = str(error)
+    message.claim_token = None
+    if message.attempts >= MAX_ATTEMPTS:
+        message.status = 'failed'
+    else:
+        message.status = 'pending'
+        delay = BACKOFF_SECONDS * 2 ** (message.attempts - 1)
+        message.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+
+def deliver_batch(mail, batch_size=BATCH_SIZE):
+    """Відправляє одну пачку листів. Повертає (відправлено, не вдалося)."""
+    messages = claim_batch(batch_size)
+    if not messages:
+        return 0, 0
+
+    sent = failed = 0
+    try:
+        with mail.connect() as conn:
+            for message in messages:
+                try:
+                    conn.send(Message(message.subject,
+                                      recipients=message.recipients.split(','),
+                                      body=message.body))
+                except Exception as e:
+                    _record_failure(message, e)
+                    failed += 1
+                else:
+                    message.status = 'sent'
+                    message.attempts += 1
+                    message.sent_at = datetime.utcnow()
+                    message.claim_token = None
+                    sent += 1
+    except Exception as e:
+        # не вдалося з'єднатися з SMTP - повторимо всю пачку пізніше
+        for message in messages:
+            if message.status == 'sending':
+                _record_failure(message, e)
+                failed += 1
+
+    db.session.commit()
+    return sent, failed
+
+
+def _worker_loop(app, mail, stop, poll_interval, once):
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                sent, failed = deliver_batch(mail)
+            except Exception:
+                # з трасуванням у лог застосунку, а не в stdout процесу-воркера
+                app.logger.exception("Outbox worker error")
+                db.session.rollback()
+                sent = failed = 0
+            finally:
+                db.session.remove()
+        if once and not (sent or failed):
+            return
+        if not (sent or failed):
+            stop.wait(poll_interval)
+
+
+def start_workers(app, mail, threads=1, poll_interval=POLL_INTERVAL, once=False):
+    """Запускає пул фонових воркерів. Повертає (потоки, подія для зупинки)."""
+    stop = threading.Event()
+    workers = []
+    for i in range(threads):
+        worker = threading.Thread(target=_worker_loop, name=f"outbox-worker-{i}",
+                                  args=(app, mail, stop, poll_interval, once), daemon=True)
+        worker.start()
+        workers.append(worker)
+    return workers, stop
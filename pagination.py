@@ -0,0 +1,135 @@
+import base64
+import json
+from datetime import date, datetime
+
+from models import db
+
+
+# === KEYSET-ПАГІНАЦІЯ ===
+# Сторінка визначається не OFFSET, а ключем сортування останнього показаного
+# рядка: наступна сторінка - це рядки з ключем "після" нього. Курсор - це
+# напрямок ('n' вперед / 'p' назад) і ключ, закодовані в base64.
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+class Page:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def per_page_arg(value):
+    try:
+        per_page = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PER_PAGE
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return 't:' + value.isoformat()
+    if isinstance(value, date):
+        return 'd:' + value.isoformat()
+    return value
+
+
+def _load(value):
+    if isinstance(value, str):
+        if value.startswith('t:'):
+            return datetime.fromisoformat(value[2:])
+        if value.startswith('d:'):
+            return date.fromisoformat(value[2:])
+    return value
+
+
+def encode_cursor(direction, key):
+    raw = json.dumps([direction] + [_dump(v) for v in key], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, key_types=None):
+    """Повертає (напрямок, ключ). ValueError, якщо курсор пошкоджений.
+
+    key_types - типи елементів ключа, яких чекає джерело (напр. (date, int)):
+    курсор приходить від клієнта, і чужий ключ у SQL чи порівнянні дав би 500.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, *key = json.loads(raw)
+        key = tuple(_load(v) for v in key)
+    except (ValueError, TypeError):
+        raise ValueError('некоректний курсор')
+    if direction not in ('n', 'p') or not key:
+        raise ValueError('некоректний курсор')
+    # type(), а не isinstance(): bool - теж int, datetime - теж date
+    if key_types is not None and (len(key) != len(key_types)
+                                  or any(type(v) is not t for v, t in zip(key, key_types))):
+        raise ValueError('некоректний курсор')
+    return direction, key
+
+
+def keyset_condition(columns, key, greater):
+    """(col1, col2, ...) > key або < key одним порівнянням рядків."""
+    row = db.tuple_(*columns)
+    values = db.tuple_(*[db.literal(v) for v in key])
+    return row > values if greater else row < values
+
+
+def tagged_condition(sort_column, id_column, kind, key, greater):
+    """Умова для джерела з номером kind, коли ключ має вигляд (значення, kind, id).
+
+    Так рядки різних джерел з однаковим значенням сортування йдуть
+    у сталому порядку: спочатку джерело з меншим kind.
+    """
+    value, key_kind, key_id = key
+    if kind == key_kind:
+        return keyset_condition((sort_column, id_column), (value, key_id), greater)
+    if (kind > key_kind) == greater:
+        return sort_column >= value if greater else sort_column <= value
+    return sort_column > value if greater else sort_column < value
+
+
+def paginate(sources, cursor=None, per_page=DEFAULT_PER_PAGE, descending=False, key_types=None):
+    """Одна сторінка з одного або кількох джерел, злитих за спільним ключем.
+
+    Кожне джерело - функція fetch(key, greater, ascending, limit), що повертає
+    до limit пар (ключ, рядок), відсортованих за ключем, з ключем більшим
+    (greater=True) або меншим за key; key=None - з самого початку.
+    key_types - типи елементів ключа для перевірки курсора (decode_cursor).
+    """
+    direction, key = decode_cursor(cursor, key_types) if cursor else ('n', None)
+    forward = direction == 'n'
+    ascending = forward != descending
+    greater = ascending
+
+    rows = []
+    for fetch in sources:
+        rows.extend(fetch(key, greater, ascending, per_page + 1))
+    rows.sort(key=lambda row: row[0], reverse=not ascending)
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    # ідучи назад, ми прийшли зі сторінки, що йде далі
+    has_next = has_more if forward else True
+    has_prev = key is not None if forward else has_more
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_next:
+            next_cursor = encode_cursor('n', rows[-1][0])
+        if has_prev:
+            prev_cursor = encode_cursor('p', rows[0][0])
+    return Page([item for _, item in rows], next_cursor, prev_cursor)
@@ -0,0 +1,31 @@
+from config import Config
+
+
+# === ПРОФІЛЬ ДЛЯ ПРОДАКШНУ ===
+# Кілька процесів-воркерів (див. wsgi.py) працюють з однією базою.
+# Запити здебільшого чекають на базу, а не на процесор (листи відправляє
+# окремий процес, див. outbox.py), і потік, що чекає, відпускає GIL - тож
+# у кожного воркера багато потоків: WORKER_THREADS, як gunicorn --threads.
+# Для SQLite - WAL: читачі не блокують записувача і навпаки, а записи
+# чекають черги до busy_timeout. Для серверної бази параметри пулу
+# додаються автоматично (database.SERVER_ENGINE_OPTIONS).
+
+class ProductionConfig(Config):
+    DEBUG = False
+    TESTING = False
+
+    # має збігатися з --threads у команді запуску (wsgi.py); від нього
+    # залежать пул з'єднань і ліміт живих потоків /stream на воркер
+    WORKER_THREADS = 32
+
+    # воркерів кілька, тож сповіщення /stream мають доходити й до вкладок,
+    # відкритих в іншому процесі (live.py)
+    LIVE_BACKEND = 'database'
+
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',   # у WAL безпечно: після збою губиться лише останній коміт
+        'busy_timeout': 30000,
+        'cache_size': -20000,      # 20 МБ кешу сторінок на з'єднання
+        'temp_store': 'MEMORY',
+    }
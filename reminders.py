@@ -0,0 +1,228 @@
+import itertools
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from models import db, User, Contract, Event, ScheduleException, ReminderLog
+from schedules import add_months, occurrences_between, payment_title
+from pagination import keyset_condition
+import outbox
+import stats
+
+
+# === НАГАДУВАННЯ ПРО ПЛАТЕЖІ ===
+# Щоденна розсилка з cron (flask send-reminders): платежі на найближчі N днів
+# усіх користувачів читаються одним запитом, посторінково за ключем
+# (user_id, client_email, id), тож у пам'яті лише сторінка договорів і
+# нагадування одного менеджера. Кожен клієнт отримує один лист-дайджест з
+# усіма своїми платежами, менеджер - один лист з платежами всіх своїх
+# клієнтів. Листи йдуть через чергу outbox (пачками через одне SMTP-з'єднання).
+#
+# Кожне нагадування записується в reminder_log у тій же транзакції, що й
+# лист, тож повторний запуск (cron двічі, падіння посередині) не шле того ж
+# удруге, а новий платіж у вже розісланому вікні піде наступним запуском.
+# Журнал перевіряється за ключем платежу, а не за датою: платіж, перенесений
+# після нагадування на іншу дату, вдруге не нагадується.
+
+DEFAULT_DAYS = 3
+FETCH_SIZE = 2000           # договорів на сторінку запиту
+DIGEST_MAX_LINES = 100      # далі в листі лише "і ще N платежів"
+LOG_RETENTION_DAYS = 90     # скільки зберігати журнал після дати платежу
+AUDIENCES = ('client', 'manager')
+
+DuePayment = namedtuple('DuePayment', 'user_id email client_name key date title amount number')
+
+
+class ReminderReport:
+    def __init__(self):
+        self.payments = 0        # платежів у вікні
+        self.already_sent = 0    # нагадувань, пропущених за журналом
+        self.digests = 0         # листів поставлено в чергу
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return (f'<ReminderReport payments={self.payments} already_sent={self.already_sent} '
+                f'digests={self.digests}>')
+
+
+def _contract_payment(contract, occurrence):
+    return DuePayment(contract.user_id, contract.client_email, contract.client_name,
+                      f'{contract.id}:{occurrence}', add_months(contract.start_date, occurrence),
+                      payment_title(contract, occurrence), contract.amount / contract.duration_months,
+                      contract.number)
+
+
+def _due_contract_payments(start, end):
+    """Платежі з графіків усіх користувачів у [start, end], за (user_id, client_email)."""
+    columns = (Contract.user_id, Contract.client_email, Contract.id)
+    query = db.select(
+        Contract.id, Contract.user_id, Contract.number, Contract.client_name, Contract.client_email,
+        Contract.amount, Contract.start_date, Contract.duration_months
+    ).where(
+        Contract.virtual_schedule.is_(True), Contract.start_date <= end, Contract.end_date >= start
+    ).order_by(*columns).limit(FETCH_SIZE)
+
+    key = None
+    while True:
+        page = query if key is None else query.where(keyset_condition(columns, key, greater=True))
+        contracts = db.session.execute(page).all()
+        if not contracts:
+            return
+        # платежі, які користувач відредагував (тепер це подія) або видалив
+        skipped = set(db.session.execute(
+            db.select(ScheduleException.contract_id, ScheduleException.occurrence)
+            .where(ScheduleException.contract_id.in_([c.id for c in contracts]))
+        ).all())
+        for contract in contracts:
+            for occurrence in occurrences_between(contract, start, end):
+                if (contract.id, occurrence) not in skipped:
+                    yield _contract_payment(contract, occurrence)
+        if len(contracts) < FETCH_SIZE:
+            return
+        last = contracts[-1]
+        key = (last.user_id, last.client_email, last.id)
+
+
+def _due_event_payments(user_id, start, end):
+    """Платежі-події користувача: відредаговані платежі графіка і старі договори."""
+    rows = db.session.execute(
+        db.select(Event.id, Event.title, Event.date, Event.contract_id, Event.occurrence,
+                  Contract.client_email, Contract.client_name, Contract.number,
+                  Contract.amount, Contract.duration_months)
+        .outerjoin(Contract, Event.contract_id == Contract.id)
+        .where(Event.user_id == user_id, Event.event_type == 'payment', Event.date.between(start, end))
+        .order_by(Event.date, Event.id)
+    )
+    for row in rows:
+        # відредагований платіж має той самий ключ, що й платіж графіка
+        key = f'{row.contract_id}:{row.occurrence}' if row.occurrence is not None else f'event:{row.id}'
+        amount = row.amount / row.duration_months if row.contract_id else None
+        yield DuePayment(user_id, row.client_email, row.client_name, key, row.date, row.title,
+                         amount, row.number)
+
+
+def _line(payment):
+    line = f"- {payment.date:%d.%m.%Y}: {payment.title}"
+    if payment.amount is not None:
+        line += f", {payment.amount:.2f} грн"
+    if payment.number:
+        line += f" (договір №{payment.number})"
+    return line
+
+
+class _Digest:
+    """Рядки листа з обмеженням довжини і підсумки."""
+
+    def __init__(self):
+        self.lines = []
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, payment):
+        self.count += 1
+        self.total += payment.amount or 0
+        if len(self.lines) < DIGEST_MAX_LINES:
+            self.lines.append(_line(payment))
+
+    def body(self, header):
+        lines = [header, ''] + self.lines
+        if self.count > len(self.lines):
+            lines.append(f"... і ще {self.count - len(self.lines)} платежів")
+        lines += ['', f"Разом: {self.count} платежів на суму {self.total:.2f} грн."]
+        return '\n'.join(lines)
+
+
+def _remind_user(user_id, contract_payments, start, end, audiences, report):
+    """Дайджести одного менеджера та його клієнтів. Одна транзакція на менеджера."""
+    user = db.session.get(User, user_id)
+    # ключі платежів містять id договору чи події, тож усі вони - цього користувача
+    logged = set(db.session.execute(
+        db.select(ReminderLog.audience, ReminderLog.payment_key).where(ReminderLog.user_id == user_id)
+    ).all())
+
+    # подій-платежів небагато: розкладаємо їх за клієнтами заздалегідь
+    event_payments = {}
+    for payment in _due_event_payments(user_id, start, end):
+        event_payments.setdefault(payment.email, []).append(payment)
+
+    def client_groups():
+        for email, payments in itertools.groupby(contract_payments, key=lambda p: p.email):
+            yield email, itertools.chain(payments, event_payments.pop(email, []))
+        # клієнти, у яких у вікні лише відредаговані платежі
+        for email in list(event_payments):
+            yield email, event_payments.pop(email)
+
+    manager = _Digest()
+    log_rows, mails = [], []
+
+    def log(audience, payment):
+        log_rows.append({'audience': audience, 'payment_key': payment.key,
+                         'user_id': user_id, 'due_date': payment.date})
+
+    def flush():
+        # у тій же транзакції: листи і записи журналу комітяться разом
+        report.digests += outbox.enqueue_many(mails)
+        if log_rows:
+            # паралельний запуск міг уже записати ці нагадування
+            db.session.execute(stats.dialect_insert(ReminderLog).on_conflict_do_nothing(), log_rows)
+        mails.clear()
+        log_rows.clear()
+
+    for email, payments in client_groups():
+        client = _Digest()
+        client_name = None
+        for payment in payments:
+            report.payments += 1
+            if 'client' in audiences and email:
+                if ('client', payment.key) in logged:
+                    report.already_sent += 1
+                else:
+                    client.add(payment)
+                    client_name = payment.client_name
+                    log('client', payment)
+            if 'manager' in audiences:
+                if ('manager', payment.key) in logged:
+                    report.already_sent += 1
+                else:
+                    manager.add(payment)
+                    log('manager', payment)
+        if client.count:
+            mails.append((f"Нагадування про платежі до {end:%d.%m.%Y}", [email], client.body(
+                f"Шановний(а) {client_name}, нагадуємо про найближчі платежі за договорами:")))
+        if len(mails) >= FETCH_SIZE or len(log_rows) >= FETCH_SIZE:
+            flush()
+
+    if manager.count:
+        mails.append((f"Платежі клієнтів до {end:%d.%m.%Y}", [user.email], manager.body(
+            f"Вітаємо, {user.username}! Платежі клієнтів з {start:%d.%m.%Y} по {end:%d.%m.%Y}:")))
+    flush()
+    db.session.commit()
+
+
+def prune_log(before):
+    """Видаляє записи журналу про платежі, старші за дату before."""
+    db.session.execute(db.delete(ReminderLog).where(ReminderLog.due_date < before))
+    db.session.commit()
+
+
+def send_reminders(today, days=DEFAULT_DAYS, audiences=AUDIENCES):
+    """Ставить у чергу дайджести про платежі з today по today + days включно."""
+    started = time.perf_counter()
+    report = ReminderReport()
+    start, end = today, today + timedelta(days=days)
+    prune_log(today - timedelta(days=LOG_RETENTION_DAYS))
+
+    # менеджери, у яких у вікні є лише платежі-події, без платежів з графіків
+    event_users = set(db.session.scalars(
+        db.select(Event.user_id).distinct()
+        .where(Event.event_type == 'payment', Event.date.between(start, end))
+    ))
+
+    for user_id, payments in itertools.groupby(_due_contract_payments(start, end), key=lambda p: p.user_id):
+        event_users.discard(user_id)
+        _remind_user(user_id, payments, start, end, audiences, report)
+    for user_id in sorted(event_users):
+        _remind_user(user_id, iter(()), start, end, audiences, report)
+
+    report.seconds = time.perf_counter() - started
+    return report
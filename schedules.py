@@ -0,0 +1,116 @@
+import calendar
+from datetime import date
+
+from models import db, Contract, ScheduleException
+
+
+# === ГРАФІК ПЛАТЕЖІВ ДОГОВОРУ ===
+# Платежі не зберігаються рядками в таблиці event: договір сам є графіком
+# (start_date + duration_months), а конкретні платежі розгортаються лише
+# для того діапазону дат, який показує сторінка.
+
+def add_months(source_date, months):
+    month = source_date.month - 1 + months
+    year = source_date.year + month // 12
+    month = month % 12 + 1
+    day = min(source_date.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+def schedule_end_date(start_date, duration_months):
+    """Дата останнього платежу за графіком."""
+    return add_months(start_date, duration_months - 1)
+
+
+def _months_between(start, end):
+    return (end.year - start.year) * 12 + end.month - start.month
+
+
+class PaymentInstance:
+    """Один платіж графіка. Має ті ж поля, що й Event, тож шаблони
+    показують його так само, як звичайну подію."""
+
+    id = None
+    priority = 'high'
+    event_type = 'payment'
+    is_virtual = True
+    is_archived = False
+
+    def __init__(self, contract, occurrence):
+        self.contract_id = contract.id
+        self.user_id = contract.user_id
+        self.occurrence = occurrence
+        self.date = add_months(contract.start_date, occurrence)
+        self.created_at = contract.created_at
+        self.title = payment_title(contract, occurrence)
+        self.description = payment_description(contract)
+
+    def __repr__(self):
+        return f'<PaymentInstance {self.contract_id}#{self.occurrence} on {self.date}>'
+
+
+def payment_title(contract, occurrence):
+    return f"Платіж: {contract.client_name} ({occurrence + 1}/{contract.duration_months})"
+
+
+def payment_description(contract):
+    monthly_payment = contract.amount / contract.duration_months
+    return f"Сума: {monthly_payment:.2f} грн. Договір №{contract.number}."
+
+
+def occurrences_between(contract, start, end):
+    """Номери платежів договору, що припадають на [start, end]."""
+    # платіж №k завжди припадає на k-й місяць від початку, змінюється
+    # лише день (31 -> 28), тож перший і останній місяць перевіряємо за датою
+    first = max(_months_between(contract.start_date, start), 0)
+    last = min(_months_between(contract.start_date, end), contract.duration_months - 1)
+    for occurrence in range(first, last + 1):
+        if start <= add_months(contract.start_date, occurrence) <= end:
+            yield occurrence
+
+
+def expand_payments(user_id, *ranges, contract_model=Contract, exception_model=ScheduleException):
+    """Розгортає платежі всіх договорів користувача для діапазонів дат
+    (start, end) включно. Повертає список PaymentInstance, впорядкований за датою.
+    contract_model / exception_model - моделі архіву для завершених договорів (archive.py)."""
+    if not ranges:
+        return []
+
+    contracts = contract_model.query.filter(
+        contract_model.user_id == user_id,
+        contract_model.virtual_schedule.is_(True),
+        db.or_(*[
+            (contract_model.start_date <= end) & (contract_model.end_date >= start)
+            for start, end in ranges
+        ])
+    ).all()
+    if not contracts:
+        return []
+
+    # платежі, які користувач відредагував або видалив - лише для договорів
+    # у діапазоні, а не для всіх договорів користувача
+    skipped = set(db.session.query(
+        exception_model.contract_id, exception_model.occurrence
+    ).filter(exception_model.contract_id.in_([c.id for c in contracts])).all())
+
+    payments = []
+    for contract in contracts:
+        seen = set()
+        for start, end in ranges:
+            for occurrence in occurrences_between(contract, start, end):
+                if occurrence in seen or (contract.id, occurrence) in skipped:
+                    continue
+                seen.add(occurrence)
+                payments.append(PaymentInstance(contract, occurrence))
+
+    payments.sort(key=lambda p: (p.date, p.contract_id, p.occurrence))
+    return payments
+
+
+def get_payment(contract, occurrence):
+    """Платіж графіка, або None, якщо такого немає чи його вже змінено."""
+    if not contract.virtual_schedule or not 0 <= occurrence < contract.duration_months:
+        return None
+    if db.session.get(ScheduleException, (contract.id, occurrence)):
+        return None
+    return PaymentInstance(contract, occurrence)
@@ -0,0 +1,137 @@
+import re
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from models import db, Contract, ArchivedContract
+
+
+# === ПОВНОТЕКСТОВИЙ ПОШУК ДОГОВОРІВ (SQLite FTS5) ===
+# Таблиця contract_fts дублює номер і клієнта кожного договору і
+# синхронізується тригерами, тож її не треба оновлювати з коду (і масовий
+# імпорт теж потрапляє в індекс). Токенізатор unicode61 не зважає на регістр
+# і для кирилиці. Власник договору зберігається токеном "u<id>" у колонці
+# owner, щоб FTS одразу перетинав результати з договорами користувача.
+#
+# Договори, перенесені в архів (archive.py), індексує так само
+# archived_contract_fts: видалення з contract прибирає рядок з contract_fts,
+# а вставка в archived_contract додає його сюди. Пошук читає обидві.
+
+SEARCH_LIMIT = 50
+
+# (таблиця договорів, її FTS-таблиця)
+FTS_TABLES = [('contract', 'contract_fts'), ('archived_contract', 'archived_contract_fts')]
+
+
+def fts_ddl(table, fts):
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+        number, client_name, owner,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {fts}(rowid, number, client_name, owner)
+        VALUES (new.id, new.number, new.client_name, 'u' || new.user_id);
+    END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+        DELETE FROM {fts} WHERE rowid = old.id;
+    END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_update
+    AFTER UPDATE OF number, client_name, user_id ON {table} BEGIN
+        UPDATE {fts} SET number = new.number, client_name = new.client_name,
+                                owner = 'u' || new.user_id
+        WHERE rowid = old.id;
+    END""",
+    ]
+
+
+def install(connection, tables=FTS_TABLES):
+    """Створює FTS-таблиці з тригерами і заповнює їх наявними договорами."""
+    if connection.dialect.name != 'sqlite':
+        return
+    for table, fts in tables:
+        if not connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).first():
+            continue
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+        ).first()
+        for ddl in fts_ddl(table, fts):
+            connection.exec_driver_sql(ddl)
+        if not exists:
+            connection.exec_driver_sql(
+                f"INSERT INTO {fts}(rowid, number, client_name, owner) "
+                f"SELECT id, number, client_name, 'u' || user_id FROM {table}"
+            )
+
+
+def _install_for(model):
+    table, fts = next(pair for pair in FTS_TABLES if pair[0] == model.__tablename__)
+
+    @event.listens_for(model.__table__, 'after_create')
+    def _create_fts(target, connection, **kw):
+        install(connection, [(table, fts)])
+
+    @event.listens_for(model.__table__, 'before_drop')
+    def _drop_fts(target, connection, **kw):
+        if connection.dialect.name == 'sqlite':
+            connection.exec_driver_sql(f'DROP TABLE IF EXISTS {fts}')
+
+
+_install_for(Contract)
+_install_for(ArchivedContract)
+
+
+def match_expression(user_id, query):
+    """Запит користувача -> вираз MATCH: кожне слово як префікс, всі слова обов'язкові."""
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    terms = ' AND '.join(f'"{word}"*' for word in words)
+    return f'owner : "u{user_id}" AND {{number client_name}} : ({terms})'
+
+
+def search_contracts(user_id, query, limit=SEARCH_LIMIT):
+    """Договори користувача, що відповідають запиту, від найрелевантніших."""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        try:
+            return _search_fts(user_id, query, limit)
+        except OperationalError:
+            # база ще без contract_fts (не запускали flask db-upgrade)
+            db.session.rollback()
+    return _search_like(user_id, query, limit)
+
+
+def _search_fts(user_id, query, limit):
+    expression = match_expression(user_id, query)
+    if expression is None:
+        return []
+    # id гарячих і архівних договорів не перетинаються (AUTOINCREMENT), тож
+    # рядок однозначно визначає пара (архівний?, id)
+    rows = db.session.execute(text(
+        "SELECT rowid, 0 AS archived, bm25(contract_fts, 1.0, 1.0, 0.0) AS rank "
+        "FROM contract_fts WHERE contract_fts MATCH :q "
+        "UNION ALL "
+        "SELECT rowid, 1, bm25(archived_contract_fts, 1.0, 1.0, 0.0) "
+        "FROM archived_contract_fts WHERE archived_contract_fts MATCH :q "
+        "ORDER BY rank LIMIT :limit"
+    ), {'q': expression, 'limit': limit}).all()
+    if not rows:
+        return []
+    found = {}
+    for archived, model in ((0, Contract), (1, ArchivedContract)):
+        ids = [row.rowid for row in rows if row.archived == archived]
+        if ids:
+            found.update({(archived, c.id): c for c in model.query.filter(model.id.in_(ids))})
+    return [found[key] for key in ((row.archived, row.rowid) for row in rows) if key in found]
+
+
+def _search_like(user_id, query, limit):
+    result = []
+    for model in (Contract, ArchivedContract):
+        result += model.query.filter(
+            (model.user_id == user_id) &
+            ((model.number.contains(query)) | (model.client_name.contains(query)))
+        ).order_by(model.start_date.desc()).limit(limit).all()
+    return sorted(result, key=lambda c: c.start_date, reverse=True)[:limit]
@@ -0,0 +1,34 @@
+function toggleThemeMenu() {
+    const menu = document.getElementById('themeMenu');
+    menu.classList.toggle('show');
+}
+
+function changeTheme(themeName) {
+    document.body.classList.remove('theme-purple', 'theme-orange', 'theme-blue', 'theme-green', 'theme-dark');
+    document.body.classList.add(`theme-${themeName}`);
+    localStorage.setItem('selectedTheme', themeName);
+    document.getElementById('themeMenu').classList.remove('show');
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const savedTheme = localStorage.getItem('selectedTheme') || 'purple';
+    changeTheme(savedTheme);
+});
+
+document.addEventListener('click', function(event) {
+    const themeMenu = document.getElementById('themeMenu');
+    const themeBtn = document.querySelector('.theme-btn');
+
+    if (!themeBtn.contains(event.target) && !themeMenu.contains(event.target)) {
+        themeMenu.classList.remove('show');
+    }
+});
+
+setTimeout(function() {
+    const flashMessages = document.querySelector('.flash-messages');
+    if (flashMessages) {
+        flashMessages.style.transition = 'opacity 0.5s ease';
+        flashMessages.style.opacity = '0';
+        setTimeout(() => flashMessages.remove(), 500);
+    }
+}, 5000);
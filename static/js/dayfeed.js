@@ -0,0 +1,20 @@
+function toggleThemeMenu() { const menu = document.getElementById('themeMenu'); menu.classList.toggle('show'); }
+function changeTheme(themeName) { document.body.classList.remove('theme-purple', 'theme-orange', 'theme-blue', 'theme-green', 'theme-dark'); document.body.classList.add(`theme-${themeName}`); localStorage.setItem('selectedTheme', themeName); document.getElementById('themeMenu').classList.remove('show'); }
+document.addEventListener('DOMContentLoaded', function() { const savedTheme = localStorage.getItem('selectedTheme') || 'purple'; changeTheme(savedTheme); });
+document.addEventListener('click', function(event) { const themeMenu = document.getElementById('themeMenu'); const themeBtn = document.querySelector('.theme-btn'); if (!themeBtn.contains(event.target) && !themeMenu.contains(event.target)) { themeMenu.classList.remove('show'); } });
+
+// === СКРИПТ АВТОМАТИЧНОГО ЗНИКНЕННЯ (Той самий, що в home.html) ===
+document.addEventListener("DOMContentLoaded", function() {
+    const alerts = document.querySelectorAll('.custom-alert');
+
+    if (alerts.length > 0) {
+        setTimeout(function() {
+            alerts.forEach(function(alert, index) {
+                setTimeout(function() {
+                    alert.style.animation = "fadeOut 0.5s ease forwards";
+                    setTimeout(() => alert.remove(), 500);
+                }, index * 200); 
+            });
+        }, 3500); // Час очікування - 3.5 секунди
+    }
+});
@@ -0,0 +1,28 @@
+function toggleThemeMenu() {
+    const menu = document.getElementById('themeMenu');
+    menu.classList.toggle('show');
+}
+
+function changeTheme(themeName) {
+    document.body.classList.remove('theme-purple', 'theme-orange', 'theme-blue', 'theme-green', 'theme-dark');
+
+    document.body.classList.add(`theme-${themeName}`);
+
+    localStorage.setItem('selectedTheme', themeName);
+
+    document.getElementById('themeMenu').classList.remove('show');
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const savedTheme = localStorage.getItem('selectedTheme') || 'purple';
+    changeTheme(savedTheme);
+});
+
+document.addEventListener('click', function(event) {
+    const themeMenu = document.getElementById('themeMenu');
+    const themeBtn = document.querySelector('.theme-btn');
+
+    if (!themeBtn.contains(event.target) && !themeMenu.contains(event.target)) {
+        themeMenu.classList.remove('show');
+    }
+});
@@ -0,0 +1,58 @@
+// === ГРАФІК ПРОГНОЗУ НАДХОДЖЕНЬ ===
+// Стовпці - надходження по місяцях, лінія - непогашений залишок (своя шкала).
+// Дані з /api/forecast, див. forecast.py.
+(function() {
+    const card = document.getElementById('forecast');
+    if (!card) return;
+    const chart = document.getElementById('forecastChart');
+    const summary = document.getElementById('forecastSummary');
+    const select = document.getElementById('forecastMonths');
+    const SVG = 'http://www.w3.org/2000/svg';
+    const W = 600, H = 180, PAD = 18;
+
+    function money(value) { return Math.round(value).toLocaleString('uk-UA') + ' ₴'; }
+
+    function node(name, attrs, text) {
+        const el = document.createElementNS(SVG, name);
+        for (const key in attrs) el.setAttribute(key, attrs[key]);
+        if (text !== undefined) el.textContent = text;
+        return el;
+    }
+
+    function draw(data) {
+        const n = data.months.length;
+        const maxInflow = Math.max(1, ...data.inflow);
+        const maxBalance = Math.max(1, ...data.balance);
+        const step = W / n;
+        const svg = node('svg', { viewBox: `0 0 ${W} ${H}`, preserveAspectRatio: 'none' });
+        const points = [];
+        data.inflow.forEach(function(value, i) {
+            const h = (H - PAD) * value / maxInflow;
+            const bar = node('rect', { class: 'bar', x: i * step + 1, y: H - PAD - h, width: Math.max(step - 2, 1), height: h });
+            bar.appendChild(node('title', {}, `${data.months[i]}: ${money(value)}, залишок ${money(data.balance[i])}`));
+            svg.appendChild(bar);
+            points.push(`${i * step + step / 2},${(H - PAD) * (1 - data.balance[i] / maxBalance)}`);
+            // підписи не частіше ніж раз на 6 стовпців
+            if (i % Math.ceil(n / 6) === 0) {
+                svg.appendChild(node('text', { class: 'label', x: i * step + 2, y: H - 4 }, data.months[i]));
+            }
+        });
+        svg.appendChild(node('polyline', { class: 'balance', points: points.join(' ') }));
+        chart.replaceChildren(svg);
+        summary.textContent = `Договорів: ${data.contracts}. Очікується ${money(data.due_total)} ` +
+            `(${data.due_count} платежів) за ${n} міс.`;
+    }
+
+    function load() {
+        fetch(`${card.dataset.url}?months=${select.value}`, { credentials: 'same-origin' })
+            .then(function(response) { return response.json(); })
+            .then(function(data) {
+                if (data.error) { summary.textContent = data.error; return; }
+                draw(data);
+            })
+            .catch(function() { summary.textContent = 'Не вдалося завантажити прогноз.'; });
+    }
+
+    select.addEventListener('change', load);
+    load();
+})();
@@ -0,0 +1,74 @@
+// === ЖИВІ ОНОВЛЕННЯ (SSE /stream) ===
+// Сервер шле {"days": [дати]} або {"reload": true}. Сторінка місяця
+// перечитує лише змінені клітинки через /api/days, сторінка дня
+// перезавантажується, якщо змінився її день.
+
+function liveRenderDay(cell, events) {
+    const list = cell.querySelector('ul');
+    list.replaceChildren(...events.map(function(e) {
+        const li = document.createElement('li');
+        li.className = `priority-${e.priority}`;
+        li.title = e.description;
+        li.textContent = e.title;
+        return li;
+    }));
+
+    let count = cell.querySelector('.events-count');
+    if (!events.length) {
+        if (count) count.remove();
+        return;
+    }
+    if (!count) {
+        count = document.createElement('div');
+        count.className = 'events-count';
+        list.after(count);
+    }
+    count.textContent = events.length;
+}
+
+function liveRefreshDays(dates) {
+    const body = document.body;
+    const cells = dates
+        .map(d => document.querySelector(`.day[data-date="${d}"]`))
+        .filter(Boolean);
+    if (!cells.length) return;
+
+    const wanted = cells.map(c => c.dataset.date).join(',');
+    fetch(`${body.dataset.daysUrl}?dates=${wanted}`, { credentials: 'same-origin' })
+        .then(r => r.ok ? r.json() : Promise.reject(r.status))
+        .then(function(data) {
+            cells.forEach(cell => liveRenderDay(cell, data.days[cell.dataset.date] || []));
+        })
+        .catch(() => window.location.reload());
+}
+
+function liveVisibleDays() {
+    return Array.from(document.querySelectorAll('.day[data-date]')).map(c => c.dataset.date);
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const body = document.body;
+    if (!body.dataset.streamUrl || !window.EventSource) return;
+
+    const source = new EventSource(body.dataset.streamUrl);
+    let connected = false;
+
+    source.addEventListener('open', function() {
+        // після обриву могли пропустити зміни - перечитуємо все видиме
+        if (connected && body.dataset.daysUrl) {
+            liveRefreshDays(liveVisibleDays());
+        }
+        connected = true;
+    });
+
+    source.addEventListener('change', function(event) {
+        const message = JSON.parse(event.data);
+        if (message.reload) {
+            window.location.reload();
+        } else if (body.dataset.daysUrl) {
+            liveRefreshDays(message.days);
+        } else if (message.days.includes(body.dataset.date)) {
+            window.location.reload();
+        }
+    });
+});
@@ -0,0 +1,93 @@
+function navigateMonth(direction) {
+    const currentYear = Number(document.body.dataset.year);
+    const currentMonth = Number(document.body.dataset.month);
+
+    let newYear = currentYear;
+    let newMonth = currentMonth + direction;
+
+    if (newMonth > 12) {
+        newMonth = 1;
+        newYear++;
+    } else if (newMonth < 1) {
+        newMonth = 12;
+        newYear--;
+    }
+
+    window.location.href = `/month/${newYear}/${newMonth}`;
+}
+
+function toggleYears() {
+    const dropdown = document.getElementById('yearsDropdown');
+    dropdown.classList.toggle('show');
+}
+
+function selectYear(year) {
+    const currentMonth = Number(document.body.dataset.month);
+    window.location.href = `/month/${year}/${currentMonth}`;
+}
+
+function toggleUpcoming() {
+    const dropdown = document.getElementById('upcomingDropdown');
+    dropdown.classList.toggle('show');
+}
+
+function toggleThemeMenu() {
+    const menu = document.getElementById('themeMenu');
+    menu.classList.toggle('show');
+}
+
+function changeTheme(themeName) {
+    document.body.classList.remove('theme-purple', 'theme-orange', 'theme-blue', 'theme-green', 'theme-dark');
+
+    document.body.classList.add(`theme-${themeName}`);
+
+    localStorage.setItem('selectedTheme', themeName);
+
+    document.getElementById('themeMenu').classList.remove('show');
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const savedTheme = localStorage.getItem('selectedTheme') || 'purple';
+    changeTheme(savedTheme);
+});
+
+document.addEventListener('click', function(event) {
+    const dropdown = document.getElementById('yearsDropdown');
+    const yearBtn = document.querySelector('.year-btn');
+    const upcomingDropdown = document.getElementById('upcomingDropdown');
+    const upcomingBtn = document.querySelector('.btn-upcoming');
+    const themeMenu = document.getElementById('themeMenu');
+    const themeBtn = document.querySelector('.theme-btn');
+
+    if (!yearBtn.contains(event.target) && !dropdown.contains(event.target)) {
+        dropdown.classList.remove('show');
+    }
+
+    if (!upcomingBtn.contains(event.target) && !upcomingDropdown.contains(event.target)) {
+        upcomingDropdown.classList.remove('show');
+    }
+
+    if (!themeBtn.contains(event.target) && !themeMenu.contains(event.target)) {
+        themeMenu.classList.remove('show');
+    }
+});
+
+document.getElementById('yearsDropdown').addEventListener('wheel', function(event) {
+    event.preventDefault();
+    this.scrollTop += event.deltaY;
+});
+
+// СКРИПТ ДЛЯ ЗНИКНЕННЯ ПОВІДОМЛЕНЬ
+document.addEventListener("DOMContentLoaded", function() {
+    const alerts = document.querySelectorAll('.custom-alert');
+    if (alerts.length > 0) {
+        setTimeout(function() {
+            alerts.forEach(function(alert, index) {
+                setTimeout(function() {
+                    alert.style.animation = "fadeOut 0.5s ease forwards";
+                    setTimeout(() => alert.remove(), 500);
+                }, index * 200); 
+            });
+        }, 3500);
+    }
+});
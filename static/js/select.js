@@ -0,0 +1,23 @@
+function goToMonth() {
+    const y = document.getElementById("year").value;
+    const m = document.getElementById("month").value;
+    window.location.href = `/month/${y}/${m}`;
+    return false;
+}
+
+document.getElementById('year').addEventListener('change', updateSelection);
+document.getElementById('month').addEventListener('change', updateSelection);
+
+function updateSelection() {
+    const year = document.getElementById('year').value;
+    const month = document.getElementById('month').value;
+    const monthNames = {
+        '1': 'Січень', '2': 'Лютий', '3': 'Березень', 
+        '4': 'Квітень', '5': 'Травень', '6': 'Червень',
+        '7': 'Липень', '8': 'Серпень', '9': 'Вересень',
+        '10': 'Жовтень', '11': 'Листопад', '12': 'Грудень'
+    };
+
+    document.getElementById('selected-year').textContent = year;
+    document.getElementById('selected-month').textContent = monthNames[month];
+}
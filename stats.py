@@ -0,0 +1,189 @@
+from collections import Counter
+from datetime import datetime
+
+from models import (db, Contract, Event, ScheduleException, UserStats, UserDayStats,
+                    ArchivedContract, ArchivedEvent, ArchivedScheduleException)
+from schedules import add_months
+import live
+
+
+# === ЛІЧИЛЬНИКИ ДЛЯ ГОЛОВНОЇ СТОРІНКИ ===
+# Кожен запис договору чи події оновлює лічильники в тій самій транзакції,
+# тож головна сторінка читає два рядки за первинним ключем замість
+# COUNT/SUM по всіх договорах користувача. Змінені дні заодно йдуть у
+# живі оновлення відкритих сторінок (live.py).
+
+def dialect_insert(model):
+    """INSERT з on_conflict_do_update для діалекту поточної бази."""
+    # діалект імпортується лише той, з яким працює база (postgresql - дорогий імпорт)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def _bump_user(user_id, contracts=0, amount=0.0):
+    """Оновлює лічильники договорів і збільшує версію даних користувача."""
+    stmt = dialect_insert(UserStats)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={
+            'contracts_count': UserStats.contracts_count + stmt.excluded.contracts_count,
+            'total_amount': UserStats.total_amount + stmt.excluded.total_amount,
+            'data_version': UserStats.data_version + 1,
+            'updated_at': stmt.excluded.updated_at,
+        }
+    )
+    db.session.execute(stmt, [{'user_id': user_id, 'contracts_count': contracts, 'total_amount': amount,
+                               'data_version': 1, 'updated_at': datetime.utcnow()}])
+
+
+def _bump_days(user_id, day_counts):
+    live.touch(user_id, day_counts.keys())
+    rows = [{'user_id': user_id, 'day': day, 'events_count': n}
+            for day, n in day_counts.items() if n]
+    if not rows:
+        return
+    stmt = dialect_insert(UserDayStats)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'day'],
+        set_={'events_count': UserDayStats.events_count + stmt.excluded.events_count}
+    )
+    db.session.execute(stmt, rows)
+
+
+def payment_dates(start_date, duration_months, skip=()):
+    return [add_months(start_date, i) for i in range(duration_months) if i not in skip]
+
+
+def user_created(user_id):
+    _bump_user(user_id)
+
+
+def events_added(user_id, *dates):
+    _bump_user(user_id)
+    _bump_days(user_id, Counter(dates))
+
+
+def events_removed(user_id, *dates):
+    _bump_user(user_id)
+    _bump_days(user_id, Counter({d: -n for d, n in Counter(dates).items()}))
+
+
+def event_moved(user_id, old_date, new_date):
+    """Викликати і при зміні події без зміни дати - це теж нова версія даних."""
+    _bump_user(user_id)
+    live.touch(user_id, (old_date, new_date))
+    if old_date != new_date:
+        _bump_days(user_id, Counter({old_date: -1, new_date: 1}))
+
+
+def events_changed(user_id, added=(), removed=(), updated=()):
+    """Пачка змін подій одним оновленням лічильників (перенесення - в обох списках,
+    updated - дні подій, змінених без перенесення)."""
+    days = Counter(added)
+    days.subtract(removed)
+    _bump_user(user_id)
+    live.touch(user_id, updated)
+    _bump_days(user_id, days)
+
+
+def contracts_added(user_id, contracts):
+    """contracts - словники або об'єкти з amount, start_date, duration_months."""
+    # у пачці імпорту багато договорів з однаковим графіком - розгортаємо кожен графік один раз
+    by_schedule = Counter()
+    count = 0
+    amount = 0.0
+    for c in contracts:
+        get = c.get if isinstance(c, dict) else lambda name: getattr(c, name)
+        count += 1
+        amount += get('amount')
+        by_schedule[(get('start_date'), get('duration_months'))] += 1
+
+    days = Counter()
+    for (start_date, duration), n in by_schedule.items():
+        for day in payment_dates(start_date, duration):
+            days[day] += n
+    _bump_user(user_id, count, amount)
+    _bump_days(user_id, days)
+
+
+def contract_removed(contract):
+    """Викликати до видалення договору: прибирає його платежі й події з лічильників."""
+    days = Counter()
+    if contract.virtual_schedule:
+        skip = {o for (o,) in db.session.query(ScheduleException.occurrence)
+                .filter(ScheduleException.contract_id == contract.id)}
+        days.update(payment_dates(contract.start_date, contract.duration_months, skip))
+    days.update(d for (d,) in db.session.query(Event.date).filter(Event.contract_id == contract.id))
+    _bump_user(contract.user_id, -1, -contract.amount)
+    _bump_days(contract.user_id, Counter({d: -n for d, n in days.items()}))
+
+
+def data_changed(user_id):
+    """Нова версія даних без зміни лічильників (напр. після перенесення в архів)."""
+    _bump_user(user_id)
+
+
+def dashboard(user_id, day):
+    """(кількість договорів, загальна сума, подій на день). Лише читає."""
+    # рядок з'являється при реєстрації чи першому записі, старим базам його
+    # дораховує migrations.upgrade(); без нього в користувача ще нічого немає
+    user_stats = db.session.get(UserStats, user_id)
+    day_stats = db.session.get(UserDayStats, (user_id, day))
+    return (user_stats.contracts_count if user_stats else 0,
+            user_stats.total_amount if user_stats else 0.0,
+            day_stats.events_count if day_stats else 0)
+
+
+def data_version(user_id):
+    """(версія даних, час останнього запису) користувача."""
+    row = db.session.query(UserStats.data_version, UserStats.updated_at).filter_by(user_id=user_id).first()
+    if row is None:
+        return 0, datetime(1970, 1, 1)
+    return row.data_version, row.updated_at or datetime(1970, 1, 1)
+
+
+def rebuild(user_id):
+    """Перераховує лічильники користувача з нуля (не комітить)."""
+    # версію не скидаємо, інакше старі ETag знову стали б дійсними
+    version = data_version(user_id)[0]
+    # і номер журналу змін, інакше курсори синхронізації почали б повторюватись
+    # і межу архіву, інакше сторінки перестали б читати вже перенесені події
+    change_seq, archived_before = db.session.query(
+        UserStats.change_seq, UserStats.archived_before).filter_by(user_id=user_id).first() or (0, None)
+    UserStats.query.filter_by(user_id=user_id).delete()
+    UserDayStats.query.filter_by(user_id=user_id).delete()
+
+    # архівні договори й події (archive.py) теж рахуються - це та сама історія користувача
+    count, amount = 0, 0.0
+    days = Counter()
+    for contracts, events, exceptions in ((Contract, Event, ScheduleException),
+                                          (ArchivedContract, ArchivedEvent, ArchivedScheduleException)):
+        n, total = db.session.query(
+            db.func.count(contracts.id), db.func.coalesce(db.func.sum(contracts.amount), 0)
+        ).filter(contracts.user_id == user_id).one()
+        count, amount = count + n, amount + total
+
+        days.update(dict(db.session.query(events.date, db.func.count(events.id))
+                         .filter(events.user_id == user_id).group_by(events.date)))
+
+        skipped = {}
+        for contract_id, occurrence in db.session.query(
+                exceptions.contract_id, exceptions.occurrence
+        ).join(contracts).filter(contracts.user_id == user_id):
+            skipped.setdefault(contract_id, set()).add(occurrence)
+
+        schedule = db.session.query(contracts.id, contracts.start_date, contracts.duration_months).filter(
+            contracts.user_id == user_id, contracts.virtual_schedule.is_(True)
+        ).execution_options(yield_per=1000)
+        for contract_id, start_date, duration in schedule:
+            days.update(payment_dates(start_date, duration, skipped.get(contract_id, ())))
+
+    db.session.add(UserStats(user_id=user_id, data_version=version, change_seq=change_seq,
+                             archived_before=archived_before))
+    db.session.flush()
+    _bump_user(user_id, count, amount)
+
+    _bump_days(user_id, days)
@@ -1,14 +1,47 @@
 import unittest
+import base64
+import csv
+import gzip
+import io
+import json
 import os
+import re
+import shutil
+import socketserver
+import subprocess
 import sys
+import tempfile
+import threading
+import unittest.mock
 from datetime import date, datetime
 
+import sqlalchemy
+from flask import g
+
 # Додаємо шлях до папки проекту, щоб Python бачив main.py
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from main import app, db
-from models import User, Event, Contract
+from main import app, db, mail, page_cache
+from models import User, Event, Contract, OutboxMessage, ArchivedContract
 from config import Config
+from analytics import Analytics
+import analytics
+import schedules
+import outbox
+import reminders
+import stats
+import search
+import instrumentation
+import database
+import user_cache
+import live
+import archive
+import heatmap
+import icsfeed
+import importer
+import migrations
+from main import create_app
+from production import ProductionConfig
 
 # === КОНФІГУРАЦІЯ ДЛЯ ТЕСТІВ ===
 class TestConfig(Config):
@@ -20,6 +53,47 @@ class TestConfig(Config):
     # ВАЖЛИВО: Блокуємо реальну відправку листів, щоб не потрібен був пароль
     MAIL_SUPPRESS_SEND = True 
 
+# === ЛОКАЛЬНИЙ SMTP-СЕРВЕР ДЛЯ ТЕСТІВ ЧЕРГИ ЛИСТІВ ===
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 fake smtp')
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line.split(' ')[0].upper()
+            if command == 'DATA':
+                self.reply('354 end with .')
+                data = []
+                while True:
+                    chunk = self.rfile.readline().decode()
+                    if chunk.rstrip('\r\n') == '.':
+                        break
+                    data.append(chunk)
+                self.server.messages.append(''.join(data))
+                self.reply('250 queued')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.connections = 0
+        self.messages = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
 class CalendarTestCase(unittest.TestCase):
     
     def setUp(self):
@@ -32,6 +106,9 @@ class CalendarTestCase(unittest.TestCase):
         self.app_context.push()
         
         db.create_all()
+        # кеш сторінок живе в процесі, а база в кожному тесті нова
+        page_cache.clear()
+        user_cache.cache.clear()
         
         # Створюємо тестового користувача
         self.test_user = User(username='testuser', email='test@example.com')
@@ -58,6 +135,59 @@ class CalendarTestCase(unittest.TestCase):
         # Перевіряємо, чи є на сторінці привітання (значить ми залогінені)
         self.assertIn(b'testuser', response.data)
 
+    def test_user_loader_cache_skips_user_select(self):
+        """current_user з кешу: без SELECT user на запит, скидається при зміні"""
+        def get(url):
+            # клієнт ділить контекст застосунку з тестом; як на сервері, кожен запит
+            # має завантажити користувача заново
+            g.pop('_login_user', None)
+            return self.client.get(url)
+
+        get('/')   # перший запит читає користувача в кеш
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        sqlalchemy.event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            for _ in range(3):
+                self.assertIn(b'testuser', get('/').data)
+        finally:
+            sqlalchemy.event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertFalse([st for st in statements if 'FROM user \n' in st])
+        self.assertGreaterEqual(user_cache.cache.stats()['hits'], 3)
+
+        # зміна через ORM у цьому процесі: версія росте, кеш оновлюється одразу
+        user = db.session.get(User, self.test_user.id)
+        user.username = 'renamed'
+        db.session.commit()
+        self.assertEqual(user.version, 2)
+        self.assertIn(b'renamed', get('/').data)
+
+        # зміна з іншого воркера видна після TTL або щойно цей процес прочитає новішу версію
+        db.session.execute(sqlalchemy.text('UPDATE user SET username = :name, version = version + 1'),
+                           {'name': 'elsewhere'})
+        db.session.commit()
+        self.assertIn(b'renamed', get('/').data)
+        db.session.expire_all()
+        db.session.get(User, self.test_user.id)
+        self.assertIn(b'elsewhere', get('/').data)
+
+        # без жодного читання User у цьому процесі - після TTL
+        db.session.execute(sqlalchemy.text('UPDATE user SET username = :name, version = version + 1'),
+                           {'name': 'later'})
+        db.session.commit()
+        self.assertIn(b'elsewhere', get('/').data)
+        ttl, user_cache.cache.ttl = user_cache.cache.ttl, 0
+        try:
+            self.assertIn(b'later', get('/').data)
+        finally:
+            user_cache.cache.ttl = ttl
+
+        # видалений користувач більше не проходить автентифікацію
+        db.session.delete(db.session.get(User, self.test_user.id))
+        db.session.commit()
+        self.assertEqual(get('/month/2026/5').status_code, 302)
+
     # === ТЕСТИ ПОДІЙ (З ПРІОРИТЕТАМИ) ===
     def test_add_event_with_priority(self):
         """Тестуємо створення події з високим пріоритетом"""
@@ -76,6 +206,78 @@ class CalendarTestCase(unittest.TestCase):
         self.assertEqual(event.priority, 'high')
         self.assertEqual(str(event.date), '2026-05-20')
 
+    def test_month_view_groups_events_by_day(self):
+        """Сторінка місяця показує події свого дня і не чіпає інші місяці"""
+        db.session.add_all([
+            Event(title='May Event', date=date(2026, 5, 20), user_id=self.test_user.id),
+            Event(title='June Event', date=date(2026, 6, 1), user_id=self.test_user.id),
+        ])
+        db.session.commit()
+
+        response = self.client.get('/month/2026/5')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('May Event'.encode(), response.data)
+        self.assertNotIn('June Event'.encode(), response.data)
+
+    def test_day_feed_keyset_pages(self):
+        """Стрічка дня гортається курсорами без пропусків і повторів"""
+        day = date(2026, 4, 1)
+        for i in range(5):
+            db.session.add(Event(title=f'Feed {i}', date=day, user_id=self.test_user.id,
+                                 created_at=datetime(2026, 3, 1, 12, 0, 0)))
+        db.session.add(Contract(number='FEED-1', client_name='Feed Client', client_email='f@test.com',
+                                amount=100, start_date=day, duration_months=1, end_date=day,
+                                user_id=self.test_user.id, created_at=datetime(2026, 3, 1, 12, 0, 0)))
+        db.session.commit()
+
+        seen = []
+        url = '/day/2026-04-01?per_page=2'
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            page = response.data.decode()
+            titles = [t for t in ['Feed 0', 'Feed 1', 'Feed 2', 'Feed 3', 'Feed 4', 'Feed Client'] if t in page]
+            seen.extend(titles)
+            pages += 1
+            match = re.search(r'cursor=([\w-]+)&amp;per_page=2" class="btn">Наступні', page)
+            url = f'/day/2026-04-01?cursor={match.group(1)}&per_page=2' if match else None
+        self.assertEqual(pages, 3)
+        self.assertEqual(sorted(seen), ['Feed 0', 'Feed 1', 'Feed 2', 'Feed 3', 'Feed 4', 'Feed Client'])
+
+        # крок назад з останньої сторінки повертає попередню
+        prev = re.search(r'cursor=([\w-]+)&amp;per_page=2" class="btn">⬅️', page).group(1)
+        self.assertIn('Feed 3', self.client.get(f'/day/2026-04-01?cursor={prev}&per_page=2').data.decode())
+
+        self.assertEqual(self.client.get('/day/2026-04-01?cursor=broken').status_code, 400)
+        # підроблені курсори з чужим ключем - теж 400, а не помилка в SQL чи порівнянні
+        def forged(*parts):
+            raw = json.dumps(list(parts)).encode()
+            return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+        for url in (f'/contracts?cursor={forged("n", 1, 2, 3)}',
+                    f'/contracts?cursor={forged("p", None, None, None)}',
+                    f'/day/2026-04-01?cursor={forged("n", "x")}'):
+            self.assertEqual(self.client.get(url).status_code, 400, url)
+
+    def test_month_conditional_get_and_render_cache(self):
+        """304 поки дані не змінились, кеш сторінки, нова версія після запису"""
+        first = self.client.get('/month/2026/5')
+        etag = first.headers['ETag']
+        self.assertEqual(first.status_code, 200)
+
+        cached = self.client.get('/month/2026/5')
+        self.assertEqual(cached.data, first.data)
+        self.assertGreaterEqual(page_cache.hits, 1)
+
+        not_modified = self.client.get('/month/2026/5', headers={'If-None-Match': etag})
+        self.assertEqual(not_modified.status_code, 304)
+
+        self.client.post('/add', data={'title': 'Versioned', 'date': '2026-05-02'})
+        self.client.get('/day/2026-05-02')  # забираємо flash-повідомлення
+        changed = self.client.get('/month/2026/5', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn(b'Versioned', changed.data)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+
     # === ТЕСТИ ДОГОВОРІВ (З EMAIL) ===
     def test_add_contract_logic(self):
         """Тестуємо створення договору та генерацію платежів"""
@@ -96,10 +298,640 @@ class CalendarTestCase(unittest.TestCase):
         self.assertIsNotNone(contract)
         self.assertEqual(contract.client_email, 'client@google.com')
         
-        # 2. Перевіряємо, чи створилися автоматичні платежі (має бути 12 штук)
+        # 2. Платежі не записуються в базу, а розгортаються з графіка (12 штук)
+        self.assertEqual(Event.query.filter_by(contract_id=contract.id).count(), 0)
+        payments = schedules.expand_payments(self.test_user.id, (date(2025, 1, 1), date(2027, 12, 31)))
+        self.assertEqual(len(payments), 12)
+        self.assertEqual(payments[0].date, date(2026, 1, 1))
+        self.assertEqual(payments[-1].date, date(2026, 12, 1))
+        self.assertEqual(payments[0].priority, 'high') # Платежі мають бути червоними
+
+        # 3. Платіж видно в календарі
+        response = self.client.get('/month/2026/3')
+        self.assertIn('Google Inc (3/12)'.encode(), response.data)
+
+    def test_edit_payment_creates_single_event(self):
+        """Редагування платежу створює подію лише для цього платежу"""
+        contract = Contract(
+            number='EDIT-001', client_name='Edit Client', client_email='edit@test.com',
+            amount=3000, start_date=date(2026, 1, 31), duration_months=3,
+            end_date=date(2026, 3, 31), user_id=self.test_user.id
+        )
+        db.session.add(contract)
+        db.session.commit()
+
+        response = self.client.post(f'/payment/{contract.id}/1', data={
+            'title': 'Moved payment', 'description': '', 'date': '2026-03-05'
+        }, follow_redirects=True)
+        self.assertEqual(response.status_code, 200)
+
         events = Event.query.filter_by(contract_id=contract.id).all()
-        self.assertEqual(len(events), 12)
-        self.assertEqual(events[0].priority, 'high') # Платежі мають бути червоними
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].occurrence, 1)
+
+        # Лютневий платіж (28.02) більше не розгортається, решта лишилися
+        payments = schedules.expand_payments(self.test_user.id, (date(2026, 1, 1), date(2026, 12, 31)))
+        self.assertEqual([p.date for p in payments], [date(2026, 1, 31), date(2026, 3, 31)])
+
+    def test_import_contracts_csv(self):
+        """Масовий імпорт: валідні рядки імпортуються, помилкові - у звіті"""
+        csv_data = (
+            'number,client,client_email,amount,start_date,duration\n'
+            'IMP-1,Client One,one@test.com,1200,2026-01-15,12\n'
+            'IMP-2,Client Two,two@test.com,abc,2026-01-15,12\n'
+            'IMP-3,Client Three,three@test.com,600,2026-02-01,6\n'
+        ).encode('utf-8')
+
+        response = self.client.post('/import_contracts', data={
+            'file': (io.BytesIO(csv_data), 'contracts.csv')
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+
+        numbers = sorted(c.number for c in Contract.query.all())
+        self.assertEqual(numbers, ['IMP-1', 'IMP-3'])
+        self.assertIn('некоректна сума'.encode(), response.data)
+        self.assertEqual(Contract.query.filter_by(number='IMP-3').first().end_date, date(2026, 7, 1))
+
+        # нескінченні суми відхиляються, зламаний посередині файл зупиняє імпорт без 500
+        jsonl_data = (
+            b'{"number": "IMP-4", "client": "C", "client_email": "c@test.com", "amount": NaN, '
+            b'"start_date": "2026-01-15", "duration": 3}\n'
+            b'{"number": "IMP-5", "client": "C", "client_email": "c@test.com", "amount": 1e400, '
+            b'"start_date": "2026-01-15", "duration": 3}\n'
+        ) + b''.join(
+            b'{"number": "IMP-6-%d", "client": "C", "client_email": "c@test.com", "amount": 300, '
+            b'"start_date": "2026-01-15", "duration": 3}\n' % i for i in range(200)
+        ) + b'{"number": "IMP-7", "client": "\xff\xfe"}\n'
+        report = importer.import_contracts(io.BytesIO(jsonl_data), 'jsonl', self.test_user.id)
+        # файл декодується блоками, тож рядки з блоку з помилкою теж не імпортуються
+        self.assertGreater(report.imported, 0)
+        self.assertEqual(report.imported, report.rows - 2)
+        self.assertEqual([line for line, _ in report.errors[:2]], [1, 2])
+        self.assertEqual(len(report.errors), 3)
+        self.assertIn('UTF-8', report.errors[-1][1])
+        self.assertEqual(Contract.query.filter(Contract.number.like('IMP-6-%')).count(), report.imported)
+
+        broken_csv = ('number,client,client_email,amount,start_date,duration\n'
+                      'IMP-8,Client,c@test.com,300,2026-01-15,3\n'
+                      'IMP-9,"' + 'x' * (csv.field_size_limit() + 1) + '",c@test.com,300,2026-01-15,3\n'
+                      ).encode('utf-8')
+        response = self.client.post('/import_contracts', data={
+            'file': (io.BytesIO(broken_csv), 'contracts.csv')
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('некоректний CSV'.encode(), response.data)
+        self.assertIsNotNone(Contract.query.filter_by(number='IMP-8').first())
+
+    # === ТЕСТИ ЛІЧИЛЬНИКІВ ГОЛОВНОЇ СТОРІНКИ ===
+    def test_dashboard_counters_follow_writes(self):
+        """Лічильники після записів збігаються з повним перерахунком"""
+        for number, amount in (('ST-1', '1200'), ('ST-2', '600')):
+            self.client.post('/add_contract', data={
+                'number': number, 'client': 'Stats Client', 'client_email': 'stats@test.com',
+                'amount': amount, 'start_date': '2026-03-10', 'duration': '6'
+            })
+        self.client.post('/add', data={'title': 'Meeting', 'date': '2026-03-10'})
+        contract = Contract.query.filter_by(number='ST-2').first()
+        self.client.get(f'/payment/{contract.id}/0/delete')
+        self.client.post(f'/cancel/{Contract.query.filter_by(number="ST-1").first().id}')
+
+        day = date(2026, 3, 10)
+        self.assertEqual(stats.dashboard(self.test_user.id, day), (1, 600, 1))
+        self.assertEqual(stats.dashboard(self.test_user.id, date(2026, 4, 10)), (1, 600, 1))
+
+        stats.rebuild(self.test_user.id)
+        db.session.commit()
+        self.assertEqual(stats.dashboard(self.test_user.id, day), (1, 600, 1))
+        self.assertEqual(stats.dashboard(self.test_user.id, date(2026, 4, 10)), (1, 600, 1))
+
+        # база до лічильників: головна їх лише читає, дораховує оновлення схеми
+        db.session.execute(sqlalchemy.text('DELETE FROM user_stats'))
+        db.session.execute(sqlalchemy.text('DELETE FROM user_day_stats'))
+        db.session.commit()
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        sqlalchemy.event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            self.assertEqual(self.client.get('/').status_code, 200)
+        finally:
+            sqlalchemy.event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertFalse([st for st in statements if st.startswith(('INSERT', 'DELETE', 'UPDATE', 'BEGIN IMMEDIATE'))])
+        self.assertEqual(stats.dashboard(self.test_user.id, day), (0, 0.0, 0))
+        migrations.upgrade()
+        self.assertEqual(stats.dashboard(self.test_user.id, day), (1, 600, 1))
+
+    def test_events_batch_api(self):
+        """Пакет операцій: результати по кожній, кілька SQL-запитів на весь пакет"""
+        other = User(username='other', email='other@example.com')
+        db.session.add(other)
+        db.session.flush()
+        events = [Event(title=f'B{i}', date=date(2026, 5, i), user_id=self.test_user.id) for i in (1, 2, 3)]
+        foreign = Event(title='Foreign', date=date(2026, 5, 1), user_id=other.id)
+        db.session.add_all(events + [foreign])
+        db.session.commit()
+        stats.rebuild(self.test_user.id)
+        db.session.commit()
+        e1, e2, e3 = (e.id for e in events)
+        foreign_id = foreign.id
+
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        sqlalchemy.event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = self.client.post('/api/events/batch', json={'operations': [
+                {'op': 'create', 'title': 'New', 'date': '2026-05-10', 'priority': 'high'},
+                {'op': 'update', 'id': e1, 'title': 'Renamed'},
+                {'op': 'move', 'id': e1, 'days': 7},
+                {'op': 'move', 'id': e2, 'date': '2026-06-01'},
+                {'op': 'delete', 'id': e3},
+                {'op': 'update', 'id': e3, 'title': 'Too late'},
+                {'op': 'delete', 'id': foreign_id},
+                {'op': 'bogus'},
+            ]})
+        finally:
+            sqlalchemy.event.remove(db.engine, 'before_cursor_execute', record)
+
+        data = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in data['results']],
+                         ['created', 'updated', 'moved', 'moved', 'deleted', 'not_found', 'not_found', 'invalid'])
+        self.assertEqual((data['applied'], data['failed']), (True, 3))
+        # одна перевірка належності, INSERT, UPDATE пачкою, DELETE, лічильники і журнал змін
+        self.assertEqual(len([st for st in statements if st.startswith('SELECT event')]), 1)
+        self.assertLessEqual(len(statements), 10)
+
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Event, e1).title, 'Renamed')
+        self.assertEqual(db.session.get(Event, e1).date, date(2026, 5, 8))
+        self.assertEqual(db.session.get(Event, e2).date, date(2026, 6, 1))
+        self.assertIsNone(db.session.get(Event, e3))
+        self.assertIsNotNone(db.session.get(Event, foreign_id))
+        created = db.session.get(Event, data['results'][0]['id'])
+        self.assertEqual((created.title, created.priority), ('New', 'high'))
+
+        # лічильники по днях збігаються з повним перерахунком
+        days = [date(2026, 5, d) for d in (1, 2, 3, 8, 10)] + [date(2026, 6, 1)]
+        incremental = [stats.dashboard(self.test_user.id, d)[2] for d in days]
+        self.assertEqual(incremental, [0, 0, 0, 1, 1, 1])
+        stats.rebuild(self.test_user.id)
+        db.session.commit()
+        self.assertEqual([stats.dashboard(self.test_user.id, d)[2] for d in days], incremental)
+
+        # atomic: одна помилка - нічого не записано
+        response = self.client.post('/api/events/batch', json={'atomic': True, 'operations': [
+            {'op': 'delete', 'id': e1}, {'op': 'move', 'id': e2, 'date': 'never'}]})
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(response.get_json()['applied'])
+        db.session.expire_all()
+        self.assertIsNotNone(db.session.get(Event, e1))
+
+        # зсув за межі дат - помилка операції, а не 500
+        response = self.client.post('/api/events/batch', json={'operations': [
+            {'op': 'move', 'id': e1, 'days': 10**9}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['results'][0]['status'], 'invalid')
+
+        # id поза межами цілих бази - помилка операції, а не OverflowError
+        response = self.client.post('/api/events/batch', json={'operations': [
+            {'op': 'delete', 'id': 2**63}, {'op': 'delete', 'id': 0}, {'op': 'update', 'id': -5, 'title': 'x'}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in response.get_json()['results']], ['invalid'] * 3)
+
+        self.assertEqual(self.client.post('/api/events/batch', json={'operations': []}).status_code, 400)
+        self.assertEqual(self.client.post('/api/events/batch', data='nope').status_code, 400)
+
+    def test_sync_returns_only_changes_after_cursor(self):
+        """/sync: усі зміни сторінками, потім лише нові, видалення - надгробками"""
+        for i in (1, 2, 3):
+            self.client.post('/add', data={'title': f'S{i}', 'date': f'2026-05-0{i}'})
+        self.client.post('/add_contract', data={
+            'number': 'SYNC-1', 'client': 'Sync Client', 'client_email': 'sync@test.com',
+            'amount': '1200', 'start_date': '2026-01-15', 'duration': '3'})
+
+        seen, cursor, pages = {}, None, 0
+        while True:
+            data = self.client.get('/sync', query_string={'since': cursor, 'limit': 3} if cursor else {'limit': 3}).get_json()
+            for change in data['changes']:
+                seen[(change['entity'], change['id'])] = change
+            cursor, pages = data['cursor'], pages + 1
+            if not data['has_more']:
+                break
+        self.assertEqual(pages, 2)
+        self.assertEqual(sorted(c['data'].get('title') or c['data']['number'] for c in seen.values()),
+                         ['S1', 'S2', 'S3', 'SYNC-1'])
+
+        # нічого не змінилось - порожня відповідь з тим самим курсором
+        data = self.client.get(f'/sync?since={cursor}').get_json()
+        self.assertEqual((data['changes'], data['cursor']), ([], cursor))
+
+        event_ids = {c['data']['title']: c['id'] for c in seen.values() if c['entity'] == 'event'}
+        contract = Contract.query.filter_by(number='SYNC-1').one()
+        self.client.post(f'/edit/{event_ids["S1"]}', data={'title': 'S1 edited', 'description': '', 'date': '2026-05-09'})
+        self.client.get(f'/delete/{event_ids["S2"]}')
+        self.client.get(f'/payment/{contract.id}/1/delete')
+        self.client.post('/api/events/batch', json={'operations': [{'op': 'move', 'id': event_ids['S3'], 'days': 1}]})
+
+        changes_after = self.client.get(f'/sync?since={cursor}').get_json()['changes']
+        by_key = {(c['entity'], c['id']): c for c in changes_after}
+        self.assertEqual(len(changes_after), 4)
+        self.assertEqual(by_key[('event', event_ids['S1'])]['data']['title'], 'S1 edited')
+        self.assertEqual(by_key[('event', event_ids['S2'])], {'entity': 'event', 'id': event_ids['S2'],
+                                                              'seq': by_key[('event', event_ids['S2'])]['seq'],
+                                                              'deleted': True})
+        self.assertEqual(by_key[('event', event_ids['S3'])]['data']['date'], '2026-05-04')
+        self.assertEqual(by_key[('contract', contract.id)]['data']['skipped'], [1])
+        self.assertGreater(by_key[('event', event_ids['S1'])]['data']['updated_at'],
+                           by_key[('event', event_ids['S1'])]['data']['created_at'])
+
+        # анулювання договору - надгробок договору
+        self.client.post(f'/cancel/{contract.id}')
+        last = self.client.get(f'/sync?since={cursor}').get_json()['changes']
+        self.assertTrue({'entity': 'contract', 'id': contract.id, 'deleted': True}.items()
+                        <= [c for c in last if c['entity'] == 'contract'][0].items())
+        # номери у журналі не повторюються і зростають
+        self.assertEqual([c['seq'] for c in last], sorted({c['seq'] for c in last}))
+
+        self.assertEqual(self.client.get('/sync?since=broken').status_code, 400)
+
+    def test_live_stream_pushes_changed_days(self):
+        """SSE: після коміту в потік ідуть змінені дні, відкат нічого не шле, понад ліміт - лише retry"""
+        broker = app.extensions['live']
+        subscription = broker.subscribe(self.test_user.id)
+        try:
+            self.client.post('/add', data={'title': 'Live', 'date': '2026-06-10'})
+            self.assertEqual(subscription.wait(0), {'days': ['2026-06-10']})
+
+            event = Event.query.filter_by(title='Live').one()
+            self.client.post('/api/events/batch', json={'operations': [
+                {'op': 'move', 'id': event.id, 'days': 2},
+                {'op': 'create', 'title': 'Live 2', 'date': '2026-06-20'},
+            ]})
+            self.assertEqual(subscription.wait(0), {'days': ['2026-06-10', '2026-06-12', '2026-06-20']})
+
+            live.touch(self.test_user.id, [date(2026, 6, 1)])
+            db.session.rollback()
+            self.assertIsNone(subscription.wait(0))
+
+            # повільний клієнт: багато днів зливаються в одне перезавантаження
+            subscription.push([f'2026-07-{d:02d}' for d in range(1, 32)])
+            subscription.push([f'2026-08-{d:02d}' for d in range(1, 32)])
+            subscription.push(['2026-09-01'])
+            self.assertEqual(subscription.wait(0), {'reload': True})
+
+            body = live.stream(broker, broker.subscribe(self.test_user.id), seconds=0)
+            self.assertEqual(next(body), f'retry: {live.RETRY_MS}\n\n')
+            self.assertEqual(list(body), [])
+            self.assertEqual(broker.stats()['streams'], 1)
+
+            # понад ліміт - порожній потік з паузою, щоб EventSource спробував пізніше
+            broker.max_per_user = 1
+            response = self.client.get('/stream')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'text/event-stream')
+            self.assertEqual(response.get_data(as_text=True), f'retry: {live.BUSY_RETRY_MS}\n\n')
+            self.assertEqual(broker.stats()['streams'], 1)
+
+            # збій брокера не перетворює закомічений запис на 500
+            def broken(user_id, days):
+                raise RuntimeError('broker down')
+            broker.publish = broken
+            with self.assertLogs(app.logger, 'ERROR'):
+                response = self.client.post('/add', data={'title': 'Live 3', 'date': '2026-06-21'})
+            self.assertEqual(response.status_code, 302)
+            self.assertIsNotNone(Event.query.filter_by(title='Live 3').first())
+        finally:
+            del broker.publish
+            broker.max_per_user = live.MAX_STREAMS_PER_USER
+            broker.unsubscribe(subscription)
+
+        response = self.client.get('/stream', buffered=False)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        response.close()
+
+        days = self.client.get('/api/days?dates=2026-06-12,2026-06-11').get_json()['days']
+        self.assertEqual(days, {'2026-06-11': [], '2026-06-12': [
+            {'title': 'Live', 'description': '', 'priority': 'medium'}]})
+        self.assertEqual(self.client.get('/api/days?dates=12.06.2026').status_code, 400)
+
+    def test_archive_moves_history_and_views_still_show_it(self):
+        """Архів: старі події й завершені договори переносяться, а сторінки минулого їх показують"""
+        self.client.post('/add_contract', data={
+            'number': 'OLD-1', 'client': 'Old Client', 'client_email': 'old@test.com',
+            'amount': '900', 'start_date': '2023-01-15', 'duration': '3'})
+        contract_id = Contract.query.filter_by(number='OLD-1').one().id
+        self.client.get(f'/payment/{contract_id}/2/delete')
+        self.client.post('/add', data={'title': 'Old Event', 'date': '2024-01-10'})
+        # свіжі договір і подія лишаються в гарячих таблицях
+        self.client.post('/add_contract', data={
+            'number': 'NEW-1', 'client': 'New Client', 'client_email': 'new@test.com',
+            'amount': '1200', 'start_date': '2025-11-15', 'duration': '12'})
+        self.client.post('/add', data={'title': 'Fresh Event', 'date': '2025-12-01'})
+        dashboard = stats.dashboard(self.test_user.id, date(2023, 2, 15))
+        version = stats.data_version(self.test_user.id)[0]
+
+        moved = archive.run(today=date(2026, 1, 1), after_days=365, batch_size=1)
+        self.assertEqual(moved, {'contracts': 1, 'events': 1})
+        self.assertIsNone(Event.query.filter_by(title='Old Event').first())
+        self.assertIsNone(db.session.get(Contract, contract_id))
+        self.assertEqual(archive.boundary(self.test_user.id), date(2025, 1, 1))
+        self.assertGreater(stats.data_version(self.test_user.id)[0], version)
+        # повторний запуск нічого не переносить
+        self.assertEqual(archive.run(today=date(2026, 1, 1), after_days=365), {'contracts': 0, 'events': 0})
+
+        january = self.client.get('/month/2023/1').data.decode()
+        self.assertIn('Платіж: Old Client (1/3)', january)
+        self.assertNotIn('Платіж: Old Client (3/3)', self.client.get('/month/2023/3').data.decode())
+        day = self.client.get('/day/2024-01-10').data.decode()
+        self.assertIn('Old Event', day)
+        self.assertIn('В архіві', day)
+        self.assertIn('OLD-1', self.client.get('/contracts').data.decode())
+        # пошук знаходить і перенесений договір, поруч із гарячими
+        found = search.search_contracts(self.test_user.id, 'client')
+        self.assertEqual(sorted(c.number for c in found), ['NEW-1', 'OLD-1'])
+        self.assertTrue(search.search_contracts(self.test_user.id, 'OLD-1')[0].is_archived)
+        self.assertIn('OLD-1', self.client.get('/contracts?q=old').data.decode())
+        self.assertEqual(self.client.get('/api/days?dates=2024-01-10').get_json()['days']['2024-01-10'][0]['title'],
+                         'Old Event')
+        self.assertEqual(sum(c.total for c in heatmap.year_counts(self.test_user.id, 2023).values()), 2)
+        feed = ''.join(icsfeed.iter_feed(db.session.get(User, self.test_user.id)))
+        self.assertIn('Old Event', feed)
+        self.assertIn(f'UID:payment-{contract_id}-0', feed)
+
+        # перенесення - не зміна: синхронізація віддає ті самі дані, лічильники ті самі
+        synced = {c['id']: c for c in self.client.get('/sync').get_json()['changes'] if c['entity'] == 'contract'}
+        self.assertEqual(synced[contract_id]['data']['skipped'], [2])
+        self.assertEqual(stats.dashboard(self.test_user.id, date(2023, 2, 15)), dashboard)
+        stats.rebuild(self.test_user.id)
+        db.session.commit()
+        self.assertEqual(stats.dashboard(self.test_user.id, date(2023, 2, 15)), dashboard)
+        self.assertEqual(archive.boundary(self.test_user.id), date(2025, 1, 1))
+
+    def test_archive_ids_are_not_reused_after_newest_contract_is_cancelled(self):
+        """AUTOINCREMENT: новий договір не отримує id перенесеного в архів чи анульованого"""
+        def add(number, start):
+            self.client.post('/add_contract', data={
+                'number': number, 'client': 'Id Client', 'client_email': 'id@test.com',
+                'amount': '300', 'start_date': start, 'duration': '3'})
+            return Contract.query.filter_by(number=number).one().id
+
+        first = add('ID-1', '2020-01-15')
+        self.assertEqual(archive.run(today=date(2026, 1, 1))['contracts'], 1)
+        newest = add('ID-2', '2026-01-15')
+        self.client.post(f'/cancel/{newest}')
+        reused = add('ID-3', '2020-06-15')
+        self.assertNotIn(reused, (first, newest))
+
+        self.assertEqual(archive.run(today=date(2026, 1, 1))['contracts'], 1)
+        self.assertEqual(sorted(c.id for c in ArchivedContract.query), [first, reused])
+
+    def test_year_heatmap_counts(self):
+        """Теплова карта року: події і платежі по днях з агрегатів"""
+        for number in ('HEAT-1', 'HEAT-2'):
+            db.session.add(Contract(
+                number=number, client_name='Heat Client', client_email='heat@test.com',
+                amount=1000, start_date=date(2026, 1, 31), duration_months=3,
+                end_date=date(2026, 3, 31), user_id=self.test_user.id
+            ))
+        db.session.add_all([
+            Event(title='A', date=date(2026, 5, 1), priority='high', user_id=self.test_user.id),
+            Event(title='B', date=date(2026, 5, 1), priority='low', user_id=self.test_user.id),
+            Event(title='C', date=date(2026, 5, 2), user_id=self.test_user.id),
+            Event(title='Old', date=date(2025, 5, 1), user_id=self.test_user.id),
+        ])
+        db.session.commit()
+        contract = Contract.query.filter_by(number='HEAT-1').one()
+        self.client.post(f'/payment/{contract.id}/1', data={
+            'title': 'Moved payment', 'description': '', 'date': '2026-03-05'
+        })
+
+        response = self.client.get('/api/year/2026')
+        self.assertEqual(response.status_code, 200)
+        days = response.get_json()['days']
+        self.assertEqual(days['2026-05-01']['total'], 2)
+        self.assertEqual(days['2026-05-01']['priority'], {'high': 1, 'low': 1})
+        self.assertEqual(days['2026-05-02']['priority'], {'medium': 1})
+        # дві когорти платежів, один лютневий перенесено на 5 березня
+        self.assertEqual(days['2026-01-31']['total'], 2)
+        self.assertEqual(days['2026-02-28']['total'], 1)
+        self.assertEqual(days['2026-03-05']['type'], {'payment': 1})
+        self.assertEqual(days['2026-01-31']['level'], 4)
+        self.assertNotIn('2025-05-01', days)
+
+        self.assertEqual(self.client.get('/year/2026').status_code, 200)
+        self.assertEqual(self.client.get('/year/1900').status_code, 404)
+
+        # лічильник читається з індексу, без звернення до таблиці подій
+        plan = db.session.execute(sqlalchemy.text(
+            'EXPLAIN QUERY PLAN SELECT date, priority, event_type, count(*) FROM event '
+            'WHERE user_id = 1 AND date BETWEEN :a AND :b GROUP BY date, priority, event_type'
+        ), {'a': '2026-01-01', 'b': '2026-12-31'}).all()
+        self.assertIn('COVERING INDEX ix_event_user_date_kind', ' '.join(row[-1] for row in plan))
+
+    # === ТЕСТИ ЧЕРГИ ЛИСТІВ ===
+    def use_smtp(self, port):
+        """Перенаправляє Flask-Mail на локальний порт до кінця тесту"""
+        old_state = self.app.extensions['mail']
+        self.addCleanup(self.app.extensions.__setitem__, 'mail', old_state)
+        self.app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False,
+                               MAIL_USE_SSL=False, MAIL_USERNAME=None, MAIL_PASSWORD=None,
+                               MAIL_SUPPRESS_SEND=False, MAIL_DEFAULT_SENDER='noreply@test.com')
+        mail.init_app(self.app)
+
+    def test_contract_mail_goes_through_outbox(self):
+        """Запит лише ставить лист у чергу, воркер відправляє пачку одним з'єднанням"""
+        smtp = FakeSMTPServer()
+        self.addCleanup(smtp.server_close)
+        self.addCleanup(smtp.shutdown)
+        self.use_smtp(smtp.server_address[1])
+
+        for number in ('MAIL-1', 'MAIL-2'):
+            self.client.post('/add_contract', data={
+                'number': number, 'client': 'Mail Client', 'client_email': 'client@test.com',
+                'amount': '1000', 'start_date': '2026-01-01', 'duration': '10'
+            })
+        self.assertEqual(smtp.messages, [])
+        self.assertEqual(OutboxMessage.query.filter_by(status='pending').count(), 2)
+
+        sent, failed = outbox.deliver_batch(mail)
+        self.assertEqual((sent, failed), (2, 0))
+        self.assertEqual(smtp.connections, 1)
+        self.assertEqual(len(smtp.messages), 2)
+        self.assertEqual(OutboxMessage.query.filter_by(status='sent').count(), 2)
+
+    def test_outbox_retries_when_smtp_is_down(self):
+        """Якщо SMTP недоступний, лист повертається в чергу з паузою"""
+        closed = FakeSMTPServer()
+        port = closed.server_address[1]
+        closed.shutdown()
+        closed.server_close()
+        self.use_smtp(port)
+
+        outbox.enqueue('Test', ['client@test.com'], 'body')
+        db.session.commit()
+
+        self.assertEqual(outbox.deliver_batch(mail), (0, 1))
+        message = OutboxMessage.query.one()
+        self.assertEqual(message.status, 'pending')
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.next_attempt_at, datetime.utcnow())
+        self.assertEqual(outbox.deliver_batch(mail), (0, 0))
+
+        # непередбачена помилка пачки - у лог застосунку з трасуванням, воркер живе далі
+        def broken(mail):
+            raise RuntimeError('queue is broken')
+        deliver_batch, outbox.deliver_batch = outbox.deliver_batch, broken
+        try:
+            with self.assertLogs(app.logger, 'ERROR') as logs:
+                outbox._worker_loop(app, mail, threading.Event(), 0, once=True)
+        finally:
+            outbox.deliver_batch = deliver_batch
+        self.assertIn('RuntimeError: queue is broken', logs.output[0])
+
+    def test_payment_reminders_digest_per_recipient_once(self):
+        """Один дайджест на клієнта і на менеджера, повторний запуск нічого не шле"""
+        def add_contract(number, email, start_date, duration):
+            contract = Contract(
+                number=number, client_name=f'Client {email}', client_email=email, amount=1200,
+                start_date=start_date, duration_months=duration,
+                end_date=schedules.schedule_end_date(start_date, duration), user_id=self.test_user.id)
+            db.session.add(contract)
+            db.session.commit()
+            return contract
+
+        add_contract('R-1', 'a@test.com', date(2026, 3, 1), 12)
+        add_contract('R-2', 'a@test.com', date(2026, 3, 2), 6)
+        moved = add_contract('R-3', 'c@test.com', date(2026, 1, 3), 12)
+        add_contract('R-4', 'd@test.com', date(2026, 6, 1), 12)
+        # платіж 03.03 перенесено на 04.03 - нагадування за новою датою
+        self.client.post(f'/payment/{moved.id}/2', data={
+            'title': 'Moved payment', 'description': '', 'date': '2026-03-04'})
+
+        report = reminders.send_reminders(date(2026, 3, 1), days=3)
+        self.assertEqual((report.payments, report.digests, report.already_sent), (3, 3, 0))
+        messages = {m.recipients: m.body for m in OutboxMessage.query}
+        self.assertEqual(set(messages), {'a@test.com', 'c@test.com', 'test@example.com'})
+        self.assertIn('R-1', messages['a@test.com'])
+        self.assertIn('R-2', messages['a@test.com'])
+        self.assertIn('04.03.2026: Moved payment', messages['c@test.com'])
+        self.assertIn('Разом: 3 платежів', messages['test@example.com'])
+
+        report = reminders.send_reminders(date(2026, 3, 1), days=3)
+        self.assertEqual((report.digests, report.already_sent), (0, 6))
+
+        # новий платіж у тому ж вікні - лише він
+        add_contract('R-5', 'a@test.com', date(2026, 3, 3), 1)
+        result = self.app.test_cli_runner().invoke(args=['send-reminders', '--date', '2026-03-01'])
+        self.assertIn('листів у черзі: 2', result.output)
+        latest = OutboxMessage.query.filter_by(recipients='a@test.com').order_by(OutboxMessage.id.desc()).first()
+        self.assertIn('R-5', latest.body)
+        self.assertNotIn('R-1', latest.body)
+
+        # уже нагаданий платіж перенесено за межі старого вікна - журнал знаходить його за ключем
+        payment = Event.query.filter_by(contract_id=moved.id, occurrence=2).one()
+        self.client.post(f'/edit/{payment.id}', data={
+            'title': 'Moved again', 'description': '', 'date': '2026-03-10'})
+        report = reminders.send_reminders(date(2026, 3, 8), days=3)
+        self.assertEqual((report.payments, report.digests, report.already_sent), (1, 0, 2))
+
+    # === ТЕСТИ АНАЛІТИКИ ===
+    def test_analytics_buffered_jsonl_and_report(self):
+        """Записи буферизуються, пишуться як JSONL, ротуються і агрегуються звітом"""
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir)
+        Analytics.flush()
+        old = (Analytics.LOG_FILE, Analytics.MAX_BYTES)
+        self.addCleanup(lambda: setattr(Analytics, 'LOG_FILE', old[0]) or setattr(Analytics, 'MAX_BYTES', old[1]))
+        Analytics.LOG_FILE = os.path.join(log_dir, 'analytics.log')
+        Analytics.MAX_BYTES = 1000
+
+        for i in range(30):
+            Analytics.log(f'event {i}', type='login', user='testuser')
+        Analytics.flush()
+        # поки файл пишеться, log() лише додає в буфер і не чекає
+        with Analytics._write_lock:
+            for i in range(30):
+                Analytics.log(f'event {i}', type='login', user='testuser')
+        Analytics.flush()
+
+        files = analytics.log_files()
+        self.assertEqual(len(files), 2)
+        counts = analytics.aggregate(analytics.iter_records(files))
+        self.assertEqual(sum(counts.values()), 60)
+        self.assertEqual({key[1:] for key in counts}, {('testuser', 'login')})
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'потрібен fork')
+    def test_analytics_flusher_survives_errors_and_fork(self):
+        """Потік запису не гине від помилки і запускається заново в дочірньому процесі"""
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir)
+        Analytics.flush()
+        old = (Analytics.LOG_FILE, Analytics.FLUSH_INTERVAL)
+        self.addCleanup(lambda: setattr(Analytics, 'LOG_FILE', old[0]) or setattr(Analytics, 'FLUSH_INTERVAL', old[1]))
+        Analytics.LOG_FILE = os.path.join(log_dir, 'analytics.log')
+        Analytics.FLUSH_INTERVAL = 0.05
+
+        def wait_for(text):
+            for _ in range(100):
+                if os.path.exists(Analytics.LOG_FILE):
+                    with open(Analytics.LOG_FILE, encoding='utf-8') as f:
+                        if text in f.read():
+                            return True
+                threading.Event().wait(0.05)
+            return False
+
+        # помилка не з OSError - потік пише її в stderr і живе далі
+        write = Analytics.__dict__['_write']
+        def broken(data):
+            Analytics._write = write
+            raise RuntimeError('disk on fire')
+        Analytics._write = staticmethod(broken)
+        self.addCleanup(setattr, Analytics, '_write', write)
+        with io.StringIO() as err, unittest.mock.patch('sys.stderr', err):
+            Analytics.log('lost')
+            for _ in range(100):
+                if 'disk on fire' in err.getvalue():
+                    break
+                threading.Event().wait(0.05)
+            self.assertIn('disk on fire', err.getvalue())
+        Analytics.log('after error')
+        self.assertTrue(wait_for('after error'))
+
+        pid = os.fork()
+        if pid == 0:
+            # дочірній процес: власний потік запису, без ручного flush()
+            Analytics.log('from child')
+            os._exit(0 if wait_for('from child') else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+    # === ТЕСТИ ПОШУКУ ДОГОВОРІВ ===
+    def test_contract_search_prefix_cyrillic(self):
+        """Пошук за префіксом без урахування регістру, лише свої договори"""
+        other = User(username='other', email='other@example.com')
+        db.session.add(other)
+        db.session.flush()
+        for number, client, user_id in (('ЛЗ-2026/01', 'ТОВ Шевченко', self.test_user.id),
+                                        ('ЛЗ-2026/02', 'Шевчук Іван', self.test_user.id),
+                                        ('ЛЗ-2026/03', 'ТОВ Шевченко', other.id)):
+            db.session.add(Contract(number=number, client_name=client, client_email='c@test.com',
+                                    amount=1000, start_date=date(2026, 1, 1), duration_months=10,
+                                    end_date=date(2026, 10, 1), user_id=user_id))
+        db.session.commit()
+
+        found = search.search_contracts(self.test_user.id, 'шевч')
+        self.assertEqual(sorted(c.number for c in found), ['ЛЗ-2026/01', 'ЛЗ-2026/02'])
+        found = search.search_contracts(self.test_user.id, 'тов ШЕВ')
+        self.assertEqual([c.number for c in found], ['ЛЗ-2026/01'])
+
+        db.session.delete(found[0])
+        db.session.commit()
+        found = search.search_contracts(self.test_user.id, 'шевч')
+        self.assertEqual([c.number for c in found], ['ЛЗ-2026/02'])
+
+        response = self.client.get('/contracts?q=шевчук')
+        self.assertIn('ЛЗ-2026/02'.encode(), response.data)
 
     def test_cancel_contract(self):
         """Тестуємо анулювання договору"""
@@ -127,6 +959,283 @@ class CalendarTestCase(unittest.TestCase):
         deleted_contract = Contract.query.filter_by(number='DEL-001').first()
         self.assertIsNone(deleted_contract)
 
+    def test_cancel_long_contract_uses_database_cascade(self):
+        """Анулювання договору з сотнями платежів - кілька запитів, без DELETE на кожну подію"""
+        contract = Contract(number='LONG-1', client_name='Long Client', client_email='long@test.com',
+                            amount=360000, start_date=date(2020, 1, 1), duration_months=360,
+                            end_date=schedules.schedule_end_date(date(2020, 1, 1), 360),
+                            user_id=self.test_user.id, virtual_schedule=False)
+        db.session.add(contract)
+        db.session.flush()
+        # договір старого формату: платежі записані рядками в event
+        db.session.execute(db.insert(Event), [
+            {'title': f'Платіж {i}', 'date': schedules.add_months(date(2020, 1, 1), i),
+             'user_id': self.test_user.id, 'contract_id': contract.id, 'event_type': 'payment'}
+            for i in range(360)
+        ])
+        db.session.commit()
+        contract_id = contract.id
+        db.session.expunge(contract)
+
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        sqlalchemy.event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = self.client.post(f'/cancel/{contract_id}')
+        finally:
+            sqlalchemy.event.remove(db.engine, 'before_cursor_execute', record)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Event.query.filter_by(contract_id=contract_id).count(), 0)
+        self.assertFalse([s for s in statements if s.startswith('DELETE FROM event')])
+        self.assertLessEqual(len(statements), 12)
+
+    # === ТЕСТИ ПІДПИСКИ .ICS ===
+    def test_ics_feed_streams_events_and_payments(self):
+        """Стрічка .ics за токеном: події, платежі графіка, ETag і 304 до наступного запису"""
+        self.client.post('/add', data={'title': 'Зустріч, важлива', 'date': '2026-05-20', 'priority': 'high'})
+        self.client.post('/add_contract', data={
+            'number': 'ICS-1', 'client': 'Ics Client', 'client_email': 'ics@test.com',
+            'amount': '3000', 'start_date': '2026-01-31', 'duration': '3'
+        })
+        contract = Contract.query.filter_by(number='ICS-1').first()
+        self.client.get(f'/payment/{contract.id}/2/delete')
+
+        self.assertEqual(self.client.get('/calendar/feed').status_code, 200)
+        token = db.session.get(User, self.test_user.id).feed_token
+        self.assertTrue(token)
+        self.assertEqual(self.client.get('/calendar/wrong.ics').status_code, 404)
+
+        anonymous = app.test_client()
+        response = anonymous.get(f'/calendar/{token}.ics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/calendar')
+        body = response.get_data(as_text=True)
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertIn('SUMMARY:Зустріч\\, важлива', body)
+        self.assertIn('DTSTART;VALUE=DATE:20260228', body)
+        self.assertNotIn(f'payment-{contract.id}-2@', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+
+        etag = response.headers['ETag']
+        hits = page_cache.stats()['hits']
+        cached = anonymous.get(f'/calendar/{token}.ics')
+        self.assertEqual(page_cache.stats()['hits'], hits + 1)
+        self.assertEqual(cached.get_data(as_text=True), body)
+        self.assertEqual(anonymous.get(f'/calendar/{token}.ics', headers={'If-None-Match': etag}).status_code, 304)
+
+        self.client.post('/add', data={'title': 'Нова', 'date': '2026-05-21'})
+        response = anonymous.get(f'/calendar/{token}.ics', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('SUMMARY:Нова', response.get_data(as_text=True))
+
+        # нове посилання, старе перестає працювати
+        self.client.post('/calendar/feed')
+        self.assertEqual(anonymous.get(f'/calendar/{token}.ics').status_code, 404)
+
+    # === ТЕСТИ СТАТИКИ І СТИСНЕННЯ ===
+    def test_assets_fingerprinted_and_html_compressed(self):
+        """Стилі винесені у файли з відбитком, HTML стискається, 304 працює і зі стисненням"""
+        response = self.client.get('/month/2026/5')
+        html = response.get_data(as_text=True)
+        self.assertNotIn('<style>', html)
+        self.assertIn('data-year="2026" data-month="5"', html)
+        css_url = re.search(r'href="(/static/css/month\.css\?v=\w+)"', html).group(1)
+
+        with self.client.get(css_url) as css:
+            self.assertEqual(css.status_code, 200)
+            self.assertTrue(css.cache_control.immutable)
+            self.assertEqual(css.cache_control.max_age, 365 * 24 * 3600)
+        # без відбитка - звичайна перевірка актуальності
+        with self.client.get('/static/css/month.css') as css:
+            self.assertFalse(css.cache_control.immutable)
+
+        page_cache.clear()
+        compressed = self.client.get('/month/2026/5', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed.headers['Vary'])
+        self.assertEqual(gzip.decompress(compressed.get_data()).decode(), html)
+        self.assertLess(len(compressed.get_data()), len(html.encode()) / 3)
+
+        etag = compressed.headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        again = self.client.get('/month/2026/5', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(again.status_code, 304)
+
+    # === ТЕСТИ НАЛАШТУВАНЬ БАЗИ ===
+    def test_write_requests_take_sqlite_write_lock_first(self):
+        """POST починає транзакцію з BEGIN IMMEDIATE, звичайний GET - з BEGIN"""
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        # запити тестового клієнта ділять сесію з тестом - закриваємо її транзакцію
+        db.session.remove()
+        sqlalchemy.event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            self.client.post('/add', data={'title': 'Lock', 'date': '2026-05-20'})
+            post_statements, statements[:] = list(statements), []
+            db.session.remove()
+            self.client.get('/contracts')
+        finally:
+            sqlalchemy.event.remove(db.engine, 'before_cursor_execute', record)
+
+        self.assertEqual(post_statements[0], 'BEGIN IMMEDIATE')
+        self.assertEqual(statements[0], 'BEGIN')
+        self.assertNotIn('BEGIN IMMEDIATE', statements)
+
+    def test_production_profile_enables_wal(self):
+        """Продакшн-профіль вмикає WAL і busy_timeout, пул і ліміт /stream - за потоками воркера, брокер - у базі"""
+        db_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, db_dir)
+
+        class TestProductionConfig(ProductionConfig):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(db_dir, 'prod.db')
+
+        production_app = create_app(TestProductionConfig)
+        with production_app.app_context():
+            with db.engine.connect() as conn:
+                self.assertEqual(conn.exec_driver_sql('PRAGMA journal_mode').scalar(), 'wal')
+                self.assertEqual(conn.exec_driver_sql('PRAGMA busy_timeout').scalar(), 30000)
+            self.assertEqual(db.engine.pool.size(), ProductionConfig.WORKER_THREADS)
+            db.engine.dispose()
+        # відкриті вкладки займають не більше половини потоків воркера
+        self.assertEqual(production_app.extensions['live'].max_streams, ProductionConfig.WORKER_THREADS // 2)
+        # сповіщення між воркерами йдуть через базу
+        self.assertIsInstance(production_app.extensions['live'], live.DatabaseBroker)
+
+        options = database.engine_options({'SQLALCHEMY_DATABASE_URI': 'postgresql://db/planner',
+                                           'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': 3}})
+        self.assertEqual(options['pool_size'], 3)
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(database.engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}), {})
+        self.assertEqual(database.engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'WORKER_THREADS': 8}), {})
+
+    # === ТЕСТИ ХОЛОДНОГО СТАРТУ ===
+    def test_cold_start_within_budget_without_import_side_effects(self):
+        """import main нічого не створює, холодний старт укладається в бюджет"""
+        root = os.path.dirname(os.path.abspath(__file__))
+        result = subprocess.run(
+            [sys.executable, os.path.join(root, 'benchmarks', 'bench_startup.py'), '--repeat', '3', '--top', '0', '--check'],
+            capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+    # === ТЕСТИ МЕТРИК ===
+    def test_metrics_endpoint_and_n_plus_one(self):
+        """Метрики вмикаються конфігурацією, рахують SQL і помічають N+1"""
+        from flask import Flask, render_template_string
+        metrics_app = Flask(__name__)
+        metrics_app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', METRICS_ENABLED=True,
+                                  METRICS_N_PLUS_ONE_THRESHOLD=3, METRICS_TOKEN='scrape-secret')
+        db.init_app(metrics_app)
+        instrumentation.init_app(metrics_app)
+
+        @metrics_app.route('/items')
+        def items():
+            for i in range(5):
+                db.session.execute(sqlalchemy.text('SELECT :i'), {'i': i})
+            return render_template_string('ok')
+
+        # основний застосунок без METRICS_ENABLED - ні хуків, ні /metrics
+        self.assertNotIn('instrumentation', app.extensions)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir)
+        Analytics.flush()
+        old_log = Analytics.LOG_FILE
+        self.addCleanup(setattr, Analytics, 'LOG_FILE', old_log)
+        Analytics.LOG_FILE = os.path.join(log_dir, 'analytics.log')
+
+        client = metrics_app.test_client()
+        self.assertEqual(client.get('/items').status_code, 200)
+        Analytics.flush()
+        # без токена метрики не віддаються
+        self.assertEqual(client.get('/metrics').status_code, 403)
+        self.assertEqual(client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+        text = client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'}).get_data(as_text=True)
+
+        self.assertIn('http_requests_total{endpoint="items",method="GET",status="200"} 1', text)
+        self.assertIn('db_queries_per_request_sum{endpoint="items"} 5', text)
+        self.assertIn('template_render_seconds_count{template="string"} 1', text)
+        self.assertIn('n_plus_one_total{endpoint="items"} 1', text)
+        with open(Analytics.LOG_FILE, encoding='utf-8') as f:
+            self.assertIn('"type": "n_plus_one"', f.read())
+
+        # кеші сторінок і користувачів застосунку - теж у /metrics
+        class MetricsConfig(TestConfig):
+            METRICS_ENABLED = True
+            METRICS_TOKEN = 'scrape-secret'
+        page_cache.get(('metrics', 'probe'))
+        text = create_app(MetricsConfig).test_client().get(
+            '/metrics', headers={'Authorization': 'Bearer scrape-secret'}).get_data(as_text=True)
+        stats = page_cache.stats()
+        self.assertIn(f'page_cache_misses_total {stats["misses"]}', text)
+        self.assertIn(f'page_cache_bytes {stats["bytes"]}', text)
+        self.assertIn('# TYPE user_cache_entries gauge', text)
+        self.assertIn(f'user_cache_hits_total {user_cache.cache.stats()["hits"]}', text)
+
+    def test_forecast_inflow_balance_and_annuity(self):
+        """Прогноз: надходження і залишок по місяцях, ануїтет збігається з покроковим розрахунком"""
+        def add_contract(number, amount, start_date, duration):
+            self.client.post('/add_contract', data={
+                'number': number, 'client': 'Client', 'client_email': 'client@example.com',
+                'amount': amount, 'start_date': start_date, 'duration': duration})
+
+        # без договорів - нулі, а не 500
+        for query in ('start=2026-01&months=3', 'start=2026-01&months=3&rate=12'):
+            response = self.client.get(f'/api/forecast?{query}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual((response.get_json()['inflow'], response.get_json()['balance']), ([0] * 3, [0] * 3))
+
+        add_contract('F-1', '12000', '2026-01-01', '12')
+        add_contract('F-2', '6000', '2026-03-15', '6')
+
+        # усі договори вже завершились
+        for query in ('start=2030-01&months=3', 'start=2030-01&months=3&rate=12'):
+            response = self.client.get(f'/api/forecast?{query}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()['balance'], [0] * 3)
+
+        data = self.client.get('/api/forecast?start=2026-01&months=12').get_json()
+        self.assertEqual(data['months'][0], '2026-01')
+        self.assertEqual(data['inflow'], [1000, 1000] + [2000] * 6 + [1000] * 4)
+        self.assertEqual(data['balance'][:4], [18000, 17000, 16000, 14000])
+        self.assertEqual((data['due_total'], data['due_count'], data['contracts']), (18000, 18, 2))
+
+        # ануїтет 12% річних: залишок після кожного платежу з відсотками
+        data = self.client.get('/api/forecast?start=2026-01&months=14&rate=12').get_json()
+        r = 0.01
+        expected = []
+        for amount, start, n in ((12000, 0, 12), (6000, 2, 6)):
+            payment = amount * r / (1 - (1 + r) ** -n)
+            rows, balance = [], amount
+            for month in range(14):
+                paying = start <= month < start + n
+                rows.append((payment if paying else 0, max(balance, 0)))
+                if paying:
+                    balance = balance * (1 + r) - payment
+            expected.append(rows)
+        for month in range(14):
+            self.assertAlmostEqual(data['inflow'][month], sum(rows[month][0] for rows in expected), places=1)
+            self.assertAlmostEqual(data['balance'][month], sum(rows[month][1] for rows in expected), places=1)
+
+        # портфель у кеші скидається після запису
+        add_contract('F-3', '3000', '2026-01-01', '3')
+        self.assertEqual(self.client.get('/api/forecast?start=2026-01').get_json()['contracts'], 3)
+
+        self.assertEqual(self.client.get('/api/forecast?months=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/forecast?start=2026-13').status_code, 400)
+        self.assertEqual(self.client.get('/api/forecast?rate=abc').status_code, 400)
+        for rate in ('nan', 'inf', '-inf', '1e400', '5000'):
+            self.assertEqual(self.client.get(f'/api/forecast?rate={rate}').status_code, 400)
+        # помилка - власним текстом, не повідомленням int()
+        response = self.client.get('/api/forecast?months=x')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('invalid literal', response.get_json()['error'])
+
 if __name__ == '__main__':
     print("Running updated tests...")
     unittest.main()
\ No newline at end of file
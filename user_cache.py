@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from models import db, User
+
+
+# === КЕШ КОРИСТУВАЧІВ ДЛЯ FLASK-LOGIN ===
+# load_user викликається на кожному запиті з сесією. Замість SELECT і
+# ORM-об'єкта User з кешу процесу береться легкий UserIdentity (id, ім'я,
+# пошта, версія). Повний User потрібен лише там, де є зв'язки чи секрети
+# (токен стрічки .ics) - такі view читають його самі.
+#
+# Узгодженість: user.version - version_id_col, кожен UPDATE рядка
+# користувача збільшує його. Зміна чи видалення в цьому процесі одразу
+# прибирає запис з кешу; інші воркери про неї не знають і бачать її не
+# пізніше ніж через TTL (USER_CACHE_TTL, за замовчуванням 10 с), а раніше -
+# лише якщо самі завантажать цього User з новішою версією. Тобто протягом
+# TTL інший воркер ще показує старе ім'я і пускає щойно видаленого
+# користувача; TTL короткий саме тому, а кеш однаково знімає майже всі
+# SELECT, бо запити однієї сесії йдуть густо.
+
+class UserIdentity(UserMixin):
+    """current_user без сесії SQLAlchemy: лише поля, потрібні сторінкам."""
+
+    def __init__(self, id, username, email, version):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.version = version
+
+    def __repr__(self):
+        return f'<UserIdentity {self.username} v{self.version}>'
+
+
+class UserCache:
+    def __init__(self, ttl=10.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()   # user_id -> (UserIdentity, час завантаження)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """UserIdentity з кешу або з бази (None, якщо користувача немає)."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is not None and now - item[1] < self.ttl:
+                self._items.move_to_end(user_id)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+
+        row = db.session.execute(
+            db.select(User.id, User.username, User.email, User.version).where(User.id == user_id)
+        ).first()
+        if row is None:
+            self.invalidate(user_id)
+            return None
+        identity = UserIdentity(*row)
+        self._put(identity, now)
+        return identity
+
+    def _put(self, identity, loaded_at):
+        with self._lock:
+            self._items[identity.id] = (identity, loaded_at)
+            self._items.move_to_end(identity.id)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def observe(self, user):
+        """Повний User щойно прочитано з бази: оновлює запис, якщо версія новіша."""
+        with self._lock:
+            item = self._items.get(user.id)
+            if item is None or item[0].version >= (user.version or 0):
+                return
+        self._put(UserIdentity(user.id, user.username, user.email, user.version), time.monotonic())
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._items),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+cache = UserCache()
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    cache.invalidate(target.id)
+
+
+@event.listens_for(User, 'load')
+def _user_loaded(target, context):
+    cache.observe(target)
+
+
+@event.listens_for(User, 'refresh')
+def _user_refreshed(target, context, attrs):
+    if attrs is None or 'version' in attrs:
+        cache.observe(target)
@@ -0,0 +1,19 @@
+"""Точка входу WSGI для продакшну.
+
+Linux (кілька процесів, у кожного свій пул з'єднань; --threads =
+ProductionConfig.WORKER_THREADS):
+    gunicorn -w 4 --threads 32 -b 0.0.0.0:8000 wsgi:app
+
+Windows (gunicorn там не працює, один процес):
+    waitress-serve --threads 32 --port 8000 wsgi:app
+
+Перед запуском (один раз на деплой) оновити схему бази:
+    APP_PROFILE=production flask --app main db-upgrade
+
+Листи з черги відправляє окремий процес:
+    APP_PROFILE=production flask --app main outbox-worker
+"""
+from main import create_app
+from production import ProductionConfig
+
+app = create_app(ProductionConfig)